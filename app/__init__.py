@@ -15,6 +15,8 @@ from app.routes.main import bp as main_bp
 from app.routes.auth import bp as auth_bp
 from app.routes.credentials import bp as credentials_bp
 from app.routes.webhooks import bp as webhooks_bp
+from app.scheduler import init_sync_scheduler
+from app.utils.sqlite_cache import SQLiteCache
 import json
 
 
@@ -63,6 +65,13 @@ def create_app(config_class=Config):
             project_url=Config.PROJECT_URL,
         )
 
+    if app.config.get("SESSION_BACKEND") == "sqlite":
+        # Challenges get their own table so session churn never evicts them
+        path = app.config["SESSION_SQLITE_PATH"]
+        app.config["SESSION_CACHELIB"] = SQLiteCache(path, table="sessions")
+        app.config["REGISTRATION_CHALLENGES"] = SQLiteCache(path, table="registration_challenges")
+        app.config["AUTHENTICATION_CHALLENGES"] = SQLiteCache(path, table="authentication_challenges")
+
     CORS(app)
     QRcode(app)
     Session(app)
@@ -73,5 +82,8 @@ def create_app(config_class=Config):
     app.register_blueprint(credentials_bp)
     app.register_blueprint(webhooks_bp, url_prefix="/webhooks")
 
+    # Keep recently active wallets synced with the agent in the background
+    init_sync_scheduler(app)
+
 
     return app
@@ -0,0 +1,210 @@
+"""
+ASGI entry point serving notification streams on the event loop.
+
+`/notifications/stream` is handled natively with asyncio so an idle SSE
+subscriber costs a coroutine and a small queue instead of a server thread.
+Every other request is passed to the Flask app through asgiref's WSGI adapter,
+on a thread pool (WSGI_THREADS) so Flask requests run concurrently.
+"""
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, session
+from tempfile import SpooledTemporaryFile
+from werkzeug.test import EnvironBuilder
+import asyncio
+import json
+import logging
+
+from config import Config
+from app.plugins import AskarStorage
+from app.utils import notification_broadcaster, format_sse, parse_last_event_id
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = "/notifications/stream"
+KEEPALIVE_SECONDS = 30
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),
+    (b"connection", b"keep-alive"),
+]
+
+
+_wsgi_executor = ThreadPoolExecutor(max_workers=max(1, Config.WSGI_THREADS), thread_name_prefix="wsgi")
+
+
+class ThreadPoolWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """
+    WsgiToAsgiInstance calling the WSGI app on the WSGI_THREADS pool.
+
+    asgiref runs every WSGI call on one shared thread (thread_sensitive=True),
+    so the app is called here through loop.run_in_executor instead, reusing
+    the adapter's build_environ and start_response.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            raise ValueError("WSGI wrapper received a non-HTTP scope")
+        self.scope = scope
+        loop = asyncio.get_running_loop()
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message["type"] != "http.request":
+                    raise ValueError("WSGI wrapper received a non-HTTP-request message")
+                body.write(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+            body.seek(0)
+            # The pool thread hands its messages back to this loop
+            self.sync_send = lambda message: asyncio.run_coroutine_threadsafe(send(message), loop).result()
+            await loop.run_in_executor(_wsgi_executor, self.call_wsgi_app, body)
+
+    def call_wsgi_app(self, body):
+        """Run the WSGI app on a pool thread and stream its response"""
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # Too many duplicate headers
+            self.sync_send({"type": "http.response.start", "status": 400,
+                            "headers": [(b"content-type", b"text/plain")]})
+            self.sync_send({"type": "http.response.body", "body": b"Bad Request"})
+            return
+
+        response = self.wsgi_application(environ, self.start_response)
+        try:
+            bytes_sent = 0
+            for output in response:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                if self.response_content_length is not None:
+                    # Never send more than the declared Content-Length
+                    output = output[:self.response_content_length - bytes_sent]
+                self.sync_send({"type": "http.response.body", "body": output, "more_body": True})
+                bytes_sent += len(output)
+                if bytes_sent == self.response_content_length:
+                    break
+        finally:
+            if hasattr(response, "close"):
+                response.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({"type": "http.response.body"})
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi running each WSGI request on its own pool thread"""
+
+    async def __call__(self, scope, receive, send):
+        await ThreadPoolWsgiToAsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+def create_asgi_app(flask_app: Flask):
+    wsgi = ThreadPoolWsgiToAsgi(flask_app)
+
+    async def asgi(scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await lifespan(receive, send)
+        if scope["type"] == "http" and scope["path"] == STREAM_PATH:
+            return await notification_stream(flask_app, scope, receive, send)
+        return await wsgi(scope, receive, send)
+
+    return asgi
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await AskarStorage().provision(recreate=False)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def session_wallet_id(flask_app: Flask, scope) -> str:
+    """Load the Flask session for an ASGI request and return its wallet_id"""
+    headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope.get("headers", [])]
+    environ = EnvironBuilder(
+        path=scope["path"],
+        query_string=scope.get("query_string", b"").decode("latin-1"),
+        headers=headers,
+    ).get_environ()
+    with flask_app.request_context(environ):
+        return session.get("wallet_id")
+
+
+async def notification_stream(flask_app: Flask, scope, receive, send):
+    """Server-Sent Events endpoint for real-time notifications"""
+    # Session backends (redis, cachelib) are blocking, keep them off the loop
+    wallet_id = await asyncio.to_thread(session_wallet_id, flask_app, scope)
+
+    if not wallet_id:
+        body = json.dumps({"error": "No wallet_id in session"}).encode()
+        await send({"type": "http.response.start", "status": 401,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+        return
+
+    last_event_id = parse_last_event_id(
+        header(scope, b"last-event-id")
+        or parse_qs(scope.get("query_string", b"").decode("latin-1")).get("last_event_id", [None])[0]
+    )
+    last_sent = last_event_id or 0
+
+    subscription = notification_broadcaster.subscribe_async(wallet_id)
+    disconnected = asyncio.create_task(wait_for_disconnect(receive))
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+        await send_frame(send, format_sse({'type': 'connected', 'wallet_id': wallet_id}))
+
+        # Replay events missed while the client was away (Redis replay is blocking)
+        for event in await asyncio.to_thread(notification_broadcaster.catch_up, wallet_id, last_event_id):
+            last_sent = max(last_sent, event.get('id', 0))
+            await send_frame(send, format_sse(event))
+
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                timeout=KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if next_event in done:
+                event = next_event.result()
+                # Skip events already sent during catch-up
+                if event.get('id', 0) > last_sent:
+                    last_sent = event['id']
+                    await send_frame(send, format_sse(event))
+                continue
+
+            next_event.cancel()
+            if not done:
+                await send_frame(send, ": keepalive\n\n")
+    except OSError as e:
+        logger.debug(f"SSE client went away: {wallet_id}: {e}")
+    finally:
+        disconnected.cancel()
+        notification_broadcaster.unsubscribe(wallet_id, subscription)
+        logger.debug(f"SSE client disconnected: {wallet_id}")
+
+
+def header(scope, name: bytes):
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def send_frame(send, frame: str):
+    await send({"type": "http.response.body", "body": frame.encode(), "more_body": True})
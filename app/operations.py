@@ -1,7 +1,14 @@
+from collections import OrderedDict
 from flask import current_app, session
+from config import Config
 from app.plugins import AgentController, AskarStorage, AskarStorageKeys
 from app.models.profile import Profile
+from app.utils.pagination import paginate, DEFAULT_PAGE_SIZE
+from app.utils.credential_index import update_credential_index
+from app.utils.versions import data_versions
+from app.utils.vp_signing import local_holder
 import secrets
+import threading
 
 agent = AgentController()
 
@@ -23,15 +30,7 @@ async def provision_wallet(client_id):
     wallet = agent.create_subwallet(client_id, wallet_key) | {"wallet_key": wallet_key}
     agent.set_token(wallet["token"])
 
-    wallet["holder_id"] = agent.create_did().get("result").get("did")
-    # multikey = agent.create_key().get("multikey")
-
     wallet_id = wallet["wallet_id"]
-    profile = Profile(
-        client_id=client_id,
-        wallet_id=wallet_id,
-        multikey=wallet["holder_id"].split(":")[-1],
-    ).model_dump()
 
     # Create profiles first (if they don't exist)
     global_askar = AskarStorage.global_store()
@@ -39,6 +38,19 @@ async def provision_wallet(client_id):
     
     wallet_askar = AskarStorage.for_wallet(wallet_id)
     await wallet_askar.create_profile()  # Create wallet-specific profile
+
+    if Config.VP_SIGNING == "local":
+        # Presentations are signed in-process, the holder is the local key's did:key
+        _, wallet["holder_id"], _ = await local_holder(wallet_askar)
+    else:
+        wallet["holder_id"] = agent.create_did().get("result").get("did")
+    # multikey = agent.create_key().get("multikey")
+
+    profile = Profile(
+        client_id=client_id,
+        wallet_id=wallet_id,
+        multikey=wallet["holder_id"].split(":")[-1],
+    ).model_dump()
     
     # Store global data (client_id -> wallet_id mapping)
     await global_askar.store(AskarStorageKeys.PROFILES, client_id, profile, {})
@@ -60,8 +72,52 @@ async def provision_wallet(client_id):
     return wallet
 
 
-async def sync_wallet(client_id):
-    # Refresh token
+SYNC_PAGE_SIZE = 50
+
+
+def _from_anoncreds_exchange(credential):
+    """Credentials stored from AnonCreds exchanges, which the agent's W3C listing never returns"""
+    proof = credential.get("proof")
+    schema = credential.get("credentialSchema")
+    return (isinstance(proof, dict) and proof.get("cryptosuite") == "vc-di-ac-2025") or (
+        isinstance(schema, dict) and schema.get("type") == "AnonCredsSchema"
+    )
+
+
+def _apply_credential_changes(credentials, added, removed_ids):
+    """Upsert added agent records into the stored credential list and drop removed ones"""
+    credentials = [c for c in credentials if not (c.get("id") and c.get("id") in removed_ids)]
+    positions = {c.get("id"): i for i, c in enumerate(credentials) if c.get("id")}
+    for record in added:
+        credential = record.get("cred_value")
+        if (position := positions.get(credential.get("id"))) is not None:
+            credentials[position] = credential
+        elif credential not in credentials:
+            positions[credential.get("id")] = len(credentials)
+            credentials.append(credential)
+    return credentials
+
+
+async def sync_wallet(client_id, full=False):
+    """
+    Pull credentials held by the agent into the wallet's storage.
+    
+    The sync is incremental: a per-wallet watermark (how many agent records
+    were seen and the id of the last one) is kept next to the data, only
+    pages past it are fetched and new records are upserted into the
+    credential list. The last record seen is read again first; when it moved
+    (records before it were deleted on the agent) every page is walked
+    again so no record is skipped. A sync with nothing new costs one small
+    agent call and no storage writes. Agents that ignore paging return
+    every record at once, which is handled in that single pass.
+    
+    Args:
+        client_id: Client the wallet belongs to
+        full: Walk every page again to also drop credentials deleted on the agent
+    
+    Returns:
+        Number of credential records added or removed
+    """
     global_askar = AskarStorage.global_store()
     profile = await global_askar.fetch(AskarStorageKeys.PROFILES, client_id)
     
@@ -69,24 +125,101 @@ async def sync_wallet(client_id):
     wallet_askar = AskarStorage.for_wallet(wallet_id)
     wallet = await wallet_askar.fetch(AskarStorageKeys.WALLETS)
     
-    wallet["token"] = agent.request_token(
-        wallet.get("wallet_id"), wallet.get("wallet_key")
-    )
-    agent.set_token(wallet["token"])
-
-    # Update Credentials
-    credentials = []
-    credentials.extend(
-        credential.get("cred_value")
-        for credential in agent.fetch_credentials().get("results")
-        if credential not in credentials
+    # Local controller: the module level one shares its token between requests
+    controller = AgentController()
+    controller.set_token(wallet["token"])
+    
+    state = await wallet_askar.fetch(AskarStorageKeys.SYNC_STATE, AskarStorageKeys.CREDENTIALS) or {}
+    anchor = None if full else state.get("anchor")  # agent record_id at offset - 1
+    offset = state.get("offset", 0) - 1 if anchor else 0
+    added, last_seen, token_refreshed = [], state.get("anchor"), False
+    
+    while True:
+        page = controller.fetch_credentials(limit=SYNC_PAGE_SIZE, offset=offset)
+        if page is None and not token_refreshed:
+            # Stored token was rejected, mint a new one once and keep it
+            token_refreshed = True
+            response = controller.request_token(wallet.get("wallet_id"), wallet.get("wallet_key")) or {}
+            if token := response.get("token"):
+                wallet["token"] = token
+                controller.set_token(token)
+                await wallet_askar.update(AskarStorageKeys.WALLETS, "data", wallet, {"did": [wallet["holder_id"]]})
+                continue
+        if page is None:
+            break
+        
+        records = page.get("results") or []
+        # Agents that ignore paging return every record, from position 0, in one response
+        unpaged = len(records) > SYNC_PAGE_SIZE
+        results = records[offset:] if unpaged else records
+        if anchor:
+            seen, anchor = results[:1], None
+            if seen and seen[0].get("record_id") == state.get("anchor"):
+                # Seen by the previous sync
+                results, offset = results[1:], offset + 1
+            else:
+                # Records before the watermark were deleted, walk them all again
+                full, offset = True, 0
+                if not unpaged:
+                    continue
+                results = records
+        
+        added.extend(r for r in results if r.get("cred_value"))
+        if results:
+            last_seen = results[-1].get("record_id")
+        # Positions count every agent record, with or without a credential value
+        offset += len(results)
+        if unpaged or len(records) != SYNC_PAGE_SIZE:
+            break
+    
+    removed = set()
+    if full and page is not None:
+        # Deletions are only known after walking every record
+        credentials = await wallet_askar.fetch(AskarStorageKeys.CREDENTIALS) or []
+        agent_ids = {r["cred_value"].get("id") for r in added}
+        stored_ids = {c.get("id") for c in credentials if c.get("id")}
+        removed = {
+            c.get("id") for c in credentials
+            if c.get("id") and c.get("id") not in agent_ids and not _from_anoncreds_exchange(c)
+        }
+        added = [r for r in added if r["cred_value"].get("id") not in stored_ids]
+    
+    if added or removed:
+        await wallet_askar.modify(
+            AskarStorageKeys.CREDENTIALS,
+            "data",
+            lambda credentials: _apply_credential_changes(credentials, added, removed),
+            default=[],
+        )
+        await update_credential_index(
+            wallet_askar,
+            added=[r["cred_value"] for r in added],
+            removed=list(removed),
+        )
+    
+    watermark = {"offset": offset, "anchor": last_seen}
+    if (added or page is not None) and watermark != state:
+        await wallet_askar.modify(
+            AskarStorageKeys.SYNC_STATE,
+            AskarStorageKeys.CREDENTIALS,
+            # Next sync starts after every record seen so far
+            lambda _: watermark,
+        )
+    
+    current_app.logger.info(
+        f"🔄 Synced wallet {wallet_id}: {len(added)} new, {len(removed)} removed credential records"
     )
-    await wallet_askar.update(AskarStorageKeys.CREDENTIALS, "data", credentials)
+    return len(added) + len(removed)
 
 
 async def sync_session(client_id):
-    from app.utils import get_notifications
+    """
+    Resolve the signed-in wallet and keep only its identifiers in the session.
     
+    Wallet data is no longer copied into the session (every request would
+    serialize it back to the session backend), lists are served in pages by
+    load_wallet_view and the list endpoints instead.
+    """
     global_askar = AskarStorage.global_store()
     profile = await global_askar.fetch(AskarStorageKeys.PROFILES, client_id)
     if not profile:
@@ -95,21 +228,77 @@ async def sync_session(client_id):
     
     wallet_id = profile.get("wallet_id")
     
-    current_app.logger.info(f"=== SYNCING SESSION for wallet: {wallet_id} ===")
+    session["wallet_id"] = wallet_id
+    # Drop data cached in the session by earlier versions
+    for key in ("credentials", "connections", "notifications", "notification_counters"):
+        session.pop(key, None)
     
-    wallet_askar = AskarStorage.for_wallet(wallet_id)
-    credentials = await wallet_askar.fetch(AskarStorageKeys.CREDENTIALS) or []
-    connections = await wallet_askar.fetch(AskarStorageKeys.CONNECTIONS) or []
-    notifications = await get_notifications(wallet_id) or []  # Use new notification system
+    current_app.logger.info(f"✅ Session synced for wallet: {wallet_id}")
+    return wallet_id
+
+
+# Decoded list arrays by (wallet_id, category) -> (data version, items)
+_list_cache = OrderedDict()
+_list_cache_lock = threading.Lock()
+
+
+async def _stored_list(wallet_id, category):
+    """
+    A wallet's stored array, decoded once per data version.
+    
+    Credentials and connections are one array per wallet, so every page
+    would otherwise read and decode all of it. The version is read before
+    the array, so a concurrent write can only make the cached entry look
+    older than it is (it is read again next time), never newer.
+    """
+    version = data_versions.etag(wallet_id, [category])
+    key = (wallet_id, category)
+    with _list_cache_lock:
+        cached = _list_cache.get(key)
+        if version and cached and cached[0] == version:
+            _list_cache.move_to_end(key)
+            return cached[1]
     
-    current_app.logger.info(f"Fetched from storage: {len(credentials)} credentials, {len(connections)} connections, {len(notifications)} notifications")
+    items = await AskarStorage.for_wallet(wallet_id).fetch(category) or []
+    if version:
+        with _list_cache_lock:
+            _list_cache[key] = (version, items)
+            _list_cache.move_to_end(key)
+            while len(_list_cache) > Config.LIST_CACHE_SIZE:
+                _list_cache.popitem(last=False)
+    return items
+
+
+async def list_credentials(wallet_id, cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None):
+    """One page of the wallet's credentials, in storage (oldest first) order"""
+    credentials = await _stored_list(wallet_id, AskarStorageKeys.CREDENTIALS)
+    return paginate(credentials, cursor, limit, fields)
+
+
+async def list_connections(wallet_id, cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None):
+    """One page of the wallet's connections, in storage (oldest first) order"""
+    connections = await _stored_list(wallet_id, AskarStorageKeys.CONNECTIONS)
+    return paginate(connections, cursor, limit, fields)
+
+
+async def load_wallet_view(wallet_id):
+    """First page of every list plus the counts shown on the wallet home page"""
+    from app.utils import get_notifications_page, get_notification_counters
     
-    if notifications:
-        for i, n in enumerate(notifications):
-            current_app.logger.info(f"  Notification {i}: type={n.get('type')}, id={n.get('id')}")
+    async with AskarStorage.for_wallet(wallet_id).scoped_session():
+        credentials = await list_credentials(wallet_id)
+        connections = await list_connections(wallet_id)
+        notifications = await get_notifications_page(wallet_id)
+        notification_counters = await get_notification_counters(wallet_id)
     
-    session["credentials"] = credentials
-    session["connections"] = connections
-    session["notifications"] = notifications
+    current_app.logger.info(
+        f"Loaded wallet view: {credentials['total']} credentials, {connections['total']} connections, "
+        f"{notification_counters.get('total', 0)} notifications"
+    )
     
-    current_app.logger.info(f"✅ Session synced")
+    return {
+        "credentials": credentials,
+        "connections": connections,
+        "notifications": notifications,
+        "notification_counters": notification_counters,
+    }
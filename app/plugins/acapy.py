@@ -1,6 +1,8 @@
 from flask import current_app
+from urllib.parse import urlparse
 import requests
 from config import Config
+from app.utils.tracing import record_span
 
 
 class AgentController:
@@ -10,6 +12,10 @@ class AgentController:
         self.tenant_headers = {}
 
     def _try_return(self, response):
+        record_span(
+            f"agent {response.request.method} {urlparse(response.request.url).path}",
+            response.elapsed.total_seconds(),
+        )
         try:
             return response.json()  
         except Exception as e:
@@ -79,11 +85,13 @@ class AgentController:
             )
         )
 
-    def fetch_credentials(self):
+    def fetch_credentials(self, limit=None, offset=None):
         current_app.logger.info("Fetching Credential")
+        params = {k: v for k, v in {"limit": limit, "offset": offset}.items() if v is not None}
         return self._try_return(
             requests.get(
                 f"{self.admin_endpoint}/vc/credentials",
+                params=params,
                 headers=self.tenant_headers,
             )
         )
@@ -1,12 +1,20 @@
 from aries_askar import Store, AskarError
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import copy
 import hashlib
 import logging
 import json
-from typing import TypedDict, Optional, List
+from typing import TypedDict, Optional, List, Dict
 from config import Config
+from app.utils.tracing import traced
+from app.utils.versions import data_versions
 
 logger = logging.getLogger(__name__)
 
+# Sessions shared by AskarStorage instances inside a scoped_session() block, keyed by profile
+_scoped_sessions: ContextVar[dict] = ContextVar("askar_scoped_sessions", default={})
+
 
 class ProfileTags(TypedDict, total=False):
     """Tags for profile storage (client_id -> wallet_id mapping)"""
@@ -45,6 +53,7 @@ class NotificationTags(TypedDict, total=False):
     """Tags for notification storage"""
     type: str  # e.g., 'cred_offer', 'pres_request'
     exchange_id: str
+    # '~created_at': ISO 8601 timestamp, plaintext so it supports $lt/$gt paging
 
 
 class MessageTags(TypedDict, total=False):
@@ -70,10 +79,16 @@ class AskarStorageKeys:
     CREDENTIALS = "credentials"
     CONNECTIONS = "connections"
     NOTIFICATIONS = "notifications"
+    NOTIFICATION_COUNTERS = "notifications/counters"  # Total/unread/by-type badge counts
     MESSAGES = "messages"
     EXCHANGES = "exchanges"
     CRED_OFFERS = "cred_offers"
+    CRED_EX_METADATA = "cred_ex/metadata"  # Offer metadata carried to the done state
+    CREDENTIAL_INDEX = "credentials/index"  # Attribute name -> credentials inverted index
     PRES_REQUESTS = "pres_requests"
+    PRES_EX_MATCHES = "pres_ex/matches"  # Precomputed request matches, key = pres_ex_id
+    PRES_EX_CREDENTIALS = "pres_ex/credentials"  # Agent matches and selection, short-lived, key = pres_ex_id
+    SYNC_STATE = "sync/state"  # Per-wallet sync watermarks, key = synced category
     
     # Legacy/deprecated
     TOKENS = "tokens"
@@ -90,6 +105,7 @@ class AskarStorageKeys:
         NOTIFICATIONS: NotificationTags,
         MESSAGES: MessageTags,
         EXCHANGES: ExchangeTags,
+        CRED_EX_METADATA: ExchangeTags,
     }
 
 class AskarStorage:
@@ -122,9 +138,38 @@ class AskarStorage:
         return cls(profile=cls.GLOBAL_PROFILE)
 
     async def provision(self, recreate=False):
-        """Provision the main Askar store"""
+        """Provision the main Askar store and migrate existing entries"""
         logger.warning(self.db)
-        await Store.provision(self.db, "raw", self.key, recreate=recreate)
+        store = await Store.provision(self.db, "raw", self.key, recreate=recreate)
+        if not recreate:
+            await self._tag_notification_timestamps(store)
+
+    async def _tag_notification_timestamps(self, store):
+        """
+        Add the '~created_at' tag to notifications stored before it existed.
+        
+        Notification pages range over that tag, untagged notifications would
+        never be listed. Only untagged entries are touched, so this is a no-op
+        once every profile has been migrated.
+        """
+        untagged = {"$not": {"$exist": ["~created_at"]}}
+        for profile in await store.list_profiles():
+            try:
+                async with store.transaction(profile) as txn:
+                    entries = await txn.fetch_all(AskarStorageKeys.NOTIFICATIONS, untagged, for_update=True)
+                    for entry in entries or []:
+                        created_at = json.loads(entry.value).get("created_at") or ""
+                        await txn.replace(
+                            AskarStorageKeys.NOTIFICATIONS,
+                            entry.name,
+                            entry.value,
+                            {**(entry.tags or {}), "~created_at": created_at},
+                        )
+                    await txn.commit()
+                if entries:
+                    logger.info(f"✅ Tagged {len(entries)} notifications in profile '{profile}'")
+            except (AskarError, ValueError) as e:
+                logger.error(f"❌ Notification migration failed in profile '{profile}': {e}")
 
     async def create_profile(self, profile_name: str = None):
         """
@@ -155,6 +200,50 @@ class AskarStorage:
         """
         return await Store.open(self.db, "raw", self.key, profile=self.profile)
 
+    @asynccontextmanager
+    async def scoped_session(self):
+        """
+        Share one session for every operation on this profile within the block.
+        
+        Any AskarStorage instance for the same profile (including the ones created
+        by helpers such as create_notification) reuses the scoped session instead of
+        opening the store again. Nested scopes reuse the outer session.
+        
+        Example:
+            askar = AskarStorage.for_wallet(wallet_id)
+            async with askar.scoped_session():
+                wallet = await askar.fetch(AskarStorageKeys.WALLETS)
+                await askar.append(AskarStorageKeys.MESSAGES, message)
+        """
+        sessions = _scoped_sessions.get()
+        if self.profile in sessions:
+            yield sessions[self.profile]
+            return
+        
+        store = await self.open()
+        async with store.session() as session:
+            token = _scoped_sessions.set(sessions | {self.profile: session})
+            try:
+                yield session
+            finally:
+                _scoped_sessions.reset(token)
+
+    @asynccontextmanager
+    async def _session(self):
+        """Yield the scoped session for this profile, or a new short-lived one"""
+        if (session := _scoped_sessions.get().get(self.profile)) is not None:
+            yield session
+            return
+        
+        store = await self.open()
+        async with store.session() as session:
+            yield session
+
+    def _changed(self, category: str):
+        """Bump the data version of a category after a write (drives ETags)"""
+        data_versions.bump(self.profile, category)
+
+    @traced("askar.fetch")
     async def fetch(self, category: str, key: str = "data"):
         """
         Fetch data from this instance's profile.
@@ -173,9 +262,8 @@ class AskarStorage:
             credentials = await wallet_store.fetch("credentials")  # key defaults to "data"
         """
         try:
-            store = await self.open()
             logger.info(f"🔍 Fetching from profile '{self.profile}': category={category}, key={key}")
-            async with store.session() as session:
+            async with self._session() as session:
                 entry = await session.fetch(category, key)
             result = json.loads(entry.value) if entry else None
             logger.info(f"{'✅ Found' if result else '❌ Not found'}")
@@ -184,11 +272,11 @@ class AskarStorage:
             logger.error(f"❌ Fetch failed in profile '{self.profile}': {e}")
             return None
 
+    @traced("askar.fetch_name_by_tag")
     async def fetch_name_by_tag(self, category: str, tags: dict):
         """Fetch entry name by tag from this instance's profile"""
         try:
-            store = await self.open()
-            async with store.session() as session:
+            async with self._session() as session:
                 entries = await session.fetch_all(category, tags, limit=1)
             if entries and len(entries) > 0:
                 return entries[0].name
@@ -196,11 +284,11 @@ class AskarStorage:
         except (AskarError, IndexError, AttributeError):
             return None
 
+    @traced("askar.fetch_entry_by_tag")
     async def fetch_entry_by_tag(self, category: str, tags: dict):
         """Fetch entry by tag from this instance's profile"""
         try:
-            store = await self.open()
-            async with store.session() as session:
+            async with self._session() as session:
                 entries = await session.fetch_all(category, tags, limit=1)
             if entries and len(entries) > 0:
                 return json.loads(entries[0].value)
@@ -208,7 +296,9 @@ class AskarStorage:
         except (AskarError, ValueError, IndexError, AttributeError):
             return None
 
-    async def store(self, category: str, key: str, data: dict, tags: Optional[dict] = None):
+    @traced("askar.store")
+    async def store(self, category: str, key: str, data: dict, tags: Optional[dict] = None,
+                    expiry_ms: Optional[int] = None):
         """
         Store data in this instance's profile.
         
@@ -217,6 +307,7 @@ class AskarStorage:
             key: Storage key within category
             data: Data to store
             tags: Optional tags for indexing (see TAG_MODELS for category-specific tags)
+            expiry_ms: Optional lifetime, Askar stops returning the entry afterwards
         
         Examples:
             # Store wallet with DID tags
@@ -237,16 +328,17 @@ class AskarStorage:
             )
         """
         try:
-            store = await self.open()
             logger.info(f"📝 Storing in profile '{self.profile}': category={category}, key={key}")
-            async with store.session() as session:
-                await session.insert(category, key, json.dumps(data), tags)
+            async with self._session() as session:
+                await session.insert(category, key, json.dumps(data), tags, expiry_ms=expiry_ms)
             logger.info(f"✅ Stored successfully")
+            self._changed(category)
             return True
         except AskarError as e:
             logger.error(f"❌ Store failed in profile '{self.profile}': {e}")
             return False
 
+    @traced("askar.append")
     async def append(self, category: str, data: dict, key: str = "data", tags: dict = None):
         """
         Append to an array in this instance's profile.
@@ -258,8 +350,7 @@ class AskarStorage:
             tags: Optional tags
         """
         try:
-            store = await self.open()
-            async with store.session() as session:
+            async with self._session() as session:
                 entry = await session.fetch(category, key)
                 if entry:
                     entries = json.loads(entry.value)
@@ -267,11 +358,14 @@ class AskarStorage:
                     entries = []
                 entries.append(data)
                 await session.replace(category, key, json.dumps(entries), tags)
+            self._changed(category)
             return True
         except (AskarError, ValueError):
             return False
 
-    async def update(self, category: str, key: str, data: dict, tags: dict = None):
+    @traced("askar.update")
+    async def update(self, category: str, key: str, data: dict, tags: dict = None,
+                     expiry_ms: Optional[int] = None):
         """
         Update/replace data in this instance's profile.
         
@@ -280,15 +374,17 @@ class AskarStorage:
             key: Storage key within category
             data: Data to store
             tags: Optional tags
+            expiry_ms: Optional lifetime, restarted by the update
         """
         try:
-            store = await self.open()
-            async with store.session() as session:
-                await session.replace(category, key, json.dumps(data), tags)
+            async with self._session() as session:
+                await session.replace(category, key, json.dumps(data), tags, expiry_ms=expiry_ms)
+            self._changed(category)
             return True
         except AskarError:
             return False
 
+    @traced("askar.delete")
     async def delete(self, category: str, key: str):
         """
         Delete an entry from this instance's profile.
@@ -298,26 +394,166 @@ class AskarStorage:
             key: Storage key within category
         """
         try:
-            store = await self.open()
-            async with store.session() as session:
+            async with self._session() as session:
                 await session.remove(category, key)
+            self._changed(category)
             return True
         except AskarError:
             # Profile doesn't exist or key not found - consider it deleted
             return True
 
-    async def fetch_all_by_tag(self, category: str, tags: dict):
+    @traced("askar.delete_all")
+    async def delete_all(self, category: str, tags: dict = None):
+        """
+        Delete every entry of a category (optionally matching tags) from this instance's profile.
+        
+        Returns:
+            Number of entries removed
+        """
+        try:
+            async with self._session() as session:
+                removed = await session.remove_all(category, tags)
+            if removed:
+                self._changed(category)
+            return removed
+        except AskarError as e:
+            logger.error(f"❌ Delete all failed in profile '{self.profile}': {category}: {e}")
+            return 0
+
+    @traced("askar.modify")
+    async def modify(self, category: str, key: str, mutate, default=None, tags: dict = None):
+        """
+        Atomically read, change and write back one entry in a transaction.
+        
+        Args:
+            category: Storage category
+            key: Storage key within category
+            mutate: Function receiving the current data (or a copy of `default`
+                    when the entry is missing) and returning the data to store
+            default: Data to start from when the entry does not exist
+            tags: Optional tags
+        
+        Returns:
+            The stored data, or None if the transaction failed
+        """
+        try:
+            store = await self.open()
+            async with store.transaction() as txn:
+                entry = await txn.fetch(category, key, for_update=True)
+                current = json.loads(entry.value) if entry else copy.deepcopy(default)
+                updated = mutate(current)
+                if entry:
+                    await txn.replace(category, key, json.dumps(updated), tags)
+                else:
+                    await txn.insert(category, key, json.dumps(updated), tags)
+                await txn.commit()
+            self._changed(category)
+            return updated
+        except (AskarError, ValueError) as e:
+            logger.error(f"❌ Modify failed in profile '{self.profile}': {category}/{key}: {e}")
+            return None
+
+    @traced("askar.fetch_key")
+    async def fetch_key(self, name: str):
+        """
+        Fetch a key held in this instance's profile.
+        
+        Returns:
+            The aries_askar Key, or None if there is no key with that name
+        """
+        try:
+            async with self._session() as session:
+                entry = await session.fetch_key(name)
+                return entry.key if entry else None
+        except AskarError as e:
+            logger.error(f"❌ Fetch key failed in profile '{self.profile}': {name}: {e}")
+            return None
+
+    @traced("askar.store_key")
+    async def store_key(self, name: str, key, tags: dict = None):
+        """
+        Keep a key in this instance's profile; the secret never leaves Askar storage.
+        
+        Returns:
+            True when stored, False if the name is taken or the insert failed
+        """
+        try:
+            async with self._session() as session:
+                await session.insert_key(name, key, tags=tags)
+            return True
+        except AskarError as e:
+            logger.error(f"❌ Store key failed in profile '{self.profile}': {name}: {e}")
+            return False
+
+    @traced("askar.write_batch")
+    async def write_batch(self, append: Dict[str, list] = None, insert: List[tuple] = None):
+        """
+        Append to data arrays and insert entries in a single transaction.
+        
+        Args:
+            append: Category -> items added to its "data" array
+            insert: (category, key, data, tags) entries to insert
+        
+        Returns:
+            True when everything was committed, False when nothing was
+        """
+        append, insert = append or {}, insert or []
+        try:
+            store = await self.open()
+            async with store.transaction() as txn:
+                for category, items in append.items():
+                    entry = await txn.fetch(category, "data", for_update=True)
+                    if entry:
+                        await txn.replace(category, "data", json.dumps(json.loads(entry.value) + list(items)))
+                    else:
+                        await txn.insert(category, "data", json.dumps(list(items)))
+                for category, key, data, tags in insert:
+                    await txn.insert(category, key, json.dumps(data), tags)
+                await txn.commit()
+            for category in {*append, *(entry[0] for entry in insert)}:
+                self._changed(category)
+            return True
+        except (AskarError, ValueError) as e:
+            logger.error(f"❌ Batch write failed in profile '{self.profile}': {e}")
+            return False
+
+    @traced("askar.fetch_page")
+    async def fetch_page(self, category: str, tags: dict, limit: int, descending: bool = True):
+        """
+        Fetch up to `limit` entries matching tags, ordered by insertion.
+        
+        Ordering happens in storage (entry id), so callers page with a tag
+        filter on a plaintext tag such as {"~created_at": {"$lt": cursor}}.
+        
+        Args:
+            category: Storage category
+            tags: Tags to filter by
+            limit: Maximum number of entries
+            descending: Newest entries first
+        """
+        try:
+            async with self._session() as session:
+                entries = await session.fetch_all(
+                    category, tags, limit=limit, order_by="id", descending=descending
+                )
+                return [json.loads(entry.value) for entry in entries or []]
+        except (AskarError, ValueError, AttributeError) as e:
+            logger.error(f"❌ Fetch page failed in profile '{self.profile}': {e}")
+            return []
+
+    @traced("askar.fetch_all_by_tag")
+    async def fetch_all_by_tag(self, category: str, tags: dict, limit: Optional[int] = 100):
         """
         Fetch all entries matching tags from this instance's profile.
         
         Args:
             category: Storage category
             tags: Tags to filter by
+            limit: Maximum number of entries (None for no limit)
         """
         try:
-            store = await self.open()
-            async with store.session() as session:
-                entries = await session.fetch_all(category, tags, limit=100)
+            async with self._session() as session:
+                entries = await session.fetch_all(category, tags, limit=limit)
                 results = []
                 if entries:
                     for entry in entries:
@@ -1,8 +1,9 @@
-import requests
+import httpx
 from flask import current_app
 from app.plugins.vcapi import VcApiExchanger
 from app.plugins.acapy import AgentController
 from app.plugins.askar import AskarStorage, AskarStorageKeys
+from app.utils.http_client import http_client
 import json
 import base64
 
@@ -36,11 +37,12 @@ class QRScanner:
                 
             elif payload.split('?')[-1].startswith('_oobid='):
                 try:
-                    r = requests.get(payload)
-                    invitation = r.json()
-                    await self.didcomm_handler(invitation)
-                except:
-                    current_app.logger.info(r.text)
+                    # Not cached: _oobid invitations are single-use
+                    invitation = await http_client.get_json(payload)
+                    if isinstance(invitation, dict):
+                        await self.didcomm_handler(invitation)
+                except (httpx.HTTPError, ValueError) as e:
+                    current_app.logger.warning(f"Could not resolve invitation {payload}: {e}")
         
         current_app.logger.info("No matching URL scheme found")
         return {"type": "unknown", "message": "No matching URL scheme found"}
@@ -58,18 +60,34 @@ class QRScanner:
 
     async def iuv_handler(self, payload):
         current_app.logger.info("Interactions URL")
-        r = requests.get(payload, headers={"Accept": "application/json"})
-        protocols = r.json().get("protocols")
+        try:
+            document = await http_client.get_json(payload, headers={"Accept": "application/json"}, cache=True)
+        except (httpx.HTTPError, ValueError) as e:
+            current_app.logger.warning(f"Could not fetch interaction URL {payload}: {e}")
+            return None
+        protocols = (document.get("protocols") if isinstance(document, dict) else None) or {}
         if protocols.get("vcapi", None):
             current_app.logger.info("VC API Exchange")
             
             vcapi = VcApiExchanger(self.wallet_id, protocols.get("vcapi"))
             
-            exchange = vcapi.initiate_exchange()
+            try:
+                exchange = await vcapi.initiate_exchange()
+            except (httpx.HTTPError, ValueError) as e:
+                current_app.logger.warning(f"Could not initiate exchange {protocols.get('vcapi')}: {e}")
+                return None
+            if not isinstance(exchange, dict):
+                current_app.logger.warning(f"Unexpected exchange response from {protocols.get('vcapi')}")
+                return None
             
             if exchange.get("verifiablePresentation", None):
                 current_app.logger.info("Verifiable Presentation")
-                await vcapi.store_credential(exchange.get("verifiablePresentation"))
+                results = await vcapi.store_credential(exchange.get("verifiablePresentation"))
+                stored = sum(1 for result in results if result["stored"])
+                current_app.logger.info(f"Stored {stored}/{len(results)} credentials")
+                for result in results:
+                    if not result["stored"]:
+                        current_app.logger.warning(f"Credential {result['id']} not stored: {result['error']}")
 
             elif exchange.get("verifiablePresentationRequest", None):
                 current_app.logger.info("Verifiable Presentation Request")
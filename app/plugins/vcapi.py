@@ -1,11 +1,18 @@
-import requests
+import asyncio
+import httpx
 import uuid
 from datetime import datetime
+from flask import current_app
+from config import Config
 from app.plugins.acapy import AgentController
 from app.plugins.askar import AskarStorage, AskarStorageKeys
 from app.models.notification import Notification
-
-agent = AgentController()
+from app.utils import build_notification, notification_entry, count_new_notifications
+from app.utils.credential_index import credential_key, update_credential_index
+from app.utils.http_client import http_client
+from app.utils.vc_query import CredentialQueryIndex
+from app.utils.vc_verify import UnsupportedProof, verify_credentials, verified_only
+from app.utils.vp_signing import default_suite, local_holder, sign_document
 
 
 class VcApiExchanger:
@@ -14,41 +21,118 @@ class VcApiExchanger:
         self.exchange_url = exchange_url
         self.askar = AskarStorage.for_wallet(wallet_id) if wallet_id else AskarStorage.global_store()
 
-    def initiate_exchange(self):
-        r = requests.post(self.exchange_url, json={})
-        return r.json()
+    async def initiate_exchange(self):
+        return await http_client.post_json(self.exchange_url, {})
 
     async def store_credential(self, vp):
+        """
+        Ingest every credential of a verifiable presentation in one batch.
+
+        Proofs are verified locally first (VC_VERIFICATION); credentials with
+        a proof that was checked and failed are rejected, while credentials
+        whose proofs cannot be checked locally are stored with a warning. The
+        agent stores run concurrently with a single token on a controller of
+        their own; the credentials the agent accepted and their notifications
+        are then written in one transaction.
+
+        Returns:
+            One {"id", "stored", "error"} result per credential, in VP order
+        """
         wallet = await self.askar.fetch(AskarStorageKeys.WALLETS)
-        for vc in vp.get("verifiableCredential"):
-            agent.set_token(
-                agent.request_token(self.wallet_id, wallet.get("wallet_key")).get(
-                    "token"
-                )
-            )
+        credentials = vp.get("verifiableCredential") or []
+        credentials = list(credentials) if isinstance(credentials, list) else [credentials]
+
+        # We verify the proofs locally, rejecting credentials with a failed proof
+        errors = [None] * len(credentials)
+        if Config.VC_VERIFICATION != "off":
+            verifications = await asyncio.to_thread(verify_credentials, credentials)
+            for position, verification in enumerate(verifications):
+                if verification["failed"]:
+                    errors[position] = verification["error"]
+                elif verification["verified"]:
+                    credentials[position] = verified_only(credentials[position], verification)
+                else:
+                    current_app.logger.warning(
+                        f"Storing unverified credential {credential_key(credentials[position])}: "
+                        f"{verification['error']}"
+                    )
 
-            # TODO, verify credential & remove unverifiable proofs
-            # We store the VC in the cloud agent
-            agent.store_credential(vc)
+        # One token for the whole batch, on a controller no other request shares
+        agent = AgentController()
+        agent.set_token(
+            agent.request_token(self.wallet_id, wallet.get("wallet_key")).get("token")
+        )
 
-            # We store the VC in the server store
-            await self.askar.append("credentials", vc)
+        # We store the VCs in the cloud agent, a bounded number at a time
+        limit = asyncio.Semaphore(max(1, Config.VCAPI_STORE_CONCURRENCY))
+
+        async def store_in_agent(vc):
+            async with limit:
+                try:
+                    response = await asyncio.to_thread(agent.store_credential, vc)
+                except Exception as e:
+                    return str(e)
+                if response is None or (isinstance(response, dict) and response.get("error")):
+                    return (response or {}).get("error") or "Agent did not store the credential"
+                return None
+
+        verified = [position for position, error in enumerate(errors) if error is None]
+        stored_errors = await asyncio.gather(*(store_in_agent(credentials[position]) for position in verified))
+        for position, error in zip(verified, stored_errors):
+            errors[position] = error
+        results = [
+            {"id": credential_key(vc), "stored": error is None, "error": error}
+            for vc, error in zip(credentials, errors)
+        ]
+        stored = [vc for vc, error in zip(credentials, errors) if error is None]
+        if not stored:
+            return results
+
+        # We store the VCs and their event notifications in the server store
+        notifications = [
+            build_notification(
+                str(uuid.uuid4()),
+                "vcapi_exchange",
+                "Credential Stored",
+                Notification(
+                    id=credential_key(vc),
+                    type="vcapi_exchange",
+                    title="Credential Stored",
+                    origin=vc["issuer"]
+                    if isinstance(vc["issuer"], str)
+                    else vc["issuer"]["id"],
+                    message="Credential Stored",
+                    timestamp=str(datetime.now().isoformat()),
+                ).model_dump(),
+            )
+            for vc in stored
+        ]
+        committed = await self.askar.write_batch(
+            append={AskarStorageKeys.CREDENTIALS: stored},
+            insert=[notification_entry(notification) for notification in notifications],
+        )
+        if not committed:
+            for result in results:
+                if result["stored"]:
+                    result.update(stored=False, error="Wallet storage failed")
+            return results
 
-            # We create an event notification
-            notification = Notification(
-                id=str(uuid.uuid4()),
-                type="vcapi_exchange",
-                title="Credential Stored",
-                origin=vc["issuer"]
-                if isinstance(vc["issuer"], str)
-                else vc["issuer"]["id"],
-                message="Credential Stored",
-                timestamp=str(datetime.now().isoformat()),
-            ).model_dump()
-            await self.askar.append("notifications", notification)
+        await update_credential_index(self.askar, added=stored)
+        await count_new_notifications(self.askar, "vcapi_exchange", len(notifications))
+        return results
 
     async def present_credential(self, vpr):
-        wallet = await self.askar.fetch("wallet")
+        wallet = await self.askar.fetch(AskarStorageKeys.WALLETS)
+        reason = None
+
+        # In-process signing needs the holder key in Askar; wallets whose holder
+        # DID was created by the agent keep signing through it, so the holder
+        # and the signer are always the same DID
+        local = None
+        if Config.VP_SIGNING == "local":
+            local = await local_holder(self.askar, create=False)
+            if local and local[1] != wallet["holder_id"]:
+                local = None
 
         # Start building presentation object
         presentation = {
@@ -58,16 +142,17 @@ class VcApiExchanger:
 
         # Define proof options
         proof_options = {
-            # TODO, how to select cryptosuite? Default to 'Ed25519Signature2020' for now
-            "proofType": "Ed25519Signature2020",
+            # Locally, the suite the installed canonicalization supports
+            "proofType": default_suite() if local else "Ed25519Signature2020",
             "domain": vpr.get("domain"),
             "challenge": vpr.get("challenge"),
             "proofPurpose": "authentication",
         }
 
-        # TODO, implement tag query for credential selection
-        # Get all credentials from wallet
-        credentials = await self.askar.fetch("credentials")
+        # Index the wallet's credentials once for every QueryByExample below
+        credentials = CredentialQueryIndex(
+            await self.askar.fetch(AskarStorageKeys.CREDENTIALS) or []
+        )
         for query in vpr.get("query"):
             if query.get("type") == "DIDAuthentication":
                 methods = [method["method"] for method in query.get("acceptedMethods")]
@@ -85,86 +170,76 @@ class VcApiExchanger:
                 if not presentation.get("verifiableCredential"):
                     presentation["verifiableCredential"] = []
 
-                cred_queries = query.get("credentialQuery")
-                cred_queries = (
-                    cred_queries if isinstance(cred_queries, list) else [cred_queries]
-                )
-                for cred_query in cred_queries:
-                    # Check if the requested credential is required, ignore if optional...
-                    if not cred_query.get("required", True):
-                        continue
-
-                    # TODO, process required trusted issuers
-                    # trusted_issuers = cred_query.get('trustedIssuer', [])
-                    reason = cred_query.get("reason")
-                    example = cred_query.get("example")
-                    accepted_cryptosuites = cred_query.get("acceptedCryptosuites")
-
-                    # TODO, more comprehensive selection might be needed
-                    vc = next(
-                        (
-                            credential
-                            for credential in credentials
-                            if set(example["type"]).issubset(credential["type"])
-                            and set(example["@context"]).issubset(
-                                credential["@context"]
-                            )
-                        ),
-                        None,
+                # Optional credential queries are not answered
+                cred_queries = [
+                    cred_query
+                    for cred_query in (
+                        query.get("credentialQuery")
+                        if isinstance(query.get("credentialQuery"), list)
+                        else [query.get("credentialQuery")]
                     )
+                    if cred_query and cred_query.get("required", True)
+                ]
 
-                    # We remove the proofs and force into an array
-                    proofs = vc.pop("proof")
-                    proofs = proofs if isinstance(proofs, list) else [proofs]
-
-                    # We filter out proofs which don't have an accepted cryptosuite
-                    for proof in proofs:
-                        if (
-                            proof.get("type") == "Ed25519Signature2020"
-                            and "Ed25519Signature2020" not in accepted_cryptosuites
-                        ):
-                            proofs.remove(proof)
-                        elif (
-                            proof.get("type") == "DataIntegrityProof"
-                            and proof.get("cryptosuite") not in accepted_cryptosuites
-                        ):
-                            proofs.remove(proof)
-
-                    # We abandon the exchange if no proof is left
-                    if len(proofs) == 0:
-                        continue
+                # Every query is answered from the same indexes, stored credentials stay untouched
+                for answer in credentials.answer(cred_queries):
+                    reason = answer["query"].get("reason")
 
-                    # We select the first filtered proof to include in the presentation
-                    vc["proof"] = proofs[0]
+                    # Skip queries without a credential holding an accepted proof
+                    if answer["credential"] is None:
+                        continue
 
                     # We append our credential matching the requested query
-                    presentation["verifiableCredential"].append(vc)
-
-                    # We move onto the next query
-                    continue
+                    presentation["verifiableCredential"].append(answer["credential"])
 
         # We sign the presentation
-        agent.set_token(
-            agent.request_token(self.wallet_id, wallet.get("wallet_key")).get("token")
-        )
-        vp = agent.sign_presentation(presentation, proof_options).get(
-            "verifiablePresentation"
-        )
+        if local:
+            # In-process, with the holder key kept in the wallet's Askar profile
+            key, _, verification_method = local
+            try:
+                vp = sign_document(
+                    presentation,
+                    key,
+                    verification_method,
+                    suite=proof_options["proofType"],
+                    proof_purpose=proof_options["proofPurpose"],
+                    challenge=proof_options["challenge"],
+                    domain=proof_options["domain"],
+                )
+            except UnsupportedProof as e:
+                # If the presentation cannot be signed, we abandon the exchange
+                current_app.logger.error(f"Local presentation signing failed: {e}")
+                return
+        else:
+            agent = AgentController()
+            agent.set_token(
+                agent.request_token(self.wallet_id, wallet.get("wallet_key")).get("token")
+            )
+            vp = agent.sign_presentation(presentation, proof_options).get(
+                "verifiablePresentation"
+            )
 
         # We send the verifiable presentation to the exchange endpoint
-        r = requests.post(self.exchange_url, json={"verifiablePresentation": vp})
-
-        # If the response fails, we abandon the exchange
-        if r.status_code != 200:
+        try:
+            await http_client.post_json(self.exchange_url, {"verifiablePresentation": vp})
+        except (httpx.HTTPError, ValueError):
+            # If the response fails, we abandon the exchange
             return
 
         # We store an event notification of the presentation exchange
-        notification = Notification(
-            id=str(uuid.uuid4()),
-            type="vcapi_exchange",
-            title="Presentation Sent",
-            origin=vpr.get("domain"),
-            message=reason,
-            timestamp=str(datetime.now().isoformat()),
-        ).model_dump()
-        await self.askar.append("notifications", notification)
+        notification_id = str(uuid.uuid4())
+        notification = build_notification(
+            notification_id,
+            "vcapi_exchange",
+            "Presentation Sent",
+            Notification(
+                id=notification_id,
+                type="vcapi_exchange",
+                title="Presentation Sent",
+                origin=vpr.get("domain"),
+                message=reason,
+                timestamp=str(datetime.now().isoformat()),
+            ).model_dump(),
+        )
+        if await self.askar.write_batch(insert=[notification_entry(notification)]):
+            await count_new_notifications(self.askar, "vcapi_exchange", 1)
@@ -1,4 +1,5 @@
 import webauthn
+from flask import current_app
 import datetime
 import json
 import base64
@@ -22,6 +23,14 @@ class WebAuthnProvider:
         self.challenge_exp = 10  # Challenge expiration minutes
         self.askar = AskarStorage.global_store()  # WebAuthn credentials are global
 
+    def _save_challenge(self, store_name, client_id, challenge):
+        """Keep a challenge for challenge_exp minutes in the configured challenge store"""
+        store = current_app.config[store_name]
+        if current_app.config["SESSION_TYPE"] == "redis":
+            store.set(client_id, challenge, ex=datetime.timedelta(minutes=self.challenge_exp))
+        else:
+            store.set(client_id, challenge, timeout=self.challenge_exp * 60)
+
     async def prepare_credential_creation(self, client_id, username):
         public_credential_creation_options = webauthn.generate_registration_options(
             rp_id=self.rp_id,
@@ -29,13 +38,9 @@ class WebAuthnProvider:
             user_id=client_id.encode(),
             user_name=username,
         )
-        Config.REGISTRATION_CHALLENGES.set(
-            client_id, public_credential_creation_options.challenge
+        self._save_challenge(
+            "REGISTRATION_CHALLENGES", client_id, public_credential_creation_options.challenge
         )
-        if Config.SESSION_TYPE == "redis":
-            Config.REGISTRATION_CHALLENGES.expire(
-                client_id, datetime.timedelta(minutes=self.challenge_exp)
-            )
 
         return json.loads(webauthn.options_to_json(public_credential_creation_options))
 
@@ -58,7 +63,7 @@ class WebAuthnProvider:
 
     async def verify_and_save_credential(self, client_id, registration_credential):
         """Verify that a new credential is valid for the"""
-        expected_challenge = Config.REGISTRATION_CHALLENGES.get(client_id)
+        expected_challenge = current_app.config["REGISTRATION_CHALLENGES"].get(client_id)
 
         # If the credential is somehow invalid (i.e. the challenge is wrong),
         # this will raise an exception. It's easier to handle that in the view
@@ -69,6 +74,7 @@ class WebAuthnProvider:
             expected_origin=self.origin,
             expected_rp_id=self.rp_id,
         )
+        current_app.config["REGISTRATION_CHALLENGES"].delete(client_id)
 
         # At this point verification has succeeded and we can save the credential
         credential = WebAuthnCredential(
@@ -105,13 +111,9 @@ class WebAuthnProvider:
             allow_credentials=allowed_credentials,
         )
 
-        Config.AUTHENTICATION_CHALLENGES.set(
-            client_id, authentication_options.challenge
+        self._save_challenge(
+            "AUTHENTICATION_CHALLENGES", client_id, authentication_options.challenge
         )
-        if Config.SESSION_TYPE == "redis":
-            Config.REGISTRATION_CHALLENGES.expire(
-                client_id, datetime.timedelta(minutes=self.challenge_exp)
-            )
 
         return json.loads(webauthn.options_to_json(authentication_options))
 
@@ -136,7 +138,7 @@ class WebAuthnProvider:
             ),
             type="public-key",
         )
-        expected_challenge = Config.AUTHENTICATION_CHALLENGES.get(client_id)
+        expected_challenge = current_app.config["AUTHENTICATION_CHALLENGES"].get(client_id)
         tags = {"client_id": client_id}
         credential_id = await self.askar.fetch_name_by_tag(AskarStorageKeys.WEB_AUTHN_CREDENTIALS, tags)
         credential = await self.askar.fetch(AskarStorageKeys.WEB_AUTHN_CREDENTIALS, credential_id)
@@ -153,11 +155,8 @@ class WebAuthnProvider:
             credential_current_sign_count=credential["current_sign_count"],
         )
 
-        # After a successful authentication, expire the challenge so it can't be used again.
-        if Config.SESSION_TYPE == "redis":
-            Config.AUTHENTICATION_CHALLENGES.expire(
-                client_id, datetime.timedelta(seconds=1)
-            )
+        # After a successful authentication, drop the challenge so it can't be used again.
+        current_app.config["AUTHENTICATION_CHALLENGES"].delete(client_id)
 
         # Update the credential sign count after using, then save it back to the database.
         # This is mainly for reference since we can't use it because of Safari's weirdness.
@@ -12,6 +12,7 @@ from flask import (
 from config import Config
 from app.plugins import AgentController, AskarStorage, WebAuthnProvider, AskarStorageKeys
 from app.operations import provision_wallet
+from app.scheduler import schedule_sync
 from webauthn.helpers.exceptions import (
     InvalidRegistrationResponse,
     InvalidAuthenticationResponse,
@@ -124,6 +125,7 @@ def login():
             await_(wallet_askar.update(AskarStorageKeys.WALLETS, "data", wallet))
 
             session["client_id"], session["wallet_id"] = client_id, wallet["wallet_id"]
+            schedule_sync(client_id, priority=True)
 
             return jsonify({"verified": True}), 200
 
@@ -11,8 +11,19 @@ from flask import (
     stream_with_context,
 )
 from app.plugins import QRScanner, AskarStorage, AskarStorageKeys
-from app.operations import sync_session, sign_in_agent
-from app.utils import notification_broadcaster, is_mobile
+from app.operations import sync_session, sign_in_agent, list_connections, load_wallet_view
+from app.scheduler import schedule_sync
+from app.utils import (
+    notification_broadcaster,
+    is_mobile,
+    format_sse,
+    parse_last_event_id,
+    get_notifications_page,
+    get_notification_counters,
+    mark_notification_read,
+)
+from app.utils.pagination import page_size, parse_fields, project, page_response
+from app.utils.versions import etag_for
 from asyncio import run as await_
 import json
 import os
@@ -49,12 +60,76 @@ def index():
     
     # Mobile users - proceed with wallet interface
     try:
-        await_(sync_session(session.get("client_id")))
+        wallet_id = await_(sync_session(session.get("client_id")))
     except ValueError:
         # Profile doesn't exist yet (incomplete registration)
         session.clear()
         return redirect(url_for("auth.index"))
-    return render_template("pages/index.jinja")
+    
+    # Agent reconciliation happens in the background, the page reads local data
+    schedule_sync(session.get("client_id"))
+    view = await_(load_wallet_view(wallet_id))
+    return render_template(
+        "pages/index.jinja",
+        credentials=view["credentials"]["items"],
+        credentials_page=view["credentials"],
+        connections=view["connections"]["items"],
+        connections_page=view["connections"],
+        notifications=view["notifications"]["notifications"],
+        notifications_page=view["notifications"],
+        notification_counters=view["notification_counters"],
+    )
+
+
+@bp.route("/notifications", methods=["GET"])
+@etag_for(AskarStorageKeys.NOTIFICATIONS)
+def list_notifications():
+    """Page through notifications, newest first (?limit=&cursor=&fields=)"""
+    wallet_id = session.get("wallet_id")
+    
+    if not wallet_id:
+        return jsonify({"error": "No wallet_id in session"}), 401
+    
+    page = await_(get_notifications_page(
+        wallet_id,
+        limit=page_size(request.args.get('limit', type=int)),
+        cursor=request.args.get('cursor')
+    ))
+    fields = parse_fields(request.args.get('fields'))
+    return page_response(
+        {
+            'items': [project(notification, fields) for notification in page['notifications']],
+            'next_cursor': page['next_cursor'],
+        },
+        'notifications',
+        'components/lists/notifications.jinja',
+    )
+
+
+@bp.route("/notifications/counters", methods=["GET"])
+@etag_for(AskarStorageKeys.NOTIFICATION_COUNTERS)
+def notification_counters():
+    """Badge counts: total, unread and by type"""
+    wallet_id = session.get("wallet_id")
+    
+    if not wallet_id:
+        return jsonify({"error": "No wallet_id in session"}), 401
+    
+    return jsonify(await_(get_notification_counters(wallet_id)))
+
+
+@bp.route("/notifications/<notification_id>/read", methods=["POST"])
+def read_notification(notification_id):
+    """Mark a notification as read"""
+    wallet_id = session.get("wallet_id")
+    
+    if not wallet_id:
+        return jsonify({"error": "No wallet_id in session"}), 401
+    
+    notification = await_(mark_notification_read(wallet_id, notification_id))
+    if not notification:
+        return jsonify({"error": "Notification not found"}), 404
+    return jsonify(notification)
 
 
 @bp.route("/notifications/stream")
@@ -65,22 +140,37 @@ def notification_stream():
     if not wallet_id:
         return jsonify({"error": "No wallet_id in session"}), 401
     
+    # EventSource sends Last-Event-ID on reconnect, manual reconnects pass it as a query arg
+    last_event_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    )
+    
     @stream_with_context
     def generate():
         # Subscribe to notifications for this wallet
         q = notification_broadcaster.subscribe(wallet_id)
+        last_sent = last_event_id or 0
         
         try:
             # Send initial connection message
             yield f"data: {json.dumps({'type': 'connected', 'wallet_id': wallet_id})}\n\n"
             
+            # Replay events missed while the client was away
+            for event in notification_broadcaster.catch_up(wallet_id, last_event_id):
+                last_sent = max(last_sent, event.get('id', 0))
+                yield format_sse(event)
+            
             # Keep connection alive and send events
             while True:
                 try:
                     # Wait for event with timeout to send keepalive
                     import queue as queue_module
                     event = q.get(timeout=30)
-                    yield f"data: {json.dumps(event)}\n\n"
+                    # Skip events already sent during catch-up
+                    if event.get('id', 0) <= last_sent:
+                        continue
+                    last_sent = event['id']
+                    yield format_sse(event)
                 except queue_module.Empty:
                     # Send keepalive comment
                     yield ": keepalive\n\n"
@@ -165,7 +255,26 @@ def get_connection_status():
         return jsonify({"state": "error", "connected": False, "error": str(e)})
 
 
+@bp.route("/connections", methods=["GET"])
+@etag_for(AskarStorageKeys.CONNECTIONS)
+def list_connections_page():
+    """Page through connections (?limit=&cursor=&fields=)"""
+    wallet_id = session.get("wallet_id")
+    
+    if not wallet_id:
+        return jsonify({"error": "No wallet_id in session"}), 401
+    
+    page = await_(list_connections(
+        wallet_id,
+        cursor=request.args.get('cursor'),
+        limit=page_size(request.args.get('limit', type=int)),
+        fields=parse_fields(request.args.get('fields'))
+    ))
+    return page_response(page, 'connections', 'components/lists/connections.jinja')
+
+
 @bp.route("/connections/<connection_id>", methods=["GET"])
+@etag_for(AskarStorageKeys.CONNECTIONS, AskarStorageKeys.MESSAGES)
 def get_connection_details(connection_id):
     """Get connection details and messages"""
     wallet_id = session.get("wallet_id")
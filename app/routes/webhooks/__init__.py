@@ -1,15 +1,28 @@
-from flask import Blueprint, abort,  render_template, url_for, current_app, session, redirect, jsonify, request
+from flask import Blueprint, abort,  render_template, url_for, current_app, session, redirect, jsonify, request, Response, g
 import asyncio
+import math
+import time
 from asyncio import run as await_
 from app.plugins import AskarStorage, AgentController, AskarStorageKeys
+from app.utils import metrics
+from app.utils.tracing import EventTrace, span
 # from app.operations import beautify_anoncreds
+from .admission import AdmissionController
 from .manager import WebhookManager
+from .telemetry import record_event, request_queue_wait
 from .models import Message, CredentialOffer, PresentationRequest, Notification
 from config import Config
 
 bp = Blueprint("webhooks", __name__)
 
 
+admission = AdmissionController(
+    rate=Config.WEBHOOK_RATE_PER_WALLET,
+    burst=Config.WEBHOOK_BURST_PER_WALLET,
+    max_concurrency=Config.WEBHOOK_MAX_CONCURRENCY,
+)
+
+
 @bp.before_request
 def before_request_callback():
     api_key = request.headers.get('X-API-KEY')
@@ -17,18 +30,135 @@ def before_request_callback():
         return {"message": "Unauthorized"}, 401
     elif api_key != Config.AGENT_ADMIN_API_KEY:
         return {"message": "Unauthorized"}, 401
+    
+    if request.endpoint == 'webhooks.webhook_metrics':
+        return None
+    
+    if not admission.acquire_slot():
+        current_app.logger.warning("Webhook shed: too many concurrent requests")
+        return {"message": "Service overloaded"}, 503, {"Retry-After": str(Config.WEBHOOK_RETRY_AFTER)}
+    g.webhook_slot = True
+    
+    # Batched events are charged per event in process_batch
+    if request.endpoint == 'webhooks.webhook_topic':
+        wallet_id = request.headers.get('X-WALLET-ID')
+        if retry_after := admission.admit(wallet_id):
+            current_app.logger.warning(f"Webhook rate limited for wallet: {wallet_id}")
+            return {"message": "Too many requests"}, 429, {"Retry-After": str(math.ceil(retry_after))}
+
+
+@bp.teardown_request
+def teardown_request_callback(exc=None):
+    if g.pop('webhook_slot', False):
+        admission.release_slot()
 
 @bp.route("/topic/<topic>/", methods=["POST"])
 def webhook_topic(topic: str):
     wallet_id = request.headers.get('X-WALLET-ID')
     current_app.logger.info(f"Webhook received for wallet: {wallet_id}, topic: {topic}")
     
-    # Fetch wallet from storage using wallet-specific askar instance
-    wallet_askar = AskarStorage.for_wallet(wallet_id)
-    if not (wallet := await_(wallet_askar.fetch(AskarStorageKeys.WALLETS))):
-        current_app.logger.error(f"Wallet not found: {wallet_id}")
-        return {"message": "Wallet not found"}, 404
+    payload = request.json
+    status = 500
+    trace = EventTrace(topic, payload.get('state'), wallet_id, queue_wait=request_queue_wait())
+    try:
+        with trace:
+            # Fetch wallet from storage using wallet-specific askar instance
+            wallet_askar = AskarStorage.for_wallet(wallet_id)
+            with span('wallet_resolution'):
+                wallet = await_(wallet_askar.fetch(AskarStorageKeys.WALLETS))
+            if not wallet:
+                current_app.logger.error(f"Wallet not found: {wallet_id}")
+                status = 404
+                return {"message": "Wallet not found"}, 404
+            
+            body, status = await_(
+                WebhookManager(wallet).handle_topic(topic, payload)
+            )
+            return body, status
+    finally:
+        record_event(trace, status)
+
+
+@bp.route("/metrics", methods=["GET"])
+def webhook_metrics():
+    """Expose webhook counters and histograms in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route("/batch", methods=["POST"])
+def webhook_batch():
+    """
+    Process many webhook events in one request.
+    
+    Expects a JSON array of {"topic", "wallet_id", "payload"} objects. Events are
+    grouped by wallet so each wallet is resolved once and its events share a single
+    storage session. Returns one result per event, in request order.
+    """
+    events = request.get_json(silent=True)
+    if not isinstance(events, list):
+        return {"message": "Expected an array of events"}, 400
+    
+    current_app.logger.info(f"Webhook batch received: {len(events)} events")
+    return {"results": await_(process_batch(events, received_at=time.perf_counter() - request_queue_wait()))}, 200
+
+
+async def process_batch(events: list, received_at: float = None) -> list:
+    """Handle batched events wallet by wallet, keeping results in request order"""
+    received_at = received_at or time.perf_counter()
+    results = [None] * len(events)
+    
+    groups = {}
+    for index, event in enumerate(events):
+        if not isinstance(event, dict) or not event.get('topic') or not event.get('wallet_id'):
+            results[index] = {"index": index, "status": 400, "body": {"message": "Invalid event"}}
+            continue
+        groups.setdefault(event['wallet_id'], []).append(index)
+    
+    for wallet_id, indexes in groups.items():
+        wallet_askar = AskarStorage.for_wallet(wallet_id)
+        async with wallet_askar.scoped_session():
+            resolve_started = time.perf_counter()
+            wallet = await wallet_askar.fetch(AskarStorageKeys.WALLETS)
+            resolve_seconds = time.perf_counter() - resolve_started
+            manager = WebhookManager(wallet) if wallet else None
+            
+            for index in indexes:
+                topic = events[index]['topic']
+                payload = events[index].get('payload') or {}
+                result = {"index": index, "topic": topic, "wallet_id": wallet_id}
+                
+                if retry_after := admission.admit(wallet_id):
+                    results[index] = result | {
+                        "status": 429,
+                        "body": {"message": "Too many requests"},
+                        "retry_after": math.ceil(retry_after),
+                    }
+                    continue
+                
+                trace = EventTrace(
+                    topic, payload.get('state'), wallet_id,
+                    queue_wait=time.perf_counter() - received_at,
+                )
+                status = 500
+                with trace:
+                    # The wallet is resolved once per group, charge it to the first event
+                    if index == indexes[0]:
+                        trace.add('wallet_resolution', resolve_seconds)
+                    
+                    if not manager:
+                        current_app.logger.error(f"Wallet not found: {wallet_id}")
+                        status = 404
+                        results[index] = result | {"status": status, "body": {"message": "Wallet not found"}}
+                    else:
+                        try:
+                            body, status = await manager.handle_topic(topic, payload)
+                            results[index] = result | {"status": status, "body": body}
+                        except ValueError as e:
+                            status = 400
+                            results[index] = result | {"status": status, "body": {"message": str(e)}}
+                        except Exception as e:
+                            current_app.logger.error(f"Batched webhook failed for {wallet_id}/{topic}: {e}", exc_info=True)
+                            results[index] = result | {"status": status, "body": {"message": "Internal error"}}
+                record_event(trace, status)
     
-    return await_(
-        WebhookManager(wallet).handle_topic(topic, request.json)
-    )
\ No newline at end of file
+    return results
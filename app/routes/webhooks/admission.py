@@ -0,0 +1,80 @@
+from collections import OrderedDict
+import threading
+import time
+
+from app.utils import metrics
+
+webhook_shed = metrics.counter(
+    'pydentity_webhook_shed_total',
+    'Webhook events rejected by admission control',
+    ('reason',),
+)
+webhook_in_flight = metrics.gauge(
+    'pydentity_webhook_in_flight',
+    'Webhook requests currently being processed',
+)
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`"""
+    
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+    
+    def take(self, cost: float = 1) -> float:
+        """Take `cost` tokens, returning 0 on success or the seconds until they are available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Per-wallet token buckets plus a global cap on concurrent webhook requests.
+    
+    A rate or concurrency of 0 disables that limit. Buckets are kept for the most
+    recently seen wallets only; an evicted wallet simply starts with a full bucket.
+    """
+    
+    def __init__(self, rate: float, burst: float, max_concurrency: int, max_wallets: int = 10000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_wallets = max_wallets
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+    
+    def acquire_slot(self) -> bool:
+        if self.slots and not self.slots.acquire(blocking=False):
+            webhook_shed.inc(reason='overloaded')
+            return False
+        webhook_in_flight.inc()
+        return True
+    
+    def release_slot(self):
+        webhook_in_flight.dec()
+        if self.slots:
+            self.slots.release()
+    
+    def admit(self, wallet_id: str, cost: float = 1) -> float:
+        """Charge a wallet for `cost` events, returning 0 if admitted or the Retry-After seconds"""
+        if not self.rate or not wallet_id:
+            return 0.0
+        with self.lock:
+            if (bucket := self.buckets.get(wallet_id)) is None:
+                bucket = self.buckets[wallet_id] = TokenBucket(self.rate, self.burst)
+                if len(self.buckets) > self.max_wallets:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(wallet_id)
+            retry_after = bucket.take(cost)
+        if retry_after:
+            webhook_shed.inc(reason='rate_limited')
+        return retry_after
@@ -1,13 +1,29 @@
 from flask import current_app
 
-from .models import Message, CredentialOffer, PresentationRequest, Notification, Connection
+from .models import Message, CredentialOffer, PresentationRequest, Notification, Connection, OfferMetadata, OfferView
 from app.plugins import AskarStorage, AgentController, AskarStorageKeys
 from app.utils import beautify_anoncreds, notification_broadcaster, create_notification, delete_notification
+from app.utils.credential_index import update_credential_index
+from app.utils.matching import store_presentation_match, forget_presentation
 
 
 class WebhookManager:
+    # Topic names mapped to handler method names
+    TOPIC_HANDLERS = {
+        'connections': 'topic_connections',
+        'out_of_band': 'topic_out_of_band',
+        'ping': 'topic_ping',
+        'basicmessages': 'topic_basicmessages',
+        'issue_credential': 'topic_issue_credential',
+        'issuer_cred_rev': 'topic_issuer_cred_rev',
+        'issue_credential_v2_0': 'topic_issue_credential_v2_0',
+        'issue_credential_v2_0_anoncreds': 'topic_issue_anoncreds',
+        'present_proof': 'topic_present_proof',
+        'present_proof_v2_0': 'topic_present_proof_v2_0',
+        'revocation_registry': 'topic_revocation_registry',
+    }
+
     def __init__(self, wallet: dict):
-        # Dictionary mapping topic names to handler methods
         self.wallet = wallet
         self.wallet_id = wallet.get('wallet_id')
         
@@ -18,19 +34,7 @@ class WebhookManager:
         # Initialize wallet-specific askar storage
         self.askar = AskarStorage.for_wallet(self.wallet_id)
         
-        self.topic_handlers = {
-            'connections': self.topic_connections,
-            'out_of_band': self.topic_out_of_band,
-            'ping': self.topic_ping,
-            'basicmessages': self.topic_basicmessages,
-            'issue_credential': self.topic_issue_credential,
-            'issuer_cred_rev': self.topic_issuer_cred_rev,
-            'issue_credential_v2_0': self.topic_issue_credential_v2_0,
-            'issue_credential_v2_0_anoncreds': self.topic_issue_anoncreds,
-            'present_proof': self.topic_present_proof,
-            'present_proof_v2_0': self.topic_present_proof_v2_0,
-            'revocation_registry': self.topic_revocation_registry,
-        }
+        self.topic_handlers = {topic: getattr(self, name) for topic, name in self.TOPIC_HANDLERS.items()}
 
     async def handle_topic(self, topic, payload):
         """Handle a webhook topic by invoking the appropriate handler method"""
@@ -186,49 +190,45 @@ class WebhookManager:
             ).get('cred_ex_record')
             
             current_app.logger.info(f"Credential exchange record: {cred_ex}")
-            cred_offer['comment'] = cred_ex.get('cred_offer').get('comment')
             
-            preview = {}
-            for attribute in cred_ex.get('cred_offer').get('credential_preview').get('attributes'):
-                preview[attribute.get('name')] = attribute.get('value')
+            # Resolve display metadata once and keep it for the done state
+            metadata = await self._resolve_offer_metadata(exchange, cred_ex)
+            await self._store_offer_metadata(metadata)
             
-            current_app.logger.info(f"Credential preview attributes: {preview}")
-            cred_offer['preview'] = preview
+            cred_offer['comment'] = metadata.get('comment')
+            cred_offer['preview'] = metadata.get('attributes')
+            current_app.logger.info(f"Credential preview attributes: {cred_offer['preview']}")
             
             current_app.logger.info(f"Storing credential offer to CRED_OFFERS: {cred_offer}")
             await self.askar.append(AskarStorageKeys.CRED_OFFERS, cred_offer)
             
-            # Get schema name from schema_id
-            schema_name = 'Credential'  # Default fallback
-            try:
-                schema_id = exchange.get('by_format', {}).get('cred_offer', {}).get('anoncreds', {}).get('schema_id')
-                if schema_id:
-                    current_app.logger.info(f"Fetching schema info for: {schema_id}")
-                    schema_info = self.agent.get_schema_info(schema_id)
-                    if schema_info and schema_info.get('schema'):
-                        schema_name = schema_info['schema'].get('name', 'Credential')
-                        current_app.logger.info(f"Found schema name: {schema_name}")
-                    else:
-                        current_app.logger.warning(f"Schema info returned but no 'schema' key found")
-                else:
-                    current_app.logger.warning(f"No schema_id found in exchange")
-            except Exception as e:
-                current_app.logger.error(f"Error fetching schema info: {e}", exc_info=True)
-                # Keep default fallback value
-            
-            issuer_name = self.agent.get_connection_info(
-                exchange.get('connection_id')
-            ).get('their_label')
+            schema_name = metadata.get('schema_name')
+            issuer_name = metadata.get('issuer_name')
             
             current_app.logger.info(f"Schema name: {schema_name}, Issuer: {issuer_name}")
             
+            # The offer page renders from this view model, no agent calls on open
+            offer_view = OfferView(
+                exchange_id=exchange.get('cred_ex_id'),
+                credential_name=schema_name or 'Credential',
+                schema_version=metadata.get('schema_version'),
+                issuer={
+                    'name': issuer_name or 'Unknown Issuer',
+                    'id': metadata.get('issuer_id') or '',
+                    'image': ''
+                },
+                attributes=metadata.get('attributes') or {},
+                comment=metadata.get('comment'),
+                state=exchange.get('state')
+            ).model_dump()
+            
             # Create notification using new individual storage system
             notification = await create_notification(
                 wallet_id=self.wallet_id,
                 notification_id=exchange.get('cred_ex_id'),
                 notification_type='cred_offer',
                 title=f'{issuer_name} is offering {schema_name}',
-                details=cred_offer
+                details={**cred_offer, 'view': offer_view}
             )
             
             current_app.logger.info(f"✅ Credential offer notification created: {notification['id']}")
@@ -244,33 +244,6 @@ class WebhookManager:
                 }
             )
             
-            
-            # agent = AgentController()
-            # wallet = await askar.fetch('wallet', self.wallet_id)
-            # agent.set_token(wallet['token'])
-            # preview = {}
-            # for attribute in payload.get('cred_offer').get('credential_preview').get('attributes'):
-            #     preview[attribute.get('name')] = attribute.get('value')
-            # await askar.append('cred_ex', payload.get('connection_id'), cred_offer)
-            
-            # schema_id = payload.get('by_format').get('cred_offer').get('anoncreds').get('schema_id')
-            # cred_def_id = payload.get('by_format').get('cred_offer').get('anoncreds').get('cred_def_id')
-            
-            # wallet = await askar.fetch('wallet', self.wallet_id)
-            
-            # agent.set_token(wallet['token'])
-            # connection = agent.get_connection_info(payload.get('connection_id'))
-            # schema = agent.get_schema_info(schema_id).get('schema')
-            # issuer_name = connection.get('their_label')
-            # cred_name = schema.get('name')
-            # cred_meta = {
-            #     'issuer_name': issuer_name,
-            #     'issuer_image': '',
-            #     'cred_name': schema.get('name'),
-            #     'cred_version': schema.get('version'),
-            # }
-            # await askar.store('cred_meta', cred_def_id, cred_meta)
-            
         elif exchange.get('state') == 'request-sent':
             current_app.logger.info(f"✅ Credential request sent for exchange: {exchange.get('cred_ex_id')}")
             
@@ -291,6 +264,8 @@ class WebhookManager:
         elif exchange.get('state') == 'declined' or exchange.get('state') == 'abandoned':
             current_app.logger.info(f"❌ Credential offer declined/abandoned: {exchange.get('cred_ex_id')}")
             
+            await self.askar.delete(AskarStorageKeys.CRED_EX_METADATA, exchange.get('cred_ex_id'))
+            
             # Delete the notification using the new system
             deleted = await delete_notification(self.wallet_id, exchange.get('cred_ex_id'))
             
@@ -306,72 +281,29 @@ class WebhookManager:
             current_app.logger.info(f"=== CREDENTIAL ISSUED (DONE STATE) ===")
             current_app.logger.info(f"Exchange ID: {exchange.get('cred_ex_id')}")
             
-            # Get the full credential exchange info
-            cred_ex = self.agent.get_credential_exchange_info(
-                exchange.get('cred_ex_id')
-            )
+            # Use the metadata captured at offer-received, resolving it again only on a miss
+            metadata = await self.askar.fetch(AskarStorageKeys.CRED_EX_METADATA, exchange.get('cred_ex_id'))
+            if not metadata:
+                current_app.logger.info("No stored offer metadata, resolving from agent")
+                cred_ex = self.agent.get_credential_exchange_info(
+                    exchange.get('cred_ex_id')
+                )
+                metadata = await self._resolve_offer_metadata(
+                    exchange, cred_ex.get('cred_ex_record', {})
+                )
             
-            current_app.logger.info(f"Full credential exchange: {cred_ex}")
-            
-            # Store the credential
-            cred_record = cred_ex.get('cred_ex_record', {})
-            
-            # Extract credential attributes
-            attributes = {}
-            if cred_offer := cred_record.get('cred_offer'):
-                if preview := cred_offer.get('credential_preview'):
-                    for attr in preview.get('attributes', []):
-                        attributes[attr.get('name')] = attr.get('value')
-            
-            # Get schema and credential definition info
-            by_format = exchange.get('by_format', {})
-            anoncreds_offer = by_format.get('cred_offer', {}).get('anoncreds', {})
-            schema_id = anoncreds_offer.get('schema_id')
-            cred_def_id = anoncreds_offer.get('cred_def_id')
-            
-            # Get schema info (name and version)
-            schema_name = 'Credential'
-            schema_version = None
-            if schema_id:
-                try:
-                    schema_info = self.agent.get_schema_info(schema_id)
-                    if schema_info and schema_info.get('schema'):
-                        schema_name = schema_info['schema'].get('name', 'Credential')
-                        schema_version = schema_info['schema'].get('version')
-                except Exception as e:
-                    current_app.logger.warning(f"Could not fetch schema info: {e}")
-            
-            # Get credential definition info (tag)
-            cred_def_tag = None
-            if cred_def_id:
-                try:
-                    cred_def_info = self.agent.get_cred_def_info(cred_def_id)
-                    if cred_def_info and cred_def_info.get('credential_definition'):
-                        cred_def_tag = cred_def_info['credential_definition'].get('tag')
-                except Exception as e:
-                    current_app.logger.warning(f"Could not fetch cred def info: {e}")
-            
-            # Get issuer info (connection label and issuer DID)
-            connection_label = None
-            issuer_id = None
-            if connection_id := exchange.get('connection_id'):
-                try:
-                    connection_info = self.agent.get_connection_info(connection_id)
-                    connection_label = connection_info.get('their_label')
-                    # Try to get issuer DID from connection
-                    issuer_id = connection_info.get('their_did')
-                except Exception as e:
-                    current_app.logger.warning(f"Could not fetch connection info: {e}")
+            schema_name = metadata.get('schema_name')
+            connection_label = metadata.get('issuer_name')
             
             # Build credential using beautify_anoncreds to create W3C VC format
             credential, tags = beautify_anoncreds(
-                attributes=attributes,
-                schema_id=schema_id,
+                attributes=metadata.get('attributes') or {},
+                schema_id=metadata.get('schema_id'),
                 schema_name=schema_name,
-                schema_version=schema_version,
-                cred_def_id=cred_def_id,
-                cred_def_tag=cred_def_tag,
-                issuer_id=issuer_id,
+                schema_version=metadata.get('schema_version'),
+                cred_def_id=metadata.get('cred_def_id'),
+                cred_def_tag=metadata.get('cred_def_tag'),
+                issuer_id=metadata.get('issuer_id'),
                 connection_label=connection_label,
                 issuer_image=None,
                 created_at=exchange.get('created_at'),
@@ -382,6 +314,7 @@ class WebhookManager:
             
             # Delete the notification (in case request-sent webhook didn't fire)
             await delete_notification(self.wallet_id, exchange.get('cred_ex_id'))
+            await self.askar.delete(AskarStorageKeys.CRED_EX_METADATA, exchange.get('cred_ex_id'))
             
             # Check for duplicates before storing (by credential ID)
             existing_credentials = await self.askar.fetch(AskarStorageKeys.CREDENTIALS) or []
@@ -398,6 +331,7 @@ class WebhookManager:
             else:
                 # Store the credential with tags
                 await self.askar.append(AskarStorageKeys.CREDENTIALS, credential)
+                await update_credential_index(self.askar, added=[credential])
                 current_app.logger.info(f"✅ Credential stored successfully with tags: {tags}")
             
             # Broadcast single combined event that triggers page reload
@@ -418,6 +352,65 @@ class WebhookManager:
             current_app.logger.warning(f"Unhandled state: {exchange.get('state')}")
         return {}, 200
 
+    async def _resolve_offer_metadata(self, exchange, cred_ex_record):
+        """Resolve schema, cred def and issuer details for a credential exchange"""
+        anoncreds_offer = exchange.get('by_format', {}).get('cred_offer', {}).get('anoncreds', {})
+        cred_offer = cred_ex_record.get('cred_offer') or {}
+        
+        attributes = {}
+        for attribute in (cred_offer.get('credential_preview') or {}).get('attributes', []):
+            attributes[attribute.get('name')] = attribute.get('value')
+        
+        metadata = OfferMetadata(
+            exchange_id=exchange.get('cred_ex_id'),
+            connection_id=exchange.get('connection_id'),
+            schema_id=anoncreds_offer.get('schema_id'),
+            cred_def_id=anoncreds_offer.get('cred_def_id'),
+            comment=cred_offer.get('comment'),
+            attributes=attributes,
+        )
+        
+        # Get schema info (name and version)
+        if metadata.schema_id:
+            try:
+                current_app.logger.info(f"Fetching schema info for: {metadata.schema_id}")
+                schema_info = self.agent.get_schema_info(metadata.schema_id)
+                if schema_info and schema_info.get('schema'):
+                    metadata.schema_name = schema_info['schema'].get('name', 'Credential')
+                    metadata.schema_version = schema_info['schema'].get('version')
+                else:
+                    current_app.logger.warning(f"Schema info returned but no 'schema' key found")
+            except Exception as e:
+                current_app.logger.error(f"Error fetching schema info: {e}", exc_info=True)
+        else:
+            current_app.logger.warning(f"No schema_id found in exchange")
+        
+        # Get credential definition info (tag)
+        if metadata.cred_def_id:
+            try:
+                cred_def_info = self.agent.get_cred_def_info(metadata.cred_def_id)
+                if cred_def_info and cred_def_info.get('credential_definition'):
+                    metadata.cred_def_tag = cred_def_info['credential_definition'].get('tag')
+            except Exception as e:
+                current_app.logger.warning(f"Could not fetch cred def info: {e}")
+        
+        # Get issuer info (connection label and issuer DID)
+        if metadata.connection_id:
+            try:
+                connection_info = self.agent.get_connection_info(metadata.connection_id)
+                metadata.issuer_name = connection_info.get('their_label')
+                metadata.issuer_id = connection_info.get('their_did')
+            except Exception as e:
+                current_app.logger.warning(f"Could not fetch connection info: {e}")
+        
+        return metadata.model_dump()
+
+    async def _store_offer_metadata(self, metadata):
+        """Persist offer metadata, replacing any record left by a redelivered webhook"""
+        tags = {'exchange_id': metadata['exchange_id'], 'state': 'offer-received'}
+        if not await self.askar.store(AskarStorageKeys.CRED_EX_METADATA, metadata['exchange_id'], metadata, tags):
+            await self.askar.update(AskarStorageKeys.CRED_EX_METADATA, metadata['exchange_id'], metadata, tags)
+
     async def topic_issue_anoncreds(self, payload):
         """Handle anoncreds-specific issue credential webhooks"""
         current_app.logger.info(f"=== ANONCREDS CREDENTIAL WEBHOOK ===")
@@ -496,7 +489,18 @@ class WebhookManager:
             await self.askar.append(AskarStorageKeys.PRES_REQUESTS, pres_req)
             
             verifier_label = self.agent.get_connection_info(connection_id).get('their_label') if connection_id else 'Unknown Verifier'
-            pres_name = payload.get('by_format').get('pres_request').get('anoncreds').get('name')
+            anoncreds_request = payload.get('by_format').get('pres_request').get('anoncreds')
+            pres_name = anoncreds_request.get('name')
+            
+            # Match against the credential index now so opening the request needs no agent calls
+            match = await store_presentation_match(
+                self.askar,
+                payload.get('pres_ex_id'),
+                anoncreds_request,
+                verifier_name=verifier_label or 'Unknown Verifier',
+                connection_id=connection_id
+            )
+            current_app.logger.info(f"Presentation request matched, can respond: {match['can_respond']}")
             
             # Create notification using new individual storage system
             notification = await create_notification(
@@ -526,6 +530,7 @@ class WebhookManager:
             
             # Delete the notification
             await delete_notification(self.wallet_id, payload.get('pres_ex_id'))
+            await forget_presentation(self.askar, payload.get('pres_ex_id'))
             
             # Broadcast notification removal
             notification_broadcaster.broadcast(
@@ -539,6 +544,7 @@ class WebhookManager:
             
             # Delete the notification (in case presentation-sent didn't fire)
             await delete_notification(self.wallet_id, payload.get('pres_ex_id'))
+            await forget_presentation(self.askar, payload.get('pres_ex_id'))
             
             # Broadcast notification removal
             notification_broadcaster.broadcast(
@@ -552,6 +558,7 @@ class WebhookManager:
             
             # Delete the notification
             await delete_notification(self.wallet_id, payload.get('pres_ex_id'))
+            await forget_presentation(self.askar, payload.get('pres_ex_id'))
             
             # Broadcast notification removal
             notification_broadcaster.broadcast(
@@ -43,4 +43,29 @@ class PresentationRequest(CustomBaseModel):
     connection_id: Union[str, None] = Field(None)
     comment: Union[str, None] = Field(None)
     attributes: dict = Field()
-    predicates: dict = Field()
\ No newline at end of file
+    predicates: dict = Field()
+
+class OfferMetadata(CustomBaseModel):
+    """Compact record resolved at offer-received and reused when the credential is done"""
+    exchange_id: str = Field()
+    connection_id: Union[str, None] = Field(None)
+    schema_id: Union[str, None] = Field(None)
+    schema_name: str = Field('Credential')
+    schema_version: Union[str, None] = Field(None)
+    cred_def_id: Union[str, None] = Field(None)
+    cred_def_tag: Union[str, None] = Field(None)
+    issuer_id: Union[str, None] = Field(None)
+    issuer_name: Union[str, None] = Field(None)
+    comment: Union[str, None] = Field(None)
+    attributes: Dict[str, str] = Field(default_factory=dict)
+
+
+class OfferView(CustomBaseModel):
+    """Display model of a credential offer, stored with its notification"""
+    exchange_id: str = Field()
+    credential_name: str = Field('Credential')
+    schema_version: Union[str, None] = Field(None)
+    issuer: Dict[str, str] = Field(default_factory=dict)
+    attributes: Dict[str, str] = Field(default_factory=dict)
+    comment: Union[str, None] = Field(None)
+    state: str = Field('offer-received')
@@ -0,0 +1,70 @@
+from flask import current_app, request
+import json
+import time
+
+from app.utils import metrics
+from app.utils.tracing import EventTrace
+from config import Config
+from .manager import WebhookManager
+
+webhook_events = metrics.counter(
+    'pydentity_webhook_events_total',
+    'Webhook events processed',
+    ('topic', 'state', 'status'),
+)
+webhook_duration = metrics.histogram(
+    'pydentity_webhook_event_seconds',
+    'Time spent processing a webhook event',
+    ('topic', 'state'),
+)
+webhook_queue_wait = metrics.histogram(
+    'pydentity_webhook_queue_wait_seconds',
+    'Time a webhook event waited before processing started',
+    ('topic',),
+)
+webhook_spans = metrics.histogram(
+    'pydentity_webhook_span_seconds',
+    'Time spent per dependency while processing a webhook event',
+    ('topic', 'state', 'span'),
+)
+webhook_slow_events = metrics.counter(
+    'pydentity_webhook_slow_events_total',
+    'Webhook events slower than WEBHOOK_SLOW_EVENT_MS',
+    ('topic', 'state'),
+)
+
+
+def request_queue_wait() -> float:
+    """Seconds between the proxy accepting the request and the app seeing it (X-Request-Start)"""
+    header = request.headers.get('X-Request-Start', '').removeprefix('t=')
+    try:
+        started = float(header)
+    except ValueError:
+        return 0.0
+    
+    # Proxies send seconds, milliseconds or microseconds since the epoch
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, time.time() - started)
+
+
+def record_event(trace: EventTrace, status: int):
+    """Export a finished trace as metrics and log it if it was slow"""
+    # Topics come from the URL: unknown ones share one series (and no state)
+    if trace.topic in WebhookManager.TOPIC_HANDLERS:
+        topic, state = trace.topic, trace.state or ''
+    else:
+        topic, state = 'other', ''
+    webhook_events.inc(topic=topic, state=state, status=status)
+    webhook_duration.observe(trace.duration or 0.0, topic=topic, state=state)
+    webhook_queue_wait.observe(trace.queue_wait, topic=topic)
+    for kind, seconds in trace.breakdown().items():
+        webhook_spans.observe(seconds, topic=topic, state=state, span=kind)
+    
+    if (trace.duration or 0.0) * 1000 >= Config.WEBHOOK_SLOW_EVENT_MS:
+        webhook_slow_events.inc(topic=topic, state=state)
+        current_app.logger.warning(
+            f"🐢 Slow webhook event: {json.dumps(trace.to_record() | {'status': status})}"
+        )
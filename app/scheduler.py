@@ -0,0 +1,178 @@
+"""
+Background wallet sync.
+
+Wallets that were active recently are reconciled with the agent on a
+jittered interval by a small worker pool, so request handlers only ever read
+local (already synced) data. Logging in moves a wallet to the front.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from config import Config
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+sync_runs = metrics.counter(
+    'pydentity_wallet_sync_runs_total',
+    'Background wallet syncs by outcome',
+    ('mode', 'status'),
+)
+sync_duration = metrics.histogram(
+    'pydentity_wallet_sync_duration_seconds',
+    'Background wallet sync duration',
+    ('mode',),
+)
+sync_changes = metrics.counter(
+    'pydentity_wallet_sync_changes_total',
+    'Credential records added or removed by background syncs',
+)
+sync_lag = metrics.histogram(
+    'pydentity_wallet_sync_lag_seconds',
+    'Time a due wallet sync waited for a worker',
+)
+sync_scheduled = metrics.gauge(
+    'pydentity_wallet_sync_scheduled',
+    'Wallets currently scheduled for background sync',
+)
+sync_in_flight = metrics.gauge(
+    'pydentity_wallet_sync_in_flight',
+    'Wallet syncs currently running',
+)
+
+
+class SyncScheduler:
+    """
+    Jittered, bounded-concurrency scheduler for sync_wallet.
+
+    A single timer thread pops due wallets off a heap and hands them to a
+    thread pool; each worker runs the sync inside an app context. A wallet
+    stays scheduled while it was seen within `active_window` seconds, and
+    every `full_every`-th run walks the full agent list to catch deletions.
+    """
+
+    def __init__(self, app, interval: float, jitter: float = 0.2, max_workers: int = 4,
+                 active_window: float = 3600, full_every: int = 12):
+        self.app = app
+        self.interval = interval
+        self.jitter = jitter
+        self.active_window = active_window
+        self.full_every = full_every
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wallet-sync")
+        self.heap = []
+        self.due = {}  # client_id -> due time of its live heap entry
+        self.last_seen = {}
+        self.runs = {}
+        self.running = set()
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self._thread = None
+
+    def _next_run(self) -> float:
+        return time.monotonic() + self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _push(self, client_id: str, due: float):
+        # Superseded heap entries are skipped when popped (due no longer matches)
+        self.due[client_id] = due
+        heapq.heappush(self.heap, (due, next(self.sequence), client_id))
+        sync_scheduled.set(len(self.due))
+
+    def touch(self, client_id: str, priority: bool = False):
+        """
+        Record activity for a wallet and make sure it is scheduled.
+
+        Args:
+            client_id: Client whose wallet should be kept in sync
+            priority: Sync now instead of at the next jittered interval (login)
+        """
+        if not client_id:
+            return
+        with self.condition:
+            self.last_seen[client_id] = time.monotonic()
+            if priority and client_id not in self.running:
+                self._push(client_id, time.monotonic())
+            elif client_id not in self.due and client_id not in self.running:
+                self._push(client_id, self._next_run())
+            self.condition.notify()
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self.condition:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name="wallet-sync-scheduler", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self.condition:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.condition.wait(timeout=self.heap[0][0] - time.monotonic() if self.heap else None)
+                due, _, client_id = heapq.heappop(self.heap)
+                if self.due.get(client_id) != due:
+                    continue
+                del self.due[client_id]
+                self.running.add(client_id)
+                sync_scheduled.set(len(self.due))
+            sync_lag.observe(max(0.0, time.monotonic() - due))
+            self.executor.submit(self._run, client_id)
+
+    def _run(self, client_id: str):
+        from app.operations import sync_wallet
+
+        runs = self.runs.get(client_id, 0)
+        mode = "full" if runs % self.full_every == 0 else "incremental"
+        started = time.perf_counter()
+        sync_in_flight.inc()
+        try:
+            with self.app.app_context():
+                changes = asyncio.run(sync_wallet(client_id, full=mode == "full"))
+            sync_changes.inc(changes or 0)
+            sync_runs.inc(mode=mode, status="ok")
+        except Exception as e:
+            sync_runs.inc(mode=mode, status="error")
+            logger.warning(f"Background sync failed for {client_id}: {e}")
+        finally:
+            sync_in_flight.dec()
+            sync_duration.observe(time.perf_counter() - started, mode=mode)
+            with self.condition:
+                self.runs[client_id] = runs + 1
+                self.running.discard(client_id)
+                if time.monotonic() - self.last_seen.get(client_id, 0) < self.active_window:
+                    if client_id not in self.due:
+                        self._push(client_id, self._next_run())
+                else:
+                    # Inactive: forget the wallet until it is seen again
+                    self.last_seen.pop(client_id, None)
+                    self.runs.pop(client_id, None)
+                self.condition.notify()
+
+
+def init_sync_scheduler(app):
+    """Attach a SyncScheduler to the app when Config.SYNC_INTERVAL is set"""
+    if Config.SYNC_INTERVAL <= 0:
+        return None
+    scheduler = SyncScheduler(
+        app,
+        interval=Config.SYNC_INTERVAL,
+        jitter=Config.SYNC_JITTER,
+        max_workers=Config.SYNC_MAX_WORKERS,
+        active_window=Config.SYNC_ACTIVE_WINDOW,
+        full_every=Config.SYNC_FULL_EVERY,
+    )
+    app.extensions["sync_scheduler"] = scheduler
+    return scheduler
+
+
+def schedule_sync(client_id: str, priority: bool = False):
+    """Mark a wallet active for background sync (no-op when sync is disabled)"""
+    from flask import current_app
+
+    if scheduler := current_app.extensions.get("sync_scheduler"):
+        scheduler.touch(client_id, priority=priority)
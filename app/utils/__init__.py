@@ -3,68 +3,92 @@ Utility functions for PyDentity Wallet
 """
 from datetime import datetime, timezone
 from typing import Dict, Any
-import queue
-import threading
 
 from .device import is_mobile, get_device_type
-
-
-# Global event broadcaster for real-time notifications
-class NotificationBroadcaster:
-    """Simple in-memory event broadcaster for SSE notifications"""
-    
-    def __init__(self):
-        self.listeners = {}
-        self.lock = threading.Lock()
-    
-    def subscribe(self, wallet_id: str) -> queue.Queue:
-        """Subscribe to notifications for a specific wallet"""
-        q = queue.Queue(maxsize=10)
-        with self.lock:
-            if wallet_id not in self.listeners:
-                self.listeners[wallet_id] = []
-            self.listeners[wallet_id].append(q)
-        return q
-    
-    def unsubscribe(self, wallet_id: str, q: queue.Queue):
-        """Unsubscribe from notifications"""
-        with self.lock:
-            if wallet_id in self.listeners:
-                try:
-                    self.listeners[wallet_id].remove(q)
-                    if not self.listeners[wallet_id]:
-                        del self.listeners[wallet_id]
-                except ValueError:
-                    pass
-    
-    def broadcast(self, wallet_id: str, event_type: str, data: Dict[str, Any]):
-        """Broadcast an event to all listeners for a wallet"""
-        with self.lock:
-            if wallet_id in self.listeners:
-                dead_queues = []
-                for q in self.listeners[wallet_id]:
-                    try:
-                        q.put_nowait({
-                            'type': event_type,
-                            'data': data,
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        })
-                    except queue.Full:
-                        dead_queues.append(q)
-                
-                # Remove full/dead queues
-                for q in dead_queues:
-                    try:
-                        self.listeners[wallet_id].remove(q)
-                    except ValueError:
-                        pass
+from .metrics import metrics
+from .broadcaster import create_broadcaster, format_sse, parse_last_event_id
 
 
 # Global broadcaster instance
-notification_broadcaster = NotificationBroadcaster()
+notification_broadcaster = create_broadcaster()
 
 
 # Notification Management Functions
+NOTIFICATION_PAGE_SIZE = 20
+
+
+def _empty_counters() -> dict:
+    return {'total': 0, 'unread': 0, 'by_type': {}}
+
+
+def _notification_tags(notification: dict) -> dict:
+    """Tags for a stored notification, '~created_at' is plaintext so pages can range over it"""
+    return {'type': notification.get('type'), '~created_at': notification.get('created_at')}
+
+
+async def _adjust_notification_counters(askar, notification_type: str, total: int = 0, unread: int = 0):
+    """
+    Apply a delta to the wallet's notification counter record.
+    
+    A wallet without a counter record (created before counters existed) is
+    rebuilt from storage, which already reflects the change being applied.
+    """
+    from app.plugins import AskarStorageKeys
+    
+    if await askar.fetch(AskarStorageKeys.NOTIFICATION_COUNTERS) is None:
+        counters = await _count_notifications(askar)
+        return await askar.modify(AskarStorageKeys.NOTIFICATION_COUNTERS, 'data', lambda _: counters)
+    
+    def apply(counters):
+        by_type = counters.setdefault('by_type', {})
+        counters['total'] = max(0, counters.get('total', 0) + total)
+        counters['unread'] = max(0, counters.get('unread', 0) + unread)
+        by_type[notification_type] = max(0, by_type.get(notification_type, 0) + total)
+        if not by_type[notification_type]:
+            by_type.pop(notification_type)
+        return counters
+    
+    return await askar.modify(AskarStorageKeys.NOTIFICATION_COUNTERS, 'data', apply, _empty_counters())
+
+
+async def _count_notifications(askar) -> dict:
+    """Count every notification in the wallet's profile (used to (re)build counters)"""
+    from app.plugins import AskarStorageKeys
+    
+    counters = _empty_counters()
+    for notification in await askar.fetch_all_by_tag(AskarStorageKeys.NOTIFICATIONS, {}, limit=None):
+        notification_type = notification.get('type')
+        counters['total'] += 1
+        counters['unread'] += 1 if notification.get('new') else 0
+        counters['by_type'][notification_type] = counters['by_type'].get(notification_type, 0) + 1
+    return counters
+
+
+def build_notification(notification_id: str, notification_type: str, title: str, details: dict) -> dict:
+    """A new (unread) notification record"""
+    return {
+        'id': notification_id,
+        'new': True,
+        'type': notification_type,
+        'title': title,
+        'details': details,
+        'created_at': datetime.now(timezone.utc).isoformat()
+    }
+
+
+def notification_entry(notification: dict) -> tuple:
+    """(category, key, data, tags) of a notification, for AskarStorage.store or write_batch"""
+    from app.plugins import AskarStorageKeys
+    
+    return AskarStorageKeys.NOTIFICATIONS, notification['id'], notification, _notification_tags(notification)
+
+
+async def count_new_notifications(askar, notification_type: str, count: int):
+    """Account for notifications inserted directly (e.g. in a batch) in the counters"""
+    if count:
+        await _adjust_notification_counters(askar, notification_type, total=count, unread=count)
+
+
 async def create_notification(wallet_id: str, notification_id: str, notification_type: str, title: str, details: dict):
     """
     Create a new notification using Askar profiles for user isolation.
@@ -77,27 +101,15 @@ async def create_notification(wallet_id: str, notification_id: str, notification
         details: Notification details dict
     """
     from app.plugins import AskarStorage
-    from datetime import datetime, timezone
     from flask import current_app
     
     askar = AskarStorage.for_wallet(wallet_id)
+    notification = build_notification(notification_id, notification_type, title, details)
     
-    notification = {
-        'id': notification_id,
-        'new': True,
-        'type': notification_type,
-        'title': title,
-        'details': details,
-        'created_at': datetime.now(timezone.utc).isoformat()
-    }
-    
-    # Store in wallet's profile
-    await askar.store(
-        category='notifications',
-        key=notification_id,
-        data=notification,
-        tags={'type': notification_type}
-    )
+    # Store in wallet's profile, counters only move when the insert succeeded
+    stored = await askar.store(*notification_entry(notification))
+    if stored:
+        await _adjust_notification_counters(askar, notification_type, total=1, unread=1)
     
     current_app.logger.info(f"✅ Created notification in profile {wallet_id}: {notification_id}")
     
@@ -112,17 +124,27 @@ async def delete_notification(wallet_id: str, notification_id: str):
         wallet_id: Wallet ID (profile name)
         notification_id: Unique notification ID to delete
     """
-    from app.plugins import AskarStorage
+    from app.plugins import AskarStorage, AskarStorageKeys
     from flask import current_app
     
     askar = AskarStorage.for_wallet(wallet_id)
     
     try:
+        notification = await askar.fetch(AskarStorageKeys.NOTIFICATIONS, notification_id)
+        if not notification:
+            return True
+        
         deleted = await askar.delete(
-            category='notifications',
+            category=AskarStorageKeys.NOTIFICATIONS,
             key=notification_id
         )
         if deleted:
+            await _adjust_notification_counters(
+                askar,
+                notification.get('type'),
+                total=-1,
+                unread=-1 if notification.get('new') else 0
+            )
             current_app.logger.info(f"✅ Deleted notification from profile {wallet_id}: {notification_id}")
         return deleted
     except Exception as e:
@@ -130,34 +152,131 @@ async def delete_notification(wallet_id: str, notification_id: str):
         return False
 
 
+async def mark_notification_read(wallet_id: str, notification_id: str):
+    """
+    Clear the 'new' flag of a notification and decrement the unread counter.
+    
+    Returns:
+        The notification, or None if it does not exist
+    """
+    from app.plugins import AskarStorage, AskarStorageKeys
+    
+    askar = AskarStorage.for_wallet(wallet_id)
+    
+    notification = await askar.fetch(AskarStorageKeys.NOTIFICATIONS, notification_id)
+    if notification and notification.get('new'):
+        notification['new'] = False
+        if await askar.update(
+            AskarStorageKeys.NOTIFICATIONS,
+            notification_id,
+            notification,
+            _notification_tags(notification)
+        ):
+            await _adjust_notification_counters(askar, notification.get('type'), unread=-1)
+    return notification
+
+
+async def get_notification_counters(wallet_id: str) -> dict:
+    """
+    Get the wallet's notification counters ({total, unread, by_type}).
+    
+    Reads a single record maintained by create/delete/mark-read, the full
+    scan only happens once for wallets that predate the counter record.
+    """
+    from app.plugins import AskarStorage, AskarStorageKeys
+    
+    askar = AskarStorage.for_wallet(wallet_id)
+    
+    counters = await askar.fetch(AskarStorageKeys.NOTIFICATION_COUNTERS)
+    if counters is None:
+        counters = await _count_notifications(askar)
+        await askar.modify(AskarStorageKeys.NOTIFICATION_COUNTERS, 'data', lambda _: counters)
+    return counters
+
+
+def _notification_order(notification: dict) -> tuple:
+    return notification.get('created_at') or '', notification.get('id') or ''
+
+
+async def get_notifications_page(wallet_id: str, limit: int = NOTIFICATION_PAGE_SIZE, cursor: str = None) -> dict:
+    """
+    Get one page of notifications, newest first.
+    
+    Notifications are ordered by (created_at, id). Storage resolves the
+    cursor range and the order, so a page costs about `limit` reads
+    regardless of how many notifications the wallet holds; notifications
+    sharing a timestamp with a page boundary are read in full so none is
+    skipped.
+    
+    Args:
+        wallet_id: Wallet ID (profile name)
+        limit: Page size
+        cursor: 'created_at|id' of the last notification of the previous page
+    
+    Returns:
+        {'notifications': [...], 'next_cursor': str | None}
+    """
+    from app.plugins import AskarStorage, AskarStorageKeys
+    
+    askar = AskarStorage.for_wallet(wallet_id)
+    created_at, _, last_id = (cursor or '').partition('|')
+    
+    tags = {'~created_at': {'$lt': created_at}} if cursor else {}
+    notifications = await askar.fetch_page(AskarStorageKeys.NOTIFICATIONS, tags, limit=limit + 1)
+    ties = set()
+    if len(notifications) > limit:
+        # The page may cut through notifications sharing its oldest timestamp
+        ties.add(min(notification.get('created_at') or '' for notification in notifications))
+    if last_id:
+        # Notifications sharing the cursor's timestamp that come after it
+        ties.add(created_at)
+    for timestamp in ties:
+        notifications += await askar.fetch_all_by_tag(
+            AskarStorageKeys.NOTIFICATIONS, {'~created_at': timestamp}, limit=None
+        )
+    
+    notifications = sorted(
+        {
+            notification['id']: notification
+            for notification in notifications
+            if not last_id or _notification_order(notification) < (created_at, last_id)
+        }.values(),
+        key=_notification_order,
+        reverse=True,
+    )
+    has_more = len(notifications) > limit
+    notifications = notifications[:limit]
+    
+    return {
+        'notifications': notifications,
+        'next_cursor': '|'.join(_notification_order(notifications[-1])) if has_more else None,
+    }
+
+
 async def get_notifications(wallet_id: str) -> list:
     """
     Get all notifications for a wallet from its Askar profile.
     
+    Prefer get_notifications_page for anything rendered, this walks every page.
+    
     Args:
         wallet_id: Wallet ID (profile name)
     
     Returns:
         List of notifications sorted by created_at (newest first)
     """
-    from app.plugins import AskarStorage
     from flask import current_app
     
-    askar = AskarStorage.for_wallet(wallet_id)
-    
-    # Fetch all notifications from the wallet's profile
-    notifications = await askar.fetch_all_by_tag(
-        category='notifications',
-        tags={}  # Empty tags to fetch all
-    )
+    notifications, cursor = [], None
+    while True:
+        page = await get_notifications_page(wallet_id, limit=100, cursor=cursor)
+        notifications.extend(page['notifications'])
+        if not (cursor := page['next_cursor']):
+            break
     
     current_app.logger.info(f"📋 Fetched {len(notifications)} notifications from profile {wallet_id}")
     
-    # Sort by created_at (newest first)
-    if notifications:
-        notifications.sort(key=lambda n: n.get('created_at', ''), reverse=True)
-    
-    return notifications or []
+    return notifications
 
 
 def beautify_anoncreds(
@@ -289,10 +408,20 @@ def beautify_anoncreds(
 __all__ = [
     'is_mobile',
     'get_device_type',
+    'metrics',
     'notification_broadcaster',
+    'format_sse',
+    'parse_last_event_id',
+    'build_notification',
+    'notification_entry',
+    'count_new_notifications',
     'create_notification',
     'delete_notification',
     'get_notifications',
+    'get_notifications_page',
+    'get_notification_counters',
+    'mark_notification_read',
+    'NOTIFICATION_PAGE_SIZE',
     'beautify_anoncreds'
 ]
 
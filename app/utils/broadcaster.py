@@ -0,0 +1,461 @@
+"""Real-time notification broadcasters for SSE subscribers"""
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+from config import Config
+from .metrics import metrics
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: dict) -> str:
+    """Serialize an event as a Server-Sent Events frame"""
+    if 'id' in event:
+        return f"id: {event['id']}\ndata: {json.dumps(event)}\n\n"
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def parse_last_event_id(value) -> Optional[int]:
+    """Parse a Last-Event-ID header or query value"""
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def select_replay(events: list, last_event_id: int) -> Optional[list]:
+    """
+    Pick the buffered events a client missed since `last_event_id`.
+    
+    Returns None when the buffer no longer reaches back to `last_event_id`,
+    meaning events may have been lost and the client has to resync.
+    """
+    if events and events[-1]['id'] <= last_event_id:
+        return []
+    if not events or events[0]['id'] > last_event_id:
+        return None
+    return [event for event in events if event['id'] > last_event_id]
+
+
+sse_coalesced = metrics.counter(
+    'pydentity_sse_events_coalesced_total',
+    'Pending SSE events merged or cancelled for slow subscribers',
+    ('reason',),
+)
+sse_dropped = metrics.counter(
+    'pydentity_sse_events_dropped_total',
+    'SSE events that could not be delivered to a subscriber',
+    ('reason',),
+)
+
+
+class CoalescingBuffer:
+    """
+    Pending events of one subscriber, compacted while the subscriber lags.
+    
+    Only events that have not been consumed yet are merged:
+      - repeated credential_received events become a single 'reload' event
+      - a notification_removed cancels a pending notification_created for the
+        same exchange_id
+      - past `maxsize` pending events, everything collapses into one 'reload'
+        summary instead of the subscriber being disconnected
+    Summaries keep the highest id they replace so Last-Event-ID stays valid.
+    """
+    
+    RELOAD_TYPES = ('credential_received', 'reload')
+    
+    def __init__(self, maxsize: int = 10):
+        self.maxsize = maxsize
+        self.events = deque()
+    
+    def __len__(self):
+        return len(self.events)
+    
+    def popleft(self) -> dict:
+        return self.events.popleft()
+    
+    def push(self, event: dict):
+        event_type = event.get('type')
+        exchange_id = (event.get('data') or {}).get('exchange_id')
+        
+        if event_type == 'notification_removed' and exchange_id:
+            for pending in self.events:
+                if pending.get('type') == 'notification_created' and (pending.get('data') or {}).get('exchange_id') == exchange_id:
+                    self.events.remove(pending)
+                    sse_coalesced.inc(2, reason='notification_pair')
+                    return
+        
+        if event_type in self.RELOAD_TYPES:
+            merged = [pending for pending in self.events if pending.get('type') in self.RELOAD_TYPES]
+            if merged:
+                for pending in merged:
+                    self.events.remove(pending)
+                sse_coalesced.inc(len(merged), reason='credential_received')
+                event = self._reload('credential_received', merged + [event])
+        
+        self.events.append(event)
+        
+        if len(self.events) > self.maxsize:
+            sse_coalesced.inc(len(self.events), reason='overflow')
+            summary = self._reload('overflow', list(self.events))
+            self.events.clear()
+            self.events.append(summary)
+    
+    @staticmethod
+    def _reload(reason: str, events: list) -> dict:
+        count = sum((e.get('data') or {}).get('count', 1) if e.get('type') == 'reload' else 1 for e in events)
+        credential_names, exchange_ids = [], []
+        for e in events:
+            data = e.get('data') or {}
+            if e.get('type') == 'reload':
+                credential_names.extend(data.get('credential_names', []))
+                exchange_ids.extend(data.get('exchange_ids', []))
+                continue
+            if e.get('type') == 'credential_received' and data.get('credential_name'):
+                credential_names.append(data['credential_name'])
+            if data.get('exchange_id'):
+                exchange_ids.append(data['exchange_id'])
+        
+        reload = {
+            'type': 'reload',
+            'data': {
+                'reason': reason,
+                'count': count,
+                'credential_names': credential_names,
+                'exchange_ids': exchange_ids,
+            },
+            'timestamp': events[-1].get('timestamp') or datetime.now(timezone.utc).isoformat(),
+        }
+        ids = [e['id'] for e in events if 'id' in e]
+        if ids:
+            reload['id'] = max(ids)
+        return reload
+
+
+class Subscription:
+    """Thread-side subscriber: a coalescing buffer with a blocking get()"""
+    
+    def __init__(self, maxsize: int = 10):
+        self.buffer = CoalescingBuffer(maxsize)
+        self.ready = threading.Condition()
+    
+    def put_nowait(self, event: dict):
+        with self.ready:
+            self.buffer.push(event)
+            self.ready.notify()
+    
+    def get(self, timeout: float = None) -> dict:
+        """Wait for the next event, raising queue.Empty after `timeout` seconds"""
+        with self.ready:
+            if not self.ready.wait_for(lambda: len(self.buffer), timeout):
+                raise queue.Empty
+            return self.buffer.popleft()
+
+
+class AsyncSubscription:
+    """
+    Subscriber living on an asyncio event loop.
+    
+    The broadcaster can feed it from any thread; the loop is only woken with
+    call_soon_threadsafe, so no thread is parked per subscriber. put_nowait()
+    raises queue.Full once the loop is gone so the broadcaster drops it.
+    """
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int = 10):
+        self.loop = loop
+        self.buffer = CoalescingBuffer(maxsize)
+        self.lock = threading.Lock()
+        self.ready = asyncio.Event()
+    
+    def put_nowait(self, event: dict):
+        if self.loop.is_closed():
+            sse_dropped.inc(reason='closed')
+            raise queue.Full
+        with self.lock:
+            self.buffer.push(event)
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            # Loop closed between the check and the call
+            sse_dropped.inc(reason='closed')
+            raise queue.Full
+    
+    async def get(self, timeout: float = None) -> dict:
+        """Wait for the next event, raising asyncio.TimeoutError after `timeout` seconds"""
+        async def next_event():
+            while True:
+                with self.lock:
+                    if len(self.buffer):
+                        return self.buffer.popleft()
+                    self.ready.clear()
+                await self.ready.wait()
+        return await asyncio.wait_for(next_event(), timeout)
+
+
+class NotificationBroadcaster:
+    """
+    Simple in-memory event broadcaster for SSE notifications.
+    
+    Every event gets an id that increases per wallet, and the last
+    NOTIFICATION_REPLAY_SIZE events of each wallet are kept so a reconnecting
+    client can catch up from its Last-Event-ID.
+    """
+    
+    # Wallets whose recent events are kept for replay
+    MAX_HISTORY_WALLETS = 10000
+    
+    def __init__(self, history_size: int = None):
+        self.listeners = {}
+        self.lock = threading.Lock()
+        self.history_size = history_size or Config.NOTIFICATION_REPLAY_SIZE
+        self.history = OrderedDict()
+    
+    def subscribe(self, wallet_id: str) -> Subscription:
+        """Subscribe to notifications for a specific wallet"""
+        return self.add_listener(wallet_id, Subscription(maxsize=10))
+    
+    def subscribe_async(self, wallet_id: str) -> AsyncSubscription:
+        """Subscribe from a coroutine, receiving events on the running event loop"""
+        return self.add_listener(wallet_id, AsyncSubscription(asyncio.get_running_loop(), maxsize=10))
+    
+    def add_listener(self, wallet_id: str, q):
+        with self.lock:
+            if wallet_id not in self.listeners:
+                self.listeners[wallet_id] = []
+            self.listeners[wallet_id].append(q)
+        return q
+    
+    def unsubscribe(self, wallet_id: str, q):
+        """Unsubscribe from notifications"""
+        with self.lock:
+            if wallet_id in self.listeners:
+                try:
+                    self.listeners[wallet_id].remove(q)
+                    if not self.listeners[wallet_id]:
+                        del self.listeners[wallet_id]
+                except ValueError:
+                    pass
+    
+    def broadcast(self, wallet_id: str, event_type: str, data: Dict[str, Any]):
+        """Broadcast an event to all listeners for a wallet"""
+        with span('broadcast'):
+            self.publish(wallet_id, {
+                'type': event_type,
+                'data': data,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            })
+    
+    def publish(self, wallet_id: str, event: dict):
+        """Hand an event to every subscriber of the wallet (in this process)"""
+        self.remember(wallet_id, event)
+        self.deliver(wallet_id, event)
+    
+    def remember(self, wallet_id: str, event: dict):
+        """Assign the wallet's next event id and keep the event for replay"""
+        with self.lock:
+            if (history := self.history.get(wallet_id)) is None:
+                history = self.history[wallet_id] = deque(maxlen=self.history_size)
+                if len(self.history) > self.MAX_HISTORY_WALLETS:
+                    self.history.popitem(last=False)
+            else:
+                self.history.move_to_end(wallet_id)
+            
+            # Microsecond clock keeps ids increasing across restarts
+            last_id = history[-1]['id'] if history else 0
+            event['id'] = max(last_id + 1, time.time_ns() // 1000)
+            history.append(event)
+    
+    def replay(self, wallet_id: str, last_event_id: int) -> Optional[list]:
+        """Events missed since `last_event_id`, or None if they are no longer buffered"""
+        with self.lock:
+            events = list(self.history.get(wallet_id, ()))
+        return select_replay(events, last_event_id)
+    
+    def catch_up(self, wallet_id: str, last_event_id: Optional[int]) -> list:
+        """Events to send a reconnecting client before live events"""
+        if last_event_id is None:
+            return []
+        missed = self.replay(wallet_id, last_event_id)
+        if missed is None:
+            return [{
+                'type': 'resync',
+                'data': {'last_event_id': last_event_id},
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }]
+        return missed
+    
+    def deliver(self, wallet_id: str, event: dict):
+        """Fan an event out to the local subscribers of a wallet"""
+        with self.lock:
+            if wallet_id in self.listeners:
+                dead_queues = []
+                for q in self.listeners[wallet_id]:
+                    try:
+                        q.put_nowait(event)
+                    except queue.Full:
+                        dead_queues.append(q)
+                
+                # Remove dead subscribers
+                for q in dead_queues:
+                    try:
+                        self.listeners[wallet_id].remove(q)
+                    except ValueError:
+                        pass
+
+
+class RedisNotificationBroadcaster(NotificationBroadcaster):
+    """
+    Broadcaster sharing events between processes through Redis pub/sub.
+    
+    Each wallet has its own channel. A process only subscribes to the channels of
+    wallets that have local subscribers, and fans received events out locally. A
+    single listener thread owns the pub/sub connection; it applies channel changes
+    between polls and resubscribes after a reconnect.
+    """
+    
+    CHANNEL_PREFIX = "pydentity:notifications:"
+    HISTORY_PREFIX = "pydentity:notifications-history:"
+    SEQUENCE_PREFIX = "pydentity:notifications-seq:"
+    HISTORY_TTL = 24 * 60 * 60
+    
+    # Same ids as the local history: microsecond clock, strictly increasing per wallet
+    NEXT_ID_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    if now > (tonumber(redis.call('GET', KEYS[1]) or '0') or 0) then
+        redis.call('SET', KEYS[1], ARGV[1])
+        return ARGV[1]
+    end
+    return redis.call('INCR', KEYS[1])
+    """
+    
+    def __init__(self, redis_client, poll_interval: float = 1.0, max_backoff: float = 30.0, history_size: int = None):
+        super().__init__(history_size=history_size)
+        self.redis = redis_client
+        self._next_id = redis_client.register_script(self.NEXT_ID_SCRIPT)
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self._changes = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+    
+    def channel(self, wallet_id: str) -> str:
+        return f"{self.CHANNEL_PREFIX}{wallet_id}"
+    
+    def add_listener(self, wallet_id: str, q):
+        with self.lock:
+            first = wallet_id not in self.listeners
+        q = super().add_listener(wallet_id, q)
+        if first:
+            self._changes.put(('subscribe', wallet_id))
+        self._ensure_listener()
+        return q
+    
+    def unsubscribe(self, wallet_id: str, q):
+        super().unsubscribe(wallet_id, q)
+        with self.lock:
+            last = wallet_id not in self.listeners
+        if last:
+            self._changes.put(('unsubscribe', wallet_id))
+    
+    def publish(self, wallet_id: str, event: dict):
+        try:
+            # Ids and replay history live in Redis so any process can serve a reconnect;
+            # ids follow the local scheme so a fallback publish never goes backwards
+            event['id'] = int(self._next_id(keys=[self.SEQUENCE_PREFIX + wallet_id], args=[time.time_ns() // 1000]))
+            payload = json.dumps(event)
+            history_key = self.HISTORY_PREFIX + wallet_id
+            pipe = self.redis.pipeline()
+            pipe.rpush(history_key, payload)
+            pipe.ltrim(history_key, -self.history_size, -1)
+            pipe.expire(history_key, self.HISTORY_TTL)
+            pipe.publish(self.channel(wallet_id), payload)
+            pipe.execute()
+        except Exception as e:
+            # Keep local subscribers informed even if Redis is unavailable
+            logger.warning(f"Redis publish failed, delivering locally only: {e}")
+            super().publish(wallet_id, event)
+    
+    def replay(self, wallet_id: str, last_event_id: int) -> Optional[list]:
+        try:
+            events = [json.loads(e) for e in self.redis.lrange(self.HISTORY_PREFIX + wallet_id, 0, -1)]
+        except Exception as e:
+            logger.warning(f"Redis replay failed, using local history: {e}")
+            return super().replay(wallet_id, last_event_id)
+        return select_replay(events, last_event_id)
+    
+    def _ensure_listener(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._listen, name="notification-listener", daemon=True
+                )
+                self._thread.start()
+    
+    def _apply_changes(self, pubsub):
+        while True:
+            try:
+                action, wallet_id = self._changes.get_nowait()
+            except queue.Empty:
+                return
+            with self.lock:
+                wanted = wallet_id in self.listeners
+            # Changes can be stale by the time they are applied, trust current listeners
+            if action == 'subscribe' and wanted:
+                pubsub.subscribe(self.channel(wallet_id))
+            elif action == 'unsubscribe' and not wanted:
+                pubsub.unsubscribe(self.channel(wallet_id))
+    
+    def _listen(self):
+        backoff = self.poll_interval
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                with self.lock:
+                    wallet_ids = list(self.listeners)
+                # Drop queued changes, the current listeners are the source of truth
+                while not self._changes.empty():
+                    self._changes.get_nowait()
+                if wallet_ids:
+                    pubsub.subscribe(*[self.channel(w) for w in wallet_ids])
+                logger.info(f"Redis notification listener subscribed to {len(wallet_ids)} wallets")
+                backoff = self.poll_interval
+                
+                while True:
+                    self._apply_changes(pubsub)
+                    if not pubsub.subscribed:
+                        time.sleep(self.poll_interval)
+                        continue
+                    message = pubsub.get_message(timeout=self.poll_interval)
+                    if message and message.get('type') == 'message':
+                        channel = message['channel']
+                        if isinstance(channel, bytes):
+                            channel = channel.decode()
+                        self.deliver(channel.removeprefix(self.CHANNEL_PREFIX), json.loads(message['data']))
+            except Exception as e:
+                logger.warning(f"Redis notification listener error, reconnecting in {backoff:.0f}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+def create_broadcaster() -> NotificationBroadcaster:
+    """Build the broadcaster selected by Config.NOTIFICATION_BACKEND"""
+    if Config.NOTIFICATION_BACKEND == "redis":
+        if redis_client := getattr(Config, "SESSION_REDIS", None):
+            return RedisNotificationBroadcaster(redis_client)
+        logger.warning("NOTIFICATION_BACKEND is redis but REDIS_URL is not set, using in-memory broadcaster")
+    return NotificationBroadcaster()
@@ -0,0 +1,147 @@
+"""
+Per-wallet inverted index over stored credentials.
+
+One Askar record maps every credentialSubject attribute name to the
+credentials holding it (with their value), plus a numeric column for values
+usable in AnonCreds predicates. Presentation matching then costs one read and
+a dictionary lookup per requested attribute, whatever the wallet size.
+
+Index record (category AskarStorageKeys.CREDENTIAL_INDEX, key "data"):
+    {
+        "version": 3,
+        "credentials": {key: {"name", "issuer_id", "issuer_name", "schema_id", ...}},
+        "attributes": {attr_name: {key: value}},
+        "numeric": {attr_name: {key: int}},
+    }
+"""
+from typing import Any, Dict, Iterable, Optional
+import hashlib
+import json
+
+
+def credential_key(credential: dict) -> str:
+    """Stable key of a stored credential: its id, or a digest of its content"""
+    if credential_id := credential.get('id'):
+        return credential_id
+    digest = hashlib.sha256(json.dumps(credential, sort_keys=True).encode()).hexdigest()
+    return f"sha256:{digest}"
+
+
+def normalize_attribute(name: str) -> str:
+    """AnonCreds attribute names compare case and whitespace insensitively"""
+    return ''.join(name.split()).lower()
+
+
+def parse_int(value: Any) -> Optional[int]:
+    """Parse a predicate-capable (integer) attribute value, None when it is not one"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def credential_summary(credential: dict) -> Dict[str, Any]:
+    """Fields needed to display a match and check AnonCreds restrictions"""
+    issuer = credential.get('issuer')
+    issuer = issuer if isinstance(issuer, dict) else {'id': issuer}
+    schema = credential.get('credentialSchema')
+    schema = schema if isinstance(schema, dict) else {}
+    proof = credential.get('proof')
+    proof = proof if isinstance(proof, dict) else {}
+    return {
+        'name': credential.get('name'),
+        'issuer_id': issuer.get('id'),
+        'issuer_name': issuer.get('name'),
+        'schema_id': schema.get('id'),
+        'schema_name': schema.get('name'),
+        'schema_version': schema.get('version'),
+        'cred_def_id': proof.get('verificationMethod') if schema.get('type') == 'AnonCredsSchema' else None,
+        'valid_from': credential.get('validFrom') or credential.get('issuanceDate'),
+    }
+
+
+def empty_index() -> Dict[str, Any]:
+    return {'version': 0, 'credentials': {}, 'attributes': {}, 'numeric': {}}
+
+
+def apply_to_index(index: Dict[str, Any], added: Iterable[dict] = (), removed: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Add credentials to and remove credential keys from an index in place.
+
+    Re-adding a credential with a known key replaces its previous entries.
+    The version is bumped so cached match results can tell they are stale.
+    """
+    def drop(key):
+        if index['credentials'].pop(key, None) is None:
+            return
+        for column in ('attributes', 'numeric'):
+            for name in list(index[column]):
+                index[column][name].pop(key, None)
+                if not index[column][name]:
+                    del index[column][name]
+
+    for key in removed:
+        drop(key)
+
+    for credential in added:
+        key = credential_key(credential)
+        drop(key)
+        index['credentials'][key] = credential_summary(credential)
+        subject = credential.get('credentialSubject')
+        for name, value in (subject.items() if isinstance(subject, dict) else ()):
+            if name == 'id' or isinstance(value, (dict, list)):
+                continue
+            name = normalize_attribute(name)
+            index['attributes'].setdefault(name, {})[key] = value
+            if (number := parse_int(value)) is not None:
+                index['numeric'].setdefault(name, {})[key] = number
+
+    index['version'] = index.get('version', 0) + 1
+    return index
+
+
+async def update_credential_index(askar, added: Iterable[dict] = (), removed: Iterable[str] = ()):
+    """Apply stored/removed credentials to the wallet's index in one transaction"""
+    from app.plugins import AskarStorageKeys
+
+    added, removed = list(added), list(removed)
+    # Agent matches cached for open presentation requests may now be incomplete
+    await askar.delete_all(AskarStorageKeys.PRES_EX_CREDENTIALS)
+    if await askar.fetch(AskarStorageKeys.CREDENTIAL_INDEX) is None:
+        # No index yet: build it from storage, which already holds the change
+        return await rebuild_credential_index(askar)
+    return await askar.modify(
+        AskarStorageKeys.CREDENTIAL_INDEX,
+        'data',
+        lambda index: apply_to_index(index, added, removed),
+        default=empty_index(),
+    )
+
+
+async def rebuild_credential_index(askar):
+    """Index every stored credential from scratch"""
+    from app.plugins import AskarStorageKeys
+
+    credentials = await askar.fetch(AskarStorageKeys.CREDENTIALS) or []
+    previous = await askar.fetch(AskarStorageKeys.CREDENTIAL_INDEX) or empty_index()
+
+    def rebuild(_):
+        index = empty_index()
+        index['version'] = previous.get('version', 0)
+        return apply_to_index(index, credentials)
+
+    return await askar.modify(AskarStorageKeys.CREDENTIAL_INDEX, 'data', rebuild)
+
+
+async def get_credential_index(askar) -> Dict[str, Any]:
+    """The wallet's index, built on first use for wallets that predate it"""
+    from app.plugins import AskarStorageKeys
+
+    index = await askar.fetch(AskarStorageKeys.CREDENTIAL_INDEX)
+    if index is None:
+        index = await rebuild_credential_index(askar) or empty_index()
+    return index
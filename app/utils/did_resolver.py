@@ -0,0 +1,195 @@
+"""
+Ed25519 verification method resolution for local proof verification.
+
+did:key keys are decoded from the identifier itself; did:web documents are
+fetched once and kept for DID_WEB_CACHE_TTL seconds. Resolved verification
+methods are memoized, so verifying many credentials from the same issuer
+costs at most one network round trip.
+
+A method is only returned for a verification relationship (assertionMethod,
+authentication) its DID document lists it under; a did:key method holds
+every relationship.
+"""
+from functools import lru_cache
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import unquote
+import base64
+import logging
+import threading
+import time
+
+import requests
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+ED25519_PUB_CODEC = b"\xed\x01"  # multicodec ed25519-pub (varint 0xed)
+RELATIONSHIPS = ("assertionMethod", "authentication")
+
+
+class ResolutionError(Exception):
+    """A verification method could not be resolved to an Ed25519 public key"""
+
+
+class UnauthorizedMethod(Exception):
+    """The DID document does not list the verification method under the relationship"""
+
+
+def b58decode(value: str) -> bytes:
+    number = 0
+    for char in value:
+        index = BASE58_ALPHABET.find(char)
+        if index < 0:
+            raise ValueError(f"Invalid base58 character: {char!r}")
+        number = number * 58 + index
+    body = number.to_bytes((number.bit_length() + 7) // 8, "big") if number else b""
+    return b"\x00" * (len(value) - len(value.lstrip("1"))) + body
+
+
+def b58encode(data: bytes) -> str:
+    number = int.from_bytes(data, "big")
+    encoded = ""
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+    return "1" * (len(data) - len(data.lstrip(b"\x00"))) + encoded
+
+
+def multibase_decode(value: str) -> bytes:
+    """Decode a base58btc ('z') multibase string"""
+    if not value or value[0] != "z":
+        raise ValueError("Only base58btc multibase values are supported")
+    return b58decode(value[1:])
+
+
+def ed25519_from_multikey(value: str) -> bytes:
+    """Raw public key of a multibase ed25519-pub multikey (z6Mk...)"""
+    decoded = multibase_decode(value)
+    if not decoded.startswith(ED25519_PUB_CODEC) or len(decoded) != 34:
+        raise ResolutionError("Not an Ed25519 multikey")
+    return decoded[2:]
+
+
+def ed25519_multikey(public_key: bytes) -> str:
+    """Multibase multikey of a raw Ed25519 public key"""
+    return "z" + b58encode(ED25519_PUB_CODEC + public_key)
+
+
+def _split(verification_method: str) -> Tuple[str, str]:
+    did, _, fragment = verification_method.partition("#")
+    return did, fragment
+
+
+@lru_cache(maxsize=4096)
+def resolve_did_key(verification_method: str) -> bytes:
+    """did:key:z6Mk...[#z6Mk...] -> Ed25519 public key"""
+    did, fragment = _split(verification_method)
+    multikey = did.split(":")[-1]
+    if fragment and fragment != multikey:
+        raise ResolutionError(f"Unknown did:key verification method: {verification_method}")
+    return ed25519_from_multikey(multikey)
+
+
+def did_web_url(did: str) -> str:
+    """did:web:example.com[:path] -> URL of the DID document"""
+    domain, *path = did.split(":")[2:]
+    domain = unquote(domain)
+    if path:
+        return f"https://{domain}/{'/'.join(unquote(part) for part in path)}/did.json"
+    return f"https://{domain}/.well-known/did.json"
+
+
+def key_from_method(method: dict) -> bytes:
+    """Ed25519 public key of a DID document verification method"""
+    if multikey := method.get("publicKeyMultibase"):
+        return ed25519_from_multikey(multikey)
+    jwk = method.get("publicKeyJwk") or {}
+    if jwk.get("kty") == "OKP" and jwk.get("crv") == "Ed25519" and jwk.get("x"):
+        return base64.urlsafe_b64decode(jwk["x"] + "=" * (-len(jwk["x"]) % 4))
+    raise ResolutionError(f"Unsupported verification method: {method.get('id')}")
+
+
+class DidWebResolver:
+    """
+    did:web resolution with a TTL cache of resolved keys and relationships.
+
+    Args:
+        ttl: Seconds a fetched DID document stays valid
+        timeout: HTTP timeout in seconds
+    """
+
+    def __init__(self, ttl: float = 3600, timeout: float = 5):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.documents: Dict[str, Tuple[float, Dict[str, bytes], Dict[str, Set[str]]]] = {}
+        self.lock = threading.Lock()
+
+    def _fetch(self, did: str) -> Tuple[Dict[str, bytes], Dict[str, Set[str]]]:
+        r = requests.get(did_web_url(did), headers={"Accept": "application/json"}, timeout=self.timeout)
+        r.raise_for_status()
+        document = r.json()
+
+        def absolute(method_id: str) -> str:
+            return did + method_id if method_id.startswith("#") else method_id
+
+        keys, relationships = {}, {}
+
+        def add_key(method: dict):
+            try:
+                keys[absolute(method.get("id", ""))] = key_from_method(method)
+            except (ResolutionError, ValueError):
+                pass
+
+        for method in document.get("verificationMethod", []):
+            add_key(method)
+        for relationship in RELATIONSHIPS:
+            methods = relationships[relationship] = set()
+            for method in document.get(relationship, []):
+                # Methods are referenced by id or embedded in the relationship
+                if isinstance(method, dict):
+                    add_key(method)
+                    method = method.get("id", "")
+                methods.add(absolute(method))
+        return keys, relationships
+
+    def resolve(self, verification_method: str, relationship: str) -> bytes:
+        did, _ = _split(verification_method)
+        with self.lock:
+            expires, keys, relationships = self.documents.get(did, (0, {}, {}))
+        if expires < time.monotonic():
+            try:
+                keys, relationships = self._fetch(did)
+            except (requests.RequestException, ValueError) as e:
+                raise ResolutionError(f"Could not resolve {did}: {e}")
+            with self.lock:
+                self.documents[did] = (time.monotonic() + self.ttl, keys, relationships)
+        if verification_method not in keys:
+            raise ResolutionError(f"Verification method not found: {verification_method}")
+        if verification_method not in relationships.get(relationship, ()):
+            raise UnauthorizedMethod(f"{verification_method} is not an {relationship} method of {did}")
+        return keys[verification_method]
+
+
+did_web_resolver = DidWebResolver(ttl=Config.DID_WEB_CACHE_TTL)
+
+
+def resolve_verification_method(verification_method: Optional[str], relationship: str = "assertionMethod") -> bytes:
+    """
+    Ed25519 public key of a did:key or did:web verification method.
+
+    Raises:
+        ResolutionError: The method could not be resolved (unsupported DID method, network)
+        UnauthorizedMethod: The method is not listed under `relationship`
+    """
+    if not verification_method:
+        raise ResolutionError("Proof has no verificationMethod")
+    if verification_method.startswith("did:key:"):
+        try:
+            return resolve_did_key(verification_method)
+        except ValueError as e:
+            raise ResolutionError(str(e))
+    if verification_method.startswith("did:web:"):
+        return did_web_resolver.resolve(verification_method, relationship)
+    raise ResolutionError(f"Unsupported DID method: {verification_method}")
@@ -0,0 +1,142 @@
+"""
+Pooled async HTTP client for outbound fetches (QR scans, VC-API exchanges).
+
+Routes run each request in its own asyncio.run loop, so a pooled
+httpx.AsyncClient cannot live on the caller's loop. It lives on one
+background loop thread instead, and callers await its results from their
+own loop. Every request has a timeout.
+
+GETs can be cached briefly (SCAN_CACHE_TTL): repeated scans of the same
+interaction URL within the TTL are served locally, and concurrent scans of
+the same URL share one in-flight request. Single-use documents (e.g. _oobid
+invitations) are fetched uncached.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import copy
+import logging
+import threading
+import time
+
+import httpx
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Cache miss marker, a cached JSON null is a hit
+_MISS = object()
+
+
+class AsyncHttpClient:
+    """
+    httpx.AsyncClient on a dedicated event loop thread, with a TTL cache for GETs.
+
+    Args:
+        timeout: Seconds for connect/read/write/pool waits
+        max_connections: Connection pool size
+        cache_ttl: Seconds a cached GET stays valid (0 disables caching)
+        cache_size: Cached responses kept, least recently used dropped first
+    """
+
+    def __init__(self, timeout: float = 10, max_connections: int = 20,
+                 cache_ttl: float = 60, cache_size: int = 256):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self.inflight: Dict[Tuple, asyncio.Task] = {}
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.client: Optional[httpx.AsyncClient] = None
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-client", daemon=True).start()
+                self.client = asyncio.run_coroutine_threadsafe(self._create_client(), loop).result()
+                self.loop = loop
+            return self.loop
+
+    async def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            follow_redirects=True,
+        )
+
+    async def _call(self, coro):
+        """Run a coroutine on the client loop and await it from the caller's loop"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._start()))
+
+    async def _request_json(self, method: str, url: str, **kwargs) -> Any:
+        r = await self.client.request(method, url, **kwargs)
+        r.raise_for_status()
+        return r.json()
+
+    def _cached(self, key: Tuple):
+        with self.lock:
+            expires, value = self.cache.get(key, (0, _MISS))
+            if expires < time.monotonic():
+                self.cache.pop(key, None)
+                return _MISS
+            self.cache.move_to_end(key)
+            return value
+
+    def _remember(self, key: Tuple, value: Any):
+        with self.lock:
+            self.cache[key] = (time.monotonic() + self.cache_ttl, value)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    async def _get_shared(self, key: Tuple, url: str, headers: Optional[dict]) -> Any:
+        """On the client loop: one request per key at a time, cached on success"""
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request_json("GET", url, headers=headers))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        value = await asyncio.shield(task)
+        self._remember(key, value)
+        return value
+
+    async def get_json(self, url: str, headers: Optional[dict] = None, cache: bool = False) -> Any:
+        """
+        GET a JSON document.
+
+        Args:
+            cache: Serve from / store in the short-lived cache
+
+        Raises:
+            httpx.HTTPError: Network error, timeout or non-2xx response
+            ValueError: The response is not JSON
+        """
+        if not (cache and self.cache_ttl):
+            return await self._call(self._request_json("GET", url, headers=headers))
+
+        key = ("GET", url, tuple(sorted((headers or {}).items())))
+        value = self._cached(key)
+        if value is _MISS:
+            value = await self._call(self._get_shared(key, url, headers))
+        # Callers may modify the document (e.g. invitations), never the cached one
+        return copy.deepcopy(value)
+
+    async def post_json(self, url: str, json: Any = None, headers: Optional[dict] = None) -> Any:
+        """POST a JSON body and return the JSON response (never cached)"""
+        return await self._call(self._request_json("POST", url, json=json, headers=headers))
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+
+http_client = AsyncHttpClient(
+    timeout=Config.HTTP_TIMEOUT,
+    max_connections=Config.HTTP_MAX_CONNECTIONS,
+    cache_ttl=Config.SCAN_CACHE_TTL,
+    cache_size=Config.SCAN_CACHE_SIZE,
+)
@@ -0,0 +1,299 @@
+"""
+Presentation request matching against the wallet's credential index.
+
+Matching runs when the request-received webhook arrives and the result is
+kept per exchange, so opening the request renders from storage without any
+agent calls. A stored result records the index version it was computed
+from and is recomputed when credentials have changed since.
+
+The agent's own matching credentials, needed to send the presentation, are
+fetched when the request is viewed (not in the webhook) and kept per exchange
+for a short time (PRESENTATION_CACHE_TTL) together with the credential
+selection built from them, and dropped when credentials are stored.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import re
+
+from .credential_index import get_credential_index, normalize_attribute
+from .predicates import evaluate_predicates
+
+
+# Legacy (unqualified) schema and cred def ids: <did>:2:<name>:<version>, <did>:3:CL:<schema>:<tag>
+LEGACY_ID = re.compile(r'^(.+?):[23]:')
+
+
+def anoncreds_issuer(identifier: Optional[str]) -> Optional[str]:
+    """
+    Issuer DID of an AnonCreds schema or credential definition id.
+
+    Legacy ids put it before ':2:' (schema) or ':3:' (cred def), DID-based ids
+    before the first '/'. None when the id has neither form.
+    """
+    if not identifier:
+        return None
+    if identifier.startswith('did:') and '/' in identifier:
+        return identifier.split('/')[0]
+    if legacy := LEGACY_ID.match(identifier):
+        return legacy.group(1)
+    return None
+
+
+# AnonCreds restriction keys -> their value for a credential index summary.
+# The issuer comes from the cred def id, not the summary's issuer_id, which
+# for credentials stored from exchanges is the connection's DID.
+RESTRICTION_FIELDS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    'schema_id': lambda summary: summary.get('schema_id'),
+    'schema_name': lambda summary: summary.get('schema_name'),
+    'schema_version': lambda summary: summary.get('schema_version'),
+    'cred_def_id': lambda summary: summary.get('cred_def_id'),
+    'issuer_did': lambda summary: anoncreds_issuer(summary.get('cred_def_id')),
+    'issuer_id': lambda summary: anoncreds_issuer(summary.get('cred_def_id')),
+    'schema_issuer_did': lambda summary: anoncreds_issuer(summary.get('schema_id')),
+    'schema_issuer_id': lambda summary: anoncreds_issuer(summary.get('schema_id')),
+}
+
+
+def match_presentation_request(anoncreds_request: dict, index: dict) -> Dict[str, Any]:
+    """
+    Match an AnonCreds presentation request against a credential index.
+
+    Attribute groups ('names') are satisfied by a single credential holding
+    every name, predicates by every credential meeting them; credentials are
+    ranked newest first.
+
+    Returns:
+        {'matched_attributes', 'matched_predicates', 'can_respond', 'index_version'}
+    """
+    credentials = index.get('credentials', {})
+    attributes = index.get('attributes', {})
+
+    def newest_first(keys):
+        return sorted(keys, key=lambda key: credentials.get(key, {}).get('valid_from') or '', reverse=True)
+
+    # Restriction key -> {value: credential keys}, built once per key the request uses;
+    # None collects the credentials the key cannot be checked for
+    postings = {}
+
+    def posting(field):
+        if field not in postings:
+            column = postings[field] = {}
+            for key, summary in credentials.items():
+                column.setdefault(RESTRICTION_FIELDS[field](summary), set()).add(key)
+        return postings[field]
+
+    def allowed(restrictions, holders):
+        """
+        The holders meeting AnonCreds restrictions: any one restriction has to hold,
+        each of its keys must match. Keys the index cannot check (e.g.
+        attr::<name>::value, or a cred def id for a credential without one) are
+        not held against a credential.
+        """
+        if not restrictions:
+            return set(holders)
+        keys = set()
+        for restriction in restrictions:
+            candidates = set(holders)
+            for field, value in restriction.items():
+                if field in RESTRICTION_FIELDS and candidates:
+                    column = posting(field)
+                    candidates &= column.get(value, set()) | column.get(None, set())
+            keys |= candidates
+        return keys
+
+    matched_attributes = []
+    for attr_id, attr_info in anoncreds_request.get('requested_attributes', {}).items():
+        # AnonCreds uses 'names' (list) or 'name' (single string)
+        attr_names = attr_info.get('names') or ([attr_info['name']] if attr_info.get('name') else [])
+        restrictions = attr_info.get('restrictions', [])
+
+        holders = [set(attributes.get(normalize_attribute(name), {})) for name in attr_names]
+        candidates = newest_first(allowed(restrictions, set.intersection(*holders))) if holders else []
+        credential_key = candidates[0] if candidates else None
+        matching_cred = credentials.get(credential_key) if credential_key else None
+
+        for attr_name in attr_names:
+            matched_attributes.append({
+                'id': f"{attr_id}_{attr_name}",
+                'referent': attr_id,
+                'name': attr_name,
+                'value': attributes.get(normalize_attribute(attr_name), {}).get(credential_key),
+                'credential_key': credential_key,
+                'candidates': len(candidates),
+                'credential_name': matching_cred.get('name') if matching_cred else None,
+                'issuer_name': matching_cred.get('issuer_name') if matching_cred else None,
+                'has_match': matching_cred is not None,
+                'restrictions': restrictions
+            })
+
+    requested_predicates = anoncreds_request.get('requested_predicates', {})
+    numeric = index.get('numeric', {})
+    satisfying = evaluate_predicates(
+        requested_predicates,
+        numeric,
+        candidates=lambda predicate: allowed(
+            predicate.get('restrictions', []),
+            numeric.get(normalize_attribute(predicate.get('name') or ''), {}),
+        ),
+        rank=lambda key: credentials.get(key, {}).get('valid_from') or '',
+        descending=True,
+    )
+
+    matched_predicates = []
+    for pred_id, pred_info in requested_predicates.items():
+        pred_name = pred_info.get('name')
+        holders = attributes.get(normalize_attribute(pred_name or ''), {})
+        # Without a satisfying credential, show the newest holder's value
+        credential_keys = satisfying.get(pred_id) or newest_first(holders)
+        credential_key = credential_keys[0] if credential_keys else None
+        matching_cred = credentials.get(credential_key) if credential_key else None
+
+        matched_predicates.append({
+            'id': pred_id,
+            'name': pred_name,
+            'p_type': pred_info.get('p_type', '>='),
+            'p_value': pred_info.get('p_value'),
+            'actual_value': holders.get(credential_key),
+            'meets_condition': bool(satisfying.get(pred_id)),
+            'credential_key': credential_key,
+            'candidates': len(satisfying.get(pred_id, [])),
+            'credential_name': matching_cred.get('name') if matching_cred else None,
+            'issuer_name': matching_cred.get('issuer_name') if matching_cred else None,
+            'has_match': matching_cred is not None
+        })
+
+    return {
+        'matched_attributes': matched_attributes,
+        'matched_predicates': matched_predicates,
+        'can_respond': all(attr['has_match'] for attr in matched_attributes)
+        and all(pred['has_match'] and pred['meets_condition'] for pred in matched_predicates),
+        'index_version': index.get('version', 0),
+    }
+
+
+async def store_presentation_match(askar, exchange_id: str, anoncreds_request: dict, **request_info) -> dict:
+    """
+    Match a presentation request now and keep the result for the exchange.
+
+    Args:
+        askar: Wallet storage
+        exchange_id: pres_ex_id
+        anoncreds_request: The request's by_format.pres_request.anoncreds
+        request_info: Extra fields rendered with the match (verifier_name, connection_id, ...)
+    """
+    from app.plugins import AskarStorageKeys
+
+    index = await get_credential_index(askar)
+    record = {
+        'exchange_id': exchange_id,
+        'request_name': anoncreds_request.get('name', 'Presentation Request'),
+        'anoncreds_request': anoncreds_request,
+        **request_info,
+        **match_presentation_request(anoncreds_request, index),
+    }
+    await askar.modify(AskarStorageKeys.PRES_EX_MATCHES, exchange_id, lambda _: record)
+    return record
+
+
+async def load_presentation_match(askar, exchange_id: str):
+    """
+    The stored match for an exchange, recomputed if credentials changed since.
+
+    Returns:
+        The match record, or None when the exchange was never matched
+    """
+    from app.plugins import AskarStorageKeys
+
+    record = await askar.fetch(AskarStorageKeys.PRES_EX_MATCHES, exchange_id)
+    if not record:
+        return None
+
+    index = await get_credential_index(askar)
+    if record.get('index_version') != index.get('version'):
+        record.update(match_presentation_request(record.get('anoncreds_request', {}), index))
+        await askar.modify(AskarStorageKeys.PRES_EX_MATCHES, exchange_id, lambda _: record)
+    return record
+
+
+def compact_agent_matches(matching_credentials: List[dict]) -> List[dict]:
+    """Keep only what a selection needs from the agent's (possibly large) matching credentials"""
+    return [
+        {
+            'cred_id': match['cred_info'].get('referent'),
+            'referents': match['presentation_referents'],
+            'timestamp': (match.get('interval') or {}).get('to'),
+        }
+        for match in matching_credentials or []
+        if 'cred_info' in match and 'presentation_referents' in match
+    ]
+
+
+def select_credentials(anoncreds_request: dict, matches: List[dict]) -> Dict[str, dict]:
+    """
+    AnonCreds presentation spec using the first matching credential for each referent.
+
+    Args:
+        anoncreds_request: The presentation request
+        matches: Output of compact_agent_matches
+    """
+    attribute_ids = set(anoncreds_request.get('requested_attributes', {}))
+    predicate_ids = set(anoncreds_request.get('requested_predicates', {}))
+    requested_attributes = {}
+    requested_predicates = {}
+
+    for match in matches:
+        for referent in match['referents']:
+            if referent in attribute_ids:
+                selected = requested_attributes.setdefault(referent, {'cred_id': match['cred_id'], 'revealed': True})
+            elif referent in predicate_ids:
+                selected = requested_predicates.setdefault(referent, {'cred_id': match['cred_id']})
+            else:
+                continue
+            if match['timestamp'] and selected['cred_id'] == match['cred_id']:
+                selected['timestamp'] = match['timestamp']
+
+    return {
+        'requested_attributes': requested_attributes,
+        'requested_predicates': requested_predicates,
+        'self_attested_attributes': {},
+    }
+
+
+async def load_agent_matches(askar, agent, exchange_id: str, refresh: bool = False) -> dict:
+    """
+    The agent's matching credentials for an exchange and the selection built from them.
+
+    Served from the per-exchange cache unless refresh is set; the request itself
+    comes from the stored match record when there is one.
+
+    Returns:
+        {'matches': [...], 'selection': {...}}
+    """
+    from app.plugins import AskarStorageKeys
+    from config import Config
+
+    if not refresh:
+        cached = await askar.fetch(AskarStorageKeys.PRES_EX_CREDENTIALS, exchange_id)
+        if cached:
+            return cached
+
+    record = await askar.fetch(AskarStorageKeys.PRES_EX_MATCHES, exchange_id)
+    anoncreds_request = (record or {}).get('anoncreds_request')
+    if anoncreds_request is None:
+        pres_ex = agent.get_presentation_exchange_info(exchange_id)
+        anoncreds_request = pres_ex.get('by_format', {}).get('pres_request', {}).get('anoncreds', {})
+
+    matches = compact_agent_matches(agent.get_matching_credentials_for_presentation(exchange_id))
+    entry = {'matches': matches, 'selection': select_credentials(anoncreds_request, matches)}
+
+    if ttl := Config.PRESENTATION_CACHE_TTL:
+        if not await askar.store(AskarStorageKeys.PRES_EX_CREDENTIALS, exchange_id, entry, expiry_ms=ttl * 1000):
+            await askar.update(AskarStorageKeys.PRES_EX_CREDENTIALS, exchange_id, entry, expiry_ms=ttl * 1000)
+    return entry
+
+
+async def forget_presentation(askar, exchange_id: str):
+    """Drop everything kept for a finished, abandoned or declined exchange"""
+    from app.plugins import AskarStorageKeys
+
+    await askar.delete(AskarStorageKeys.PRES_EX_MATCHES, exchange_id)
+    await askar.delete(AskarStorageKeys.PRES_EX_CREDENTIALS, exchange_id)
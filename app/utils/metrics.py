@@ -0,0 +1,132 @@
+"""In-process metrics registry with Prometheus text exposition"""
+from typing import Dict, Tuple
+import threading
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+    
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        return self.values.get(key, 0)
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in self.values.items():
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+    
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self.lock:
+            self.values[key] = value
+    
+    def render(self) -> list:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """Cumulative bucket histogram with optional labels"""
+    
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self.series: Dict[tuple, dict] = {}
+        self.lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self.lock:
+            series = self.series.setdefault(
+                key, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in self.series.items():
+                for bound, count in zip(self.buckets, series['buckets']):
+                    le = _labels(self.labels + ('le',), key + (str(bound),))
+                    lines.append(f"{self.name}_bucket{le} {count}")
+                inf = _labels(self.labels + ('le',), key + ('+Inf',))
+                lines.append(f"{self.name}_bucket{inf} {series['count']}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {series['count']}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    """Label value escaping of the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class MetricsRegistry:
+    """Process-wide collection of named metrics"""
+    
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+    
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, *args, **kwargs)
+            return self.metrics[name]
+    
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+    
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labels)
+    
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = None) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets)
+    
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Global registry instance
+metrics = MetricsRegistry()
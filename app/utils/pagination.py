@@ -0,0 +1,99 @@
+"""
+Cursor pagination and field projection for wallet list endpoints.
+
+Credentials and connections are stored as one array per wallet and only ever
+appended to (or upserted in place), so a position in that array is a stable
+cursor: new entries land after every page already handed out.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def page_size(value: Optional[int]) -> int:
+    """Clamp a requested page size to [1, MAX_PAGE_SIZE]"""
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    return min(max(value, 1), MAX_PAGE_SIZE)
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    """Parse a ?fields=name,issuer.name projection (None keeps every field)"""
+    if not value:
+        return None
+    return [field.strip() for field in value.split(',') if field.strip()]
+
+
+def project(item: Dict[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """
+    Keep only the requested fields of an item.
+
+    Dotted paths select nested fields, e.g. 'issuer.name' yields
+    {'issuer': {'name': ...}}. Missing fields are left out.
+    """
+    if not fields:
+        return item
+
+    projected: Dict[str, Any] = {}
+    for field in fields:
+        source, target = item, projected
+        *parents, leaf = field.split('.')
+        for parent in parents:
+            source = source.get(parent) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(parent, {})
+        else:
+            if leaf in source:
+                target[leaf] = source[leaf]
+    return projected
+
+
+def paginate(items: List[Dict[str, Any]], cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+             fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Slice one page out of a stored array.
+
+    Args:
+        items: The stored array, in storage order
+        cursor: Position of the first item of the page (from a previous next_cursor)
+        limit: Page size
+        fields: Optional projection applied to each item
+
+    Returns:
+        {'items': [...], 'offset': int, 'next_cursor': str | None, 'total': int}
+    """
+    try:
+        offset = max(int(cursor), 0) if cursor else 0
+    except ValueError:
+        offset = 0
+
+    end = offset + limit
+    return {
+        'items': [project(item, fields) for item in items[offset:end]],
+        'offset': offset,
+        'next_cursor': str(end) if end < len(items) else None,
+        'total': len(items),
+    }
+
+
+def page_response(page: Dict[str, Any], name: str, list_template: str, modal_template: str = None):
+    """
+    Respond with a page as JSON, or as rendered list fragments for ?format=html.
+
+    The HTML form is what the wallet home page appends when loading more, it
+    reuses the same list (and modal) components as the initial render.
+    """
+    from flask import jsonify, render_template, request
+
+    if request.args.get('format') != 'html':
+        return jsonify({name: page['items'], 'next_cursor': page['next_cursor'], 'total': page.get('total')})
+
+    context = {name: page['items'], 'offset': page.get('offset', 0)}
+    return jsonify({
+        'html': render_template(list_template, **context),
+        'modals': render_template(modal_template, **context) if modal_template else None,
+        'next_cursor': page['next_cursor'],
+    })
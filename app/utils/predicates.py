@@ -0,0 +1,84 @@
+"""
+Batch evaluation of AnonCreds predicates over a wallet's credentials.
+
+Candidate values are parsed once into a sorted numeric column per attribute;
+each predicate is then a binary search over that column, returning every
+satisfying credential instead of stopping at the first holder.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .credential_index import normalize_attribute, parse_int
+
+
+OPERATORS = ('>=', '>', '<=', '<')
+
+
+class NumericColumn:
+    """Integer values of one attribute across candidate credentials, sorted once"""
+
+    def __init__(self, values: Dict[str, Any]):
+        """
+        Args:
+            values: credential key -> raw attribute value (unparseable values are left out)
+        """
+        rows = sorted(
+            (number, key) for key, number in ((key, parse_int(value)) for key, value in values.items())
+            if number is not None
+        )
+        self.numbers = [number for number, _ in rows]
+        self.keys = [key for _, key in rows]
+        self.values = dict(zip(self.keys, self.numbers))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def select(self, p_type: str, p_value: Any) -> List[str]:
+        """Keys of every credential satisfying `value <p_type> p_value`"""
+        threshold = parse_int(p_value)
+        if threshold is None or p_type not in OPERATORS:
+            return []
+        if p_type == '>=':
+            return self.keys[bisect_left(self.numbers, threshold):]
+        if p_type == '>':
+            return self.keys[bisect_right(self.numbers, threshold):]
+        if p_type == '<=':
+            return self.keys[:bisect_right(self.numbers, threshold)]
+        return self.keys[:bisect_left(self.numbers, threshold)]
+
+
+def evaluate_predicates(
+    predicates: Dict[str, dict],
+    numeric: Dict[str, Dict[str, Any]],
+    candidates: Optional[Callable[[dict], Iterable[str]]] = None,
+    rank: Optional[Callable[[str], Any]] = None,
+    descending: bool = False,
+) -> Dict[str, List[str]]:
+    """
+    Evaluate every requested predicate in one pass.
+
+    Args:
+        predicates: Referent -> AnonCreds predicate ({name, p_type, p_value, restrictions})
+        numeric: Normalized attribute name -> {credential key: value}, e.g. the
+                 'numeric' column of the credential index
+        candidates: Optional filter giving the credential keys allowed for a
+                    predicate (restrictions); all holders when omitted
+        rank: Optional sort key for satisfying credentials
+        descending: Highest rank first (e.g. newest issuance date)
+
+    Returns:
+        Referent -> satisfying credential keys, best ranked first
+    """
+    columns: Dict[str, NumericColumn] = {}
+    results = {}
+    for referent, predicate in predicates.items():
+        name = normalize_attribute(predicate.get('name') or '')
+        if name not in columns:
+            columns[name] = NumericColumn(numeric.get(name, {}))
+
+        satisfying = columns[name].select(predicate.get('p_type', '>='), predicate.get('p_value'))
+        if candidates is not None:
+            allowed = set(candidates(predicate))
+            satisfying = [key for key in satisfying if key in allowed]
+        results[referent] = sorted(satisfying, key=rank, reverse=descending) if rank else satisfying
+    return results
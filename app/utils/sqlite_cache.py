@@ -0,0 +1,146 @@
+"""
+SQLite (WAL) cachelib backend for sessions and WebAuthn challenges.
+
+Used instead of cachelib's FileSystemCache when no Redis is configured: one
+database file instead of one file per entry, expiry is an indexed column and
+expired rows are removed in small batches, and nothing live is ever evicted
+to make room.
+"""
+from cachelib.base import BaseCache
+from cachelib.serializers import BaseSerializer
+from pathlib import Path
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache(BaseCache):
+    """
+    cachelib cache stored in a SQLite table.
+
+    Each thread keeps its own connection. Several caches can share one
+    database file by using different tables.
+
+    Args:
+        path: Database file
+        table: Table holding this cache's entries
+        default_timeout: Seconds until an entry expires (0 never expires)
+        cleanup_interval: Minimum seconds between expired-row sweeps
+        cleanup_batch: Rows deleted per sweep, keeps each write transaction short
+    """
+
+    serializer = BaseSerializer()
+
+    def __init__(self, path: str, table: str = "cache", default_timeout: int = 300,
+                 cleanup_interval: float = 60, cleanup_batch: int = 500):
+        super().__init__(default_timeout)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.cleanup_interval = cleanup_interval
+        self.cleanup_batch = cleanup_batch
+        self._local = threading.local()
+        self._next_cleanup = 0.0
+        self._cleanup_lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        db = self._connection()
+        db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+        )
+        db.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires)")
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _expires(self, timeout) -> float:
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout else 0
+
+    def _maybe_cleanup(self):
+        now = time.time()
+        if now < self._next_cleanup or not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_cleanup = now + self.cleanup_interval
+            self.cleanup(now)
+        finally:
+            self._cleanup_lock.release()
+
+    def cleanup(self, now: float = None) -> int:
+        """Delete expired entries in batches, returns the number removed"""
+        now = now or time.time()
+        removed = 0
+        db = self._connection()
+        while True:
+            deleted = db.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN "
+                f"(SELECT rowid FROM {self.table} WHERE expires > 0 AND expires <= ? LIMIT ?)",
+                (now, self.cleanup_batch),
+            ).rowcount
+            removed += deleted
+            if deleted < self.cleanup_batch:
+                break
+        if removed:
+            logger.debug(f"Removed {removed} expired entries from {self.table}")
+        return removed
+
+    def get(self, key: str):
+        row = self._connection().execute(
+            f"SELECT value FROM {self.table} WHERE key = ? AND (expires = 0 OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return self.serializer.loads(row[0]) if row else None
+
+    def has(self, key: str) -> bool:
+        return self._connection().execute(
+            f"SELECT 1 FROM {self.table} WHERE key = ? AND (expires = 0 OR expires > ?)",
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def set(self, key: str, value, timeout: int = None) -> bool:
+        self._connection().execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)",
+            (key, self.serializer.dumps(value), self._expires(timeout)),
+        )
+        self._maybe_cleanup()
+        return True
+
+    def add(self, key: str, value, timeout: int = None) -> bool:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                f"DELETE FROM {self.table} WHERE key = ? AND expires > 0 AND expires <= ?",
+                (key, time.time()),
+            )
+            added = db.execute(
+                f"INSERT OR IGNORE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)",
+                (key, self.serializer.dumps(value), self._expires(timeout)),
+            ).rowcount == 1
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self._maybe_cleanup()
+        return added
+
+    def delete(self, key: str) -> bool:
+        return self._connection().execute(
+            f"DELETE FROM {self.table} WHERE key = ?", (key,)
+        ).rowcount == 1
+
+    def clear(self) -> bool:
+        self._connection().execute(f"DELETE FROM {self.table}")
+        return True
@@ -0,0 +1,90 @@
+"""Timing spans for a single unit of work, such as one webhook event"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+import time
+
+_current_trace: ContextVar[Optional["EventTrace"]] = ContextVar("event_trace", default=None)
+
+
+class EventTrace:
+    """
+    Collects the spans recorded while an event is processed.
+    
+    Entering the trace makes it current, so agent calls, Askar operations and
+    broadcasts record themselves without the trace being passed around.
+    """
+    
+    def __init__(self, topic: str, state: str = None, wallet_id: str = None, queue_wait: float = 0.0):
+        self.topic = topic
+        self.state = state
+        self.wallet_id = wallet_id
+        self.queue_wait = queue_wait
+        self.spans = []
+        self.duration = None
+        self._started = None
+        self._token = None
+    
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._token = _current_trace.set(self)
+        return self
+    
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter() - self._started
+        _current_trace.reset(self._token)
+        return False
+    
+    def add(self, name: str, seconds: float):
+        self.spans.append((name, seconds))
+    
+    def breakdown(self) -> dict:
+        """Total seconds per span kind ('agent', 'askar', 'broadcast', ...)"""
+        totals = {}
+        for name, seconds in self.spans:
+            kind = name.split(' ')[0].split('.')[0]
+            totals[kind] = totals.get(kind, 0.0) + seconds
+        return totals
+    
+    def to_record(self) -> dict:
+        return {
+            'topic': self.topic,
+            'state': self.state,
+            'wallet_id': self.wallet_id,
+            'queue_wait_ms': round(self.queue_wait * 1000, 2),
+            'duration_ms': round((self.duration or 0) * 1000, 2),
+            'breakdown_ms': {k: round(v * 1000, 2) for k, v in self.breakdown().items()},
+            'spans': [{'name': name, 'ms': round(seconds * 1000, 2)} for name, seconds in self.spans],
+        }
+
+
+def current_trace() -> Optional[EventTrace]:
+    return _current_trace.get()
+
+
+def record_span(name: str, seconds: float):
+    """Record an already measured span on the current trace, if any"""
+    if (trace := _current_trace.get()) is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as a span of the current trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+def traced(name: str):
+    """Decorator recording each call of an async function as a span"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,134 @@
+"""
+Indexed QueryByExample selection over a wallet's W3C credentials.
+
+Credentials are indexed once by type, @context, issuer id and proof
+cryptosuite; each credentialQuery is then a few set intersections instead of
+a scan of the wallet. Stored credentials are never modified: a selected
+credential is returned as a copy carrying only its accepted proof.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Set
+import copy
+import json
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _context_key(context) -> str:
+    """Contexts can be URLs or inline objects, the latter are keyed by their JSON"""
+    return context if isinstance(context, str) else json.dumps(context, sort_keys=True)
+
+
+def _issuer_id(issuer) -> Optional[str]:
+    return issuer.get('id') if isinstance(issuer, dict) else issuer
+
+
+def proof_suite(proof: dict) -> Optional[str]:
+    """Cryptosuite of a DataIntegrityProof, the proof type for older suites (e.g. Ed25519Signature2020)"""
+    if proof.get('type') == 'DataIntegrityProof':
+        return proof.get('cryptosuite')
+    return proof.get('type')
+
+
+def accepted_suites(accepted_cryptosuites) -> Optional[Set[str]]:
+    """acceptedCryptosuites entries are names or {"cryptosuite": name} objects; None accepts any"""
+    if not accepted_cryptosuites:
+        return None
+    return {
+        suite.get('cryptosuite') if isinstance(suite, dict) else suite
+        for suite in _as_list(accepted_cryptosuites)
+    }
+
+
+class CredentialQueryIndex:
+    """
+    Inverted indexes over a list of credentials for QueryByExample.
+
+    Args:
+        credentials: Stored credentials, read but never modified
+    """
+
+    def __init__(self, credentials: Iterable[dict]):
+        self.credentials: List[dict] = list(credentials or [])
+        self.by_type: Dict[str, Set[int]] = {}
+        self.by_context: Dict[str, Set[int]] = {}
+        self.by_issuer: Dict[str, Set[int]] = {}
+        self.by_suite: Dict[str, Set[int]] = {}
+
+        for position, credential in enumerate(self.credentials):
+            for credential_type in _as_list(credential.get('type')):
+                self.by_type.setdefault(credential_type, set()).add(position)
+            for context in _as_list(credential.get('@context')):
+                self.by_context.setdefault(_context_key(context), set()).add(position)
+            if issuer_id := _issuer_id(credential.get('issuer')):
+                self.by_issuer.setdefault(issuer_id, set()).add(position)
+            for proof in _as_list(credential.get('proof')):
+                if isinstance(proof, dict) and (suite := proof_suite(proof)):
+                    self.by_suite.setdefault(suite, set()).add(position)
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def candidates(self, example: dict, suites: Optional[Set[str]] = None,
+                   issuers: Optional[Iterable[str]] = None) -> List[int]:
+        """
+        Positions of credentials matching an example, in storage order.
+
+        Args:
+            example: QueryByExample example ({type, @context, issuer})
+            suites: Accepted cryptosuites (None accepts any)
+            issuers: Trusted issuer ids (None trusts any)
+        """
+        constraints = [self.by_type.get(t, set()) for t in _as_list(example.get('type'))]
+        constraints += [self.by_context.get(_context_key(c), set()) for c in _as_list(example.get('@context'))]
+        if issuer_id := _issuer_id(example.get('issuer')):
+            constraints.append(self.by_issuer.get(issuer_id, set()))
+        if issuers is not None:
+            constraints.append(set().union(*(self.by_issuer.get(issuer, set()) for issuer in issuers)))
+        if suites is not None:
+            constraints.append(set().union(*(self.by_suite.get(suite, set()) for suite in suites)))
+
+        if not constraints:
+            return list(range(len(self.credentials)))
+        constraints.sort(key=len)
+        return sorted(constraints[0].intersection(*constraints[1:]))
+
+    def select(self, credential_query: dict) -> Optional[dict]:
+        """
+        First credential answering a credentialQuery, as a copy holding its first accepted proof.
+
+        Returns:
+            The credential to present, or None when nothing matches
+        """
+        suites = accepted_suites(credential_query.get('acceptedCryptosuites'))
+        trusted = [
+            _issuer_id(trusted.get('issuer')) if isinstance(trusted, dict) else trusted
+            for trusted in _as_list(credential_query.get('trustedIssuer'))
+        ]
+        for position in self.candidates(credential_query.get('example') or {}, suites, trusted or None):
+            credential = self.credentials[position]
+            proofs = [
+                proof for proof in _as_list(credential.get('proof'))
+                if isinstance(proof, dict) and (suites is None or proof_suite(proof) in suites)
+            ]
+            if not proofs:
+                continue
+            selected = copy.deepcopy({key: value for key, value in credential.items() if key != 'proof'})
+            selected['proof'] = copy.deepcopy(proofs[0])
+            return selected
+        return None
+
+    def answer(self, credential_queries) -> List[Dict[str, Any]]:
+        """
+        Answer every credentialQuery of a QueryByExample against the same indexes.
+
+        Returns:
+            One {"query", "credential"} per query, credential None when unmatched
+        """
+        return [
+            {'query': credential_query, 'credential': self.select(credential_query)}
+            for credential_query in _as_list(credential_queries)
+        ]
@@ -0,0 +1,254 @@
+"""
+Local verification of Ed25519 credential proofs.
+
+Supported proofs: Ed25519Signature2020 and DataIntegrityProof with the
+eddsa-jcs-2022 or eddsa-rdfc-2022 cryptosuites. Signatures are checked with
+Askar; issuer keys come from app.utils.did_resolver. A credential proof must
+use an assertionMethod of the issuer's DID, a presentation proof an
+authentication method of the holder's.
+
+RDF canonicalization (Ed25519Signature2020, eddsa-rdfc-2022) uses the
+optional pyld package. The common JSON-LD contexts ship with the wallet
+(app/utils/contexts), others are fetched and kept in a small LRU cache.
+Proofs that cannot be checked locally (no pyld, unresolvable DID, context
+fetch failure) are reported as unchecked, neither verified nor failed.
+
+Batches are verified on a small thread pool (VC_VERIFY_WORKERS).
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import copy
+import hashlib
+import json
+import logging
+import threading
+
+from config import Config
+from .did_resolver import ResolutionError, UnauthorizedMethod, multibase_decode, resolve_verification_method
+from .vc_query import proof_suite
+
+logger = logging.getLogger(__name__)
+
+JCS_SUITES = {'eddsa-jcs-2022'}
+RDFC_SUITES = {'Ed25519Signature2020', 'eddsa-rdfc-2022'}
+SUPPORTED_SUITES = JCS_SUITES | RDFC_SUITES
+
+CONTEXTS_DIR = Path(__file__).parent / 'contexts'
+BUNDLED_CONTEXTS = {
+    'https://www.w3.org/2018/credentials/v1': 'credentials-v1.jsonld',
+    'https://www.w3.org/ns/credentials/v2': 'credentials-v2.jsonld',
+    'https://w3id.org/security/suites/ed25519-2020/v1': 'ed25519-2020-v1.jsonld',
+}
+CONTEXT_CACHE_SIZE = 64
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class UnsupportedProof(Exception):
+    """The proof cannot be verified locally"""
+
+
+class InvalidProof(Exception):
+    """The proof was checked and does not hold (signer or purpose)"""
+
+
+def canonicalize_jcs(document: dict) -> bytes:
+    """JSON Canonicalization Scheme (sorted keys, no whitespace, UTF-8)"""
+    return json.dumps(document, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+@lru_cache(maxsize=1)
+def _document_loader():
+    """pyld document loader serving bundled contexts, other contexts from a bounded LRU cache"""
+    from pyld import jsonld
+
+    load = jsonld.requests_document_loader(timeout=5)
+    documents = OrderedDict()
+    lock = threading.Lock()
+
+    def loader(url, options=None):
+        if url in BUNDLED_CONTEXTS:
+            return copy.deepcopy(_bundled_context(url))
+        with lock:
+            cached = documents.get(url)
+            if cached is not None:
+                documents.move_to_end(url)
+        if cached is None:
+            cached = load(url, options or {})
+            with lock:
+                documents[url] = cached
+                while len(documents) > CONTEXT_CACHE_SIZE:
+                    documents.popitem(last=False)
+        return copy.deepcopy(cached)
+
+    return loader
+
+
+@lru_cache(maxsize=None)
+def _bundled_context(url: str) -> dict:
+    with open(CONTEXTS_DIR / BUNDLED_CONTEXTS[url]) as f:
+        return {'contextUrl': None, 'documentUrl': url, 'document': json.load(f)}
+
+
+@lru_cache(maxsize=1)
+def rdfc_available() -> bool:
+    """Whether RDF canonicalization (pyld) is installed"""
+    try:
+        import pyld  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def canonicalize_rdfc(document: dict) -> bytes:
+    """RDF Dataset Canonicalization (URDNA2015) to N-Quads"""
+    try:
+        from pyld import jsonld
+    except ImportError:
+        raise UnsupportedProof("RDF canonicalization needs the pyld package")
+    try:
+        return jsonld.normalize(document, {
+            'algorithm': 'URDNA2015',
+            'format': 'application/n-quads',
+            'documentLoader': _document_loader(),
+        }).encode()
+    except jsonld.JsonLdError as e:
+        # Typically a context that could not be fetched
+        raise UnsupportedProof(f"RDF canonicalization failed: {e}")
+
+
+def proof_hash_data(document: dict, proof: dict) -> bytes:
+    """
+    Data an Ed25519 proof signs: hash of the proof configuration followed by
+    the hash of the document without its proof, both canonicalized per suite.
+    """
+    suite = proof_suite(proof)
+    if suite not in SUPPORTED_SUITES:
+        raise UnsupportedProof(f"Unsupported proof suite: {suite}")
+
+    unsecured = {key: value for key, value in document.items() if key != 'proof'}
+    proof_config = {key: value for key, value in proof.items() if key != 'proofValue'}
+    if '@context' in unsecured:
+        proof_config['@context'] = unsecured['@context']
+
+    canonicalize = canonicalize_jcs if suite in JCS_SUITES else canonicalize_rdfc
+    return hashlib.sha256(canonicalize(proof_config)).digest() + hashlib.sha256(canonicalize(unsecured)).digest()
+
+
+def verify_proof(document: dict, proof: dict, controller: Optional[str], purpose: str) -> bool:
+    """
+    Verify one proof of a secured document.
+
+    Args:
+        controller: DID the proof has to be made by (issuer or holder)
+        purpose: Required proofPurpose, also the DID document relationship of the method
+
+    Raises:
+        InvalidProof: Wrong proofPurpose or a method not authorized by `controller`
+        UnsupportedProof: Unknown suite or missing canonicalization support
+        ResolutionError: The verification method could not be resolved
+    """
+    if (suite := proof_suite(proof)) not in SUPPORTED_SUITES:
+        raise UnsupportedProof(f"Unsupported proof suite: {suite}")
+    if proof.get('proofPurpose') != purpose:
+        raise InvalidProof(f"proofPurpose is {proof.get('proofPurpose')!r}, expected {purpose!r}")
+    verification_method = proof.get('verificationMethod') or ''
+    if not controller or verification_method.partition('#')[0] != controller:
+        raise InvalidProof(f"{verification_method or 'Missing verificationMethod'} does not belong to {controller}")
+
+    hash_data = proof_hash_data(document, proof)
+    try:
+        public_key = resolve_verification_method(verification_method, purpose)
+    except UnauthorizedMethod as e:
+        raise InvalidProof(str(e))
+    signature = multibase_decode(proof.get('proofValue') or '')
+
+    from aries_askar import Key, KeyAlg
+    return Key.from_public_bytes(KeyAlg.ED25519, public_key).verify_signature(hash_data, signature)
+
+
+def _controller(value) -> Optional[str]:
+    """DID of an issuer / holder given as a string or an object with an id"""
+    return value.get('id') if isinstance(value, dict) else value
+
+
+def _verify_document(document: dict, controller: Optional[str], purpose: str) -> Dict[str, Any]:
+    proofs = document.get('proof')
+    proofs = proofs if isinstance(proofs, list) else [proofs] if proofs else []
+
+    results = []
+    for proof in proofs:
+        result = {'suite': proof_suite(proof) if isinstance(proof, dict) else None, 'verified': None, 'error': None}
+        try:
+            result['verified'] = bool(verify_proof(document, proof, controller, purpose))
+            if not result['verified']:
+                result['error'] = 'Invalid signature'
+        except InvalidProof as e:
+            result.update(verified=False, error=str(e))
+        except (UnsupportedProof, ResolutionError, ValueError, TypeError, AttributeError) as e:
+            # Not checked: the signature was never evaluated
+            result['error'] = str(e)
+        except Exception as e:
+            logger.warning(f"Proof verification error: {e}")
+            result['error'] = str(e)
+        results.append(result)
+
+    failed = next((result for result in results if result['verified'] is False), None)
+    verified = failed is None and any(result['verified'] for result in results)
+    error = None
+    if failed:
+        error = f"{failed['suite']} proof failed: {failed['error']}"
+    elif not verified:
+        error = next((result['error'] for result in results), None) or 'Document has no proof'
+    return {'verified': verified, 'failed': failed is not None, 'proofs': results, 'error': error}
+
+
+def verify_credential(credential: dict) -> Dict[str, Any]:
+    """
+    Verify every proof of a credential against its issuer (assertionMethod).
+
+    A credential is verified when at least one proof verifies and none fails,
+    and failed when any proof was checked and does not hold: a signature that
+    does not match, a method outside the issuer's assertionMethods or another
+    proofPurpose. Proofs that cannot be checked locally (unsupported suite,
+    unresolvable DID, context fetch failure) count as neither, so a
+    credential holding only those is neither verified nor failed.
+
+    Returns:
+        {'verified', 'failed', 'proofs': [{'suite', 'verified' (True/False/None), 'error'}], 'error'}
+    """
+    return _verify_document(credential, _controller(credential.get('issuer')), 'assertionMethod')
+
+
+def verify_presentation(presentation: dict) -> Dict[str, Any]:
+    """Verify every proof of a presentation against its holder (authentication), see verify_credential"""
+    return _verify_document(presentation, _controller(presentation.get('holder')), 'authentication')
+
+
+def verified_only(credential: dict, verification: Dict[str, Any]) -> dict:
+    """Copy of a credential keeping only the proofs that verified"""
+    proofs = credential.get('proof')
+    proofs = proofs if isinstance(proofs, list) else [proofs]
+    kept = [proof for proof, result in zip(proofs, verification['proofs']) if result['verified']]
+    return {**credential, 'proof': kept[0] if len(kept) == 1 else kept}
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.VC_VERIFY_WORKERS), thread_name_prefix='vc-verify'
+            )
+        return _executor
+
+
+def verify_credentials(credentials: List[dict]) -> List[Dict[str, Any]]:
+    """Verify a batch of credentials on the verification thread pool, results in input order"""
+    if len(credentials) <= 1:
+        return [verify_credential(credential) for credential in credentials]
+    return list(_pool().map(verify_credential, credentials))
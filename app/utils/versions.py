@@ -0,0 +1,151 @@
+"""
+Per-wallet, per-category data versions for conditional GETs.
+
+Every AskarStorage write bumps the version of the (profile, category) it
+touched. List and detail endpoints derive a strong ETag from the versions of
+the categories they read, so If-None-Match can be answered with a 304 before
+Askar is opened.
+"""
+from functools import wraps
+from typing import Iterable, Optional
+import logging
+import secrets
+import threading
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class DataVersions:
+    """
+    In-process version counters.
+
+    Counters restart at zero with the process, so ETags carry a boot nonce:
+    a version number seen before a restart can never validate afterwards.
+    Only correct with a single process, use RedisDataVersions otherwise.
+    """
+
+    def __init__(self):
+        self._nonce = secrets.token_hex(4)
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def nonce(self) -> str:
+        return self._nonce
+
+    def bump(self, wallet_id: str, category: str) -> int:
+        with self.lock:
+            version = self.versions.get((wallet_id, category), 0) + 1
+            self.versions[(wallet_id, category)] = version
+            return version
+
+    def get(self, wallet_id: str, categories: Iterable[str]) -> list:
+        with self.lock:
+            return [self.versions.get((wallet_id, category), 0) for category in categories]
+
+    def etag(self, wallet_id: str, categories: Iterable[str]) -> Optional[str]:
+        """Strong ETag value (unquoted) for the given categories, None if unavailable"""
+        try:
+            versions = self.get(wallet_id, list(categories))
+            nonce = self.nonce()
+        except Exception as e:
+            logger.warning(f"Data versions unavailable: {e}")
+            return None
+        return f"{nonce}-" + ".".join(str(version) for version in versions)
+
+
+class RedisDataVersions(DataVersions):
+    """
+    Version counters shared by every process through Redis INCR.
+
+    Counters outlive process restarts; the nonce is stored in Redis once so
+    that flushing Redis (and restarting the counters) still invalidates ETags.
+    """
+
+    PREFIX = "pydentity:versions:"
+    NONCE_KEY = "pydentity:versions-nonce"
+
+    def __init__(self, redis_client):
+        super().__init__()
+        self.redis = redis_client
+        self._nonce = None
+
+    def key(self, wallet_id: str, category: str) -> str:
+        return f"{self.PREFIX}{wallet_id}:{category}"
+
+    def nonce(self) -> str:
+        if self._nonce is None:
+            self.redis.set(self.NONCE_KEY, secrets.token_hex(4), nx=True)
+            nonce = self.redis.get(self.NONCE_KEY)
+            self._nonce = nonce.decode() if isinstance(nonce, bytes) else nonce
+        return self._nonce
+
+    def bump(self, wallet_id: str, category: str) -> int:
+        try:
+            return self.redis.incr(self.key(wallet_id, category))
+        except Exception as e:
+            # A missed bump could let a stale ETag validate, drop the nonce so
+            # every ETag handed out so far stops matching
+            logger.warning(f"Failed to bump data version {wallet_id}/{category}: {e}")
+            try:
+                self.redis.delete(self.NONCE_KEY)
+            except Exception:
+                pass
+            self._nonce = None
+            return 0
+
+    def get(self, wallet_id: str, categories: Iterable[str]) -> list:
+        values = self.redis.mget([self.key(wallet_id, category) for category in categories])
+        return [int(value) if value else 0 for value in values]
+
+
+def create_data_versions() -> DataVersions:
+    """Build the version store selected by Config.DATA_VERSION_BACKEND"""
+    if Config.DATA_VERSION_BACKEND == "redis":
+        if redis_client := getattr(Config, "SESSION_REDIS", None):
+            return RedisDataVersions(redis_client)
+        logger.warning("DATA_VERSION_BACKEND is redis but REDIS_URL is not set, using in-memory versions")
+    return DataVersions()
+
+
+data_versions = create_data_versions()
+
+
+def etag_for(*categories: str):
+    """
+    Answer GETs of a wallet view conditionally with a strong ETag.
+
+    The versions are read before the view runs, so a write that lands while
+    the view is reading can only make the ETag older than the body (the next
+    request gets a 200), never newer.
+
+    Example:
+        @bp.route("/offers")
+        @etag_for(AskarStorageKeys.CRED_OFFERS)
+        def get_credential_offers(): ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import make_response, request, session
+
+            wallet_id = session.get("wallet_id")
+            etag = data_versions.etag(wallet_id, categories) if wallet_id else None
+            if etag is None:
+                return view(*args, **kwargs)
+
+            if etag in request.if_none_match:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            # Private data: browsers may keep it but have to revalidate first
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.headers["Vary"] = "Cookie"
+            return response
+        return wrapper
+    return decorator
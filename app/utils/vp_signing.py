@@ -0,0 +1,87 @@
+"""
+In-process presentation signing with a holder key kept in the wallet's Askar profile.
+
+With VP_SIGNING=local, VC-API presentations are signed here instead of
+through the agent's /vc/presentations/prove, saving the token and prove round
+trips on the interactive path. The holder is a did:key derived from an
+Ed25519 key generated when the wallet is provisioned, and is the wallet's
+holder_id; the secret stays in Askar.
+
+Presentations are signed with Ed25519Signature2020 when pyld is installed,
+eddsa-jcs-2022 otherwise.
+"""
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from .did_resolver import b58encode, ed25519_multikey
+from .vc_verify import proof_hash_data, rdfc_available
+
+HOLDER_KEY = "holder/ed25519"
+ED25519_2020_CONTEXT = "https://w3id.org/security/suites/ed25519-2020/v1"
+
+
+def default_suite() -> str:
+    """Proof suite for local signing, the RDF one only when it can be canonicalized"""
+    return "Ed25519Signature2020" if rdfc_available() else "eddsa-jcs-2022"
+
+
+def holder_did(key) -> Tuple[str, str]:
+    """(did:key, verification method id) of an Ed25519 key"""
+    multikey = ed25519_multikey(key.get_public_bytes())
+    return f"did:key:{multikey}", f"did:key:{multikey}#{multikey}"
+
+
+async def local_holder(askar, create: bool = True):
+    """
+    The wallet's local holder key and did:key, created on first use unless create is False.
+
+    Returns:
+        (Key, did, verification method id), None when there is no key and create is False
+    """
+    from aries_askar import Key, KeyAlg
+
+    key = await askar.fetch_key(HOLDER_KEY)
+    if key is None and not create:
+        return None
+    if key is None:
+        key = Key.generate(KeyAlg.ED25519)
+        if not await askar.store_key(HOLDER_KEY, key):
+            # Created concurrently by another request
+            key = await askar.fetch_key(HOLDER_KEY)
+    return (key, *holder_did(key))
+
+
+def sign_document(document: dict, key, verification_method: str, suite: Optional[str] = None,
+                  proof_purpose: str = "authentication", challenge: Optional[str] = None,
+                  domain: Optional[str] = None) -> dict:
+    """
+    Add an Ed25519 proof to a document (presentation or credential).
+
+    Args:
+        suite: "Ed25519Signature2020", "eddsa-rdfc-2022" or "eddsa-jcs-2022" (default_suite() if None)
+
+    Raises:
+        UnsupportedProof: An RDF suite was requested without pyld installed
+    """
+    suite = suite or default_suite()
+    if suite == "Ed25519Signature2020":
+        proof = {"type": suite}
+        contexts = document.get("@context", [])
+        if ED25519_2020_CONTEXT not in contexts:
+            document = {**document, "@context": [*contexts, ED25519_2020_CONTEXT]}
+    else:
+        proof = {"type": "DataIntegrityProof", "cryptosuite": suite}
+
+    proof.update({
+        "created": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+        "verificationMethod": verification_method,
+        "proofPurpose": proof_purpose,
+    })
+    if challenge:
+        proof["challenge"] = challenge
+    if domain:
+        proof["domain"] = domain
+
+    signature = key.sign_message(proof_hash_data(document, proof))
+    proof["proofValue"] = "z" + b58encode(signature)
+    return {**document, "proof": proof}
@@ -0,0 +1,142 @@
+"""
+Presentation signing benchmark: local Askar holder key vs the agent round trip.
+
+Signs the same VC-API presentation in-process (VP_SIGNING=local) and through
+the agent (token request + /vc/presentations/prove, VP_SIGNING=agent), then
+reports latency percentiles for each.
+
+    # Local signing only, with a throwaway sqlite Askar store
+    python -m benchmarks.vp_signing --iterations 200 --credentials 3
+
+    # Compare with a running ACA-Py (or the stand-in agent of webhook_replay)
+    python -m benchmarks.vp_signing --agent-url http://localhost:8031 \\
+        --wallet-id <wallet_id> --wallet-key <wallet_key>
+
+Local signing uses eddsa-jcs-2022 unless --suite is given; the RDF suites
+(Ed25519Signature2020, eddsa-rdfc-2022) need pyld and include JSON-LD
+canonicalization in the measured time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import requests
+
+from benchmarks.webhook_replay import percentile
+
+V2_CONTEXT = "https://www.w3.org/ns/credentials/v2"
+
+
+def sample_presentation(credentials):
+    return {
+        "@context": [V2_CONTEXT],
+        "type": ["VerifiablePresentation"],
+        "verifiableCredential": [
+            {
+                "@context": [V2_CONTEXT],
+                "type": ["VerifiableCredential"],
+                "issuer": "did:web:bench.example",
+                "validFrom": "2025-01-01T00:00:00Z",
+                "credentialSubject": {"id": f"urn:uuid:{uuid.uuid4()}", "name": "Alice", "age": 34},
+            }
+            for _ in range(credentials)
+        ],
+    }
+
+
+def summarize(durations):
+    return {
+        "count": len(durations),
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 95) * 1000, 3),
+        "p99_ms": round(percentile(durations, 99) * 1000, 3),
+        "mean_ms": round(sum(durations) / len(durations) * 1000, 3) if durations else 0.0,
+    }
+
+
+async def bench_local(args, presentation):
+    from app.plugins import AskarStorage
+    from app.utils.vp_signing import local_holder, sign_document
+
+    await AskarStorage().provision(recreate=True)
+    askar = AskarStorage.for_wallet(f"bench-{uuid.uuid4().hex[:8]}")
+    await askar.create_profile()
+    await local_holder(askar)  # Key creation is a one-off, not part of the interactive path
+
+    durations = []
+    for _ in range(args.iterations):
+        t0 = time.perf_counter()
+        key, holder, verification_method = await local_holder(askar)
+        sign_document(
+            {**presentation, "holder": holder},
+            key,
+            verification_method,
+            suite=args.suite,
+            challenge=uuid.uuid4().hex,
+            domain="verifier.bench.example",
+        )
+        durations.append(time.perf_counter() - t0)
+    return summarize(durations)
+
+
+def bench_agent(args, presentation):
+    session = requests.Session()
+    admin_headers = {"X-API-KEY": os.getenv("AGENT_ADMIN_API_KEY", "")}
+    options = {
+        "proofType": "Ed25519Signature2020",
+        "proofPurpose": "authentication",
+        "domain": "verifier.bench.example",
+    }
+    if args.verification_method:
+        options["verificationMethod"] = args.verification_method
+
+    durations = []
+    for _ in range(args.iterations):
+        t0 = time.perf_counter()
+        # Same two calls as present_credential: a fresh token, then prove
+        token = session.post(
+            f"{args.agent_url}/multitenancy/wallet/{args.wallet_id}/token",
+            json={"wallet_key": args.wallet_key},
+            headers=admin_headers,
+        ).json().get("token")
+        r = session.post(
+            f"{args.agent_url}/vc/presentations/prove",
+            json={"presentation": presentation, "options": options | {"challenge": uuid.uuid4().hex}},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        r.raise_for_status()
+        durations.append(time.perf_counter() - t0)
+    return summarize(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=100, help="presentations signed per mode")
+    parser.add_argument("--credentials", type=int, default=1, help="credentials in the presentation")
+    parser.add_argument("--suite", default="eddsa-jcs-2022", help="local proof suite")
+    parser.add_argument("--agent-url", help="agent admin endpoint to compare against")
+    parser.add_argument("--wallet-id", help="agent subwallet used for the prove calls")
+    parser.add_argument("--wallet-key", help="key of that subwallet")
+    parser.add_argument("--verification-method", help="holder verification method known to the agent")
+    args = parser.parse_args()
+
+    os.environ.setdefault("ASKAR_DB", f"sqlite://{tempfile.mkdtemp()}/bench.db")
+    presentation = sample_presentation(args.credentials)
+
+    report = {
+        "iterations": args.iterations,
+        "credentials": args.credentials,
+        "local": {"suite": args.suite, **asyncio.run(bench_local(args, presentation))},
+        "agent": bench_agent(args, presentation) if args.agent_url else None,
+    }
+    if report["agent"] and report["local"]["mean_ms"]:
+        report["speedup"] = round(report["agent"]["mean_ms"] / report["local"]["mean_ms"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Webhook replay load generator and throughput benchmark.
+
+Synthesizes realistic ACA-Py webhook sequences across many wallets and fires
+them at the webhook blueprint, then reports events/sec, per-topic latency
+percentiles and Askar storage operation counts.
+
+    # In-process, through the Flask test client with a stand-in agent
+    python -m benchmarks.webhook_replay --wallets 50 --rounds 4
+
+    # Deliver through the batch endpoint, 100 events per request
+    python -m benchmarks.webhook_replay --wallets 50 --batch 100
+
+    # Serve the stand-in agent over HTTP (point AGENT_ADMIN_ENDPOINT at it)
+    python -m benchmarks.webhook_replay --serve-agent 8031
+
+    # Fire at a running wallet sharing the same ASKAR_DB
+    python -m benchmarks.webhook_replay --url http://localhost:5000 --askar-db sqlite://app.db
+
+In-process runs use a throwaway sqlite Askar store unless --askar-db is given.
+Storage operation counts are only available in-process.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+API_KEY = os.environ.setdefault("AGENT_ADMIN_API_KEY", "benchmark")
+# Measure raw throughput, not admission control
+os.environ.setdefault("WEBHOOK_RATE_PER_WALLET", "0")
+os.environ.setdefault("WEBHOOK_MAX_CONCURRENCY", "0")
+
+SCHEMA_ID = "did:web:bench.example#schema/BenchCredential/1.0"
+CRED_DEF_ID = "did:web:bench.example/resources/cred-def/bench"
+ATTRIBUTES = {"name": "Alice", "age": "34", "email": "alice@bench.example"}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Stand-in agent responses, shared by the in-process controller and the HTTP server
+def connection_record(connection_id):
+    return {
+        "connection_id": connection_id,
+        "state": "active",
+        "their_label": "Bench Issuer",
+        "their_did": "did:peer:bench-issuer",
+    }
+
+
+def schema_record(schema_id):
+    return {"schema_id": schema_id, "schema": {"name": "Bench Credential", "version": "1.0"}}
+
+
+def cred_def_record(cred_def_id):
+    return {"credential_definition_id": cred_def_id, "credential_definition": {"tag": "bench"}}
+
+
+def cred_ex_record(cred_ex_id, state="offer-received"):
+    return {
+        "cred_ex_record": {
+            "cred_ex_id": cred_ex_id,
+            "state": state,
+            "cred_offer": {
+                "comment": "Benchmark offer",
+                "credential_preview": {
+                    "attributes": [{"name": k, "value": v} for k, v in ATTRIBUTES.items()]
+                },
+            },
+        },
+        "by_format": {"cred_offer": {"anoncreds": {"schema_id": SCHEMA_ID, "cred_def_id": CRED_DEF_ID}}},
+    }
+
+
+def pres_request():
+    return {
+        "name": "Bench Proof",
+        "requested_attributes": {"attr_1": {"names": ["name", "email"]}},
+        "requested_predicates": {"pred_1": {"name": "age", "p_type": ">=", "p_value": 18}},
+    }
+
+
+def pres_ex_record(pres_ex_id):
+    return {
+        "pres_ex_id": pres_ex_id,
+        "state": "request-received",
+        "by_format": {"pres_request": {"anoncreds": pres_request()}},
+    }
+
+
+# Webhook payload sequences
+def connection_events(connection_id):
+    base = {"connection_id": connection_id, "their_label": "Bench Issuer",
+            "their_did": "did:peer:bench-issuer", "created_at": _now(), "updated_at": _now()}
+    return [
+        ("connections", base | {"state": "invitation"}),
+        ("connections", base | {"state": "active"}),
+    ]
+
+
+def issuance_events(connection_id):
+    cred_ex_id = str(uuid.uuid4())
+    base = {
+        "cred_ex_id": cred_ex_id,
+        "connection_id": connection_id,
+        "created_at": _now(),
+        "by_format": cred_ex_record(cred_ex_id)["by_format"],
+    }
+    return [
+        ("issue_credential_v2_0", base | {"state": "offer-received"}),
+        ("issue_credential_v2_0", base | {"state": "request-sent"}),
+        ("issue_credential_v2_0", base | {"state": "done"}),
+    ]
+
+
+def presentation_events(connection_id):
+    pres_ex_id = str(uuid.uuid4())
+    return [
+        ("present_proof_v2_0", {
+            "pres_ex_id": pres_ex_id,
+            "connection_id": connection_id,
+            "created_at": _now(),
+            "state": "request-received",
+            "by_format": {"pres_request": {"anoncreds": pres_request()}},
+        }),
+    ]
+
+
+def synthesize(wallet_ids, rounds):
+    """Build per-wallet sequences and interleave them round-robin across wallets"""
+    sequences = []
+    for wallet_id in wallet_ids:
+        connection_id = str(uuid.uuid4())
+        events = connection_events(connection_id)
+        for _ in range(rounds):
+            events += issuance_events(connection_id)
+            events += presentation_events(connection_id)
+        sequences.append([(wallet_id, topic, payload) for topic, payload in events])
+
+    interleaved = []
+    for position in range(max(len(seq) for seq in sequences)):
+        interleaved.extend(seq[position] for seq in sequences if position < len(seq))
+    return interleaved
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def install_stand_in_agent(latency_ms):
+    """Replace agent calls made by the webhook manager with canned responses"""
+    from app.plugins import AgentController
+    import app.routes.webhooks.manager as manager
+
+    delay = latency_ms / 1000
+
+    class StandInAgent(AgentController):
+        def _reply(self, value):
+            if delay:
+                time.sleep(delay)
+            return value
+
+        def get_connection_info(self, connection_id):
+            return self._reply(connection_record(connection_id))
+
+        def get_schema_info(self, schema_id):
+            return self._reply(schema_record(schema_id))
+
+        def get_cred_def_info(self, cred_def_id):
+            return self._reply(cred_def_record(cred_def_id))
+
+        def get_credential_exchange_info(self, exchange_id):
+            return self._reply(cred_ex_record(exchange_id))
+
+        def get_presentation_exchange_info(self, pres_ex_id):
+            return self._reply(pres_ex_record(pres_ex_id))
+
+        def get_matching_credentials_for_presentation(self, pres_ex_id):
+            return self._reply([])
+
+    manager.AgentController = StandInAgent
+
+
+def count_storage_ops():
+    """Wrap every public AskarStorage coroutine with a counter ("open" counts store opens)"""
+    from app.plugins import AskarStorage
+
+    ops = Counter()
+    for name, original in list(vars(AskarStorage).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(original):
+            continue
+
+        def wrapper(self, *args, _original=original, _name=name, **kwargs):
+            ops[_name] += 1
+            return _original(self, *args, **kwargs)
+
+        setattr(AskarStorage, name, wrapper)
+    return ops
+
+
+async def provision_wallets(wallet_ids):
+    from app.plugins import AskarStorage, AskarStorageKeys
+
+    for wallet_id in wallet_ids:
+        askar = AskarStorage.for_wallet(wallet_id)
+        await askar.create_profile()
+        wallet = {"wallet_id": wallet_id, "token": "benchmark", "wallet_key": "benchmark"}
+        await askar.store(AskarStorageKeys.WALLETS, "data", wallet, {})
+        for category in (AskarStorageKeys.MESSAGES, AskarStorageKeys.CONNECTIONS,
+                         AskarStorageKeys.CREDENTIALS, AskarStorageKeys.CRED_OFFERS,
+                         AskarStorageKeys.PRES_REQUESTS):
+            await askar.store(category, "data", [], {})
+
+
+def make_sender(args):
+    """Return a callable posting (path, headers, body) and returning the status code"""
+    headers = {"X-API-KEY": API_KEY}
+
+    if args.url:
+        import requests
+
+        http = requests.Session()
+
+        def send(path, extra_headers, body):
+            r = http.post(f"{args.url.rstrip('/')}/webhooks{path}", json=body,
+                          headers=headers | extra_headers, timeout=60)
+            return r.status_code
+        return send
+
+    from app import create_app
+
+    client = create_app().test_client()
+
+    def send(path, extra_headers, body):
+        return client.post(f"/webhooks{path}", json=body, headers=headers | extra_headers).status_code
+    return send
+
+
+def run(args):
+    wallet_ids = [f"bench-{i:05d}-{uuid.uuid4().hex[:8]}" for i in range(args.wallets)]
+    events = synthesize(wallet_ids, args.rounds)
+
+    ops = None
+    if not args.url:
+        install_stand_in_agent(args.agent_latency_ms)
+        ops = count_storage_ops()
+
+    from app.plugins import AskarStorage
+
+    asyncio.run(AskarStorage().provision(recreate=not args.askar_db))
+    asyncio.run(provision_wallets(wallet_ids))
+    if ops is not None:
+        ops.clear()
+
+    send = make_sender(args)
+    latencies = defaultdict(list)
+    statuses = Counter()
+
+    started = time.perf_counter()
+    if args.batch:
+        for offset in range(0, len(events), args.batch):
+            chunk = events[offset:offset + args.batch]
+            body = [{"topic": t, "wallet_id": w, "payload": p} for w, t, p in chunk]
+            t0 = time.perf_counter()
+            statuses[send("/batch", {}, body)] += len(chunk)
+            per_event = (time.perf_counter() - t0) / len(chunk)
+            for _, topic, payload in chunk:
+                latencies[f"{topic}:{payload.get('state')}"].append(per_event)
+    else:
+        for wallet_id, topic, payload in events:
+            t0 = time.perf_counter()
+            statuses[send(f"/topic/{topic}/", {"X-WALLET-ID": wallet_id}, payload)] += 1
+            latencies[f"{topic}:{payload.get('state')}"].append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "events": len(events),
+        "wallets": len(wallet_ids),
+        "seconds": round(elapsed, 3),
+        "events_per_second": round(len(events) / elapsed, 1) if elapsed else None,
+        "statuses": dict(statuses),
+        "latency_ms": {
+            key: {
+                "count": len(values),
+                "p50": round(percentile(values, 50) * 1000, 2),
+                "p95": round(percentile(values, 95) * 1000, 2),
+                "p99": round(percentile(values, 99) * 1000, 2),
+            }
+            for key, values in sorted(latencies.items())
+        },
+        "storage_ops": dict(ops) if ops is not None else None,
+    }
+    if ops is not None:
+        # Store opens happen inside the other operations, they are not counted twice
+        data_ops = sum(count for name, count in ops.items() if name != "open")
+        report["storage_ops_per_event"] = round(data_ops / len(events), 2)
+    return report
+
+
+def serve_agent(port, latency_ms):
+    """Serve the stand-in agent admin API over HTTP"""
+    from flask import Flask
+
+    agent = Flask("stand-in-agent")
+    delay = latency_ms / 1000
+
+    @agent.before_request
+    def simulate_latency():
+        if delay:
+            time.sleep(delay)
+
+    agent.get("/connections/<connection_id>")(connection_record)
+    agent.get("/schemas/<path:schema_id>")(schema_record)
+    agent.get("/credential-definitions/<path:cred_def_id>")(cred_def_record)
+    agent.get("/issue-credential-2.0/records/<cred_ex_id>")(cred_ex_record)
+    agent.get("/present-proof-2.0/records/<pres_ex_id>")(pres_ex_record)
+
+    @agent.get("/present-proof-2.0/records/<pres_ex_id>/credentials")
+    def matching_credentials(pres_ex_id):
+        return []
+
+    @agent.post("/multitenancy/wallet/<wallet_id>/token")
+    def token(wallet_id):
+        return {"token": "benchmark"}
+
+    @agent.get("/vc/credentials")
+    def credentials():
+        return {"results": []}
+
+    @agent.post("/vc/presentations/prove")
+    def prove():
+        # Round trip only, no signature (see benchmarks.vp_signing)
+        from flask import request
+
+        return {"verifiablePresentation": request.get_json()["presentation"] | {"proof": {}}}
+
+    agent.run(host="0.0.0.0", port=port, threaded=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--wallets", type=int, default=20, help="number of wallets to simulate")
+    parser.add_argument("--rounds", type=int, default=3, help="issuance + proof rounds per wallet")
+    parser.add_argument("--batch", type=int, default=0, help="deliver through /webhooks/batch in chunks of N")
+    parser.add_argument("--agent-latency-ms", type=float, default=0, help="simulated agent round trip")
+    parser.add_argument("--url", help="fire at a running wallet instead of the in-process test client")
+    parser.add_argument("--askar-db", help="Askar store URI (defaults to a throwaway sqlite store)")
+    parser.add_argument("--serve-agent", type=int, metavar="PORT", help="only serve the stand-in agent")
+    args = parser.parse_args()
+
+    if args.serve_agent:
+        serve_agent(args.serve_agent, args.agent_latency_ms)
+        return
+
+    os.environ["ASKAR_DB"] = args.askar_db or f"sqlite://{tempfile.mkdtemp()}/bench.db"
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
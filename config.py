@@ -42,17 +42,74 @@ class Config(object):
         SESSION_REDIS = redis.from_url(os.getenv("REDIS_URL"))
         REGISTRATION_CHALLENGES = SESSION_REDIS
         AUTHENTICATION_CHALLENGES = SESSION_REDIS
+        # Share real-time notifications between processes through redis pub/sub
+        NOTIFICATION_BACKEND = os.getenv("NOTIFICATION_BACKEND", "redis")
+        # Data versions behind ETags must be shared by every process
+        DATA_VERSION_BACKEND = os.getenv("DATA_VERSION_BACKEND", "redis")
     else:
         Path("session").mkdir(parents=True, exist_ok=True)
         SESSION_TYPE = "cachelib"
         SESSION_SERIALIZATION_FORMAT = "json"
-        SESSION_CACHELIB = FileSystemCache(threshold=500, cache_dir="session")
-        REGISTRATION_CHALLENGES = SESSION_CACHELIB
-        AUTHENTICATION_CHALLENGES = SESSION_CACHELIB
+        # Sessions and WebAuthn challenges go to SQLite (WAL) caches created in
+        # create_app, "filesystem" keeps the one-file-per-entry cachelib cache
+        SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+        SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "session/session.db")
+        if SESSION_BACKEND == "filesystem":
+            SESSION_CACHELIB = FileSystemCache(threshold=500, cache_dir="session")
+            REGISTRATION_CHALLENGES = SESSION_CACHELIB
+            AUTHENTICATION_CHALLENGES = SESSION_CACHELIB
+        NOTIFICATION_BACKEND = os.getenv("NOTIFICATION_BACKEND", "memory")
+        DATA_VERSION_BACKEND = os.getenv("DATA_VERSION_BACKEND", "memory")
+
+    # Recent notification events kept per wallet for Last-Event-ID replay
+    NOTIFICATION_REPLAY_SIZE = int(os.getenv("NOTIFICATION_REPLAY_SIZE", "50"))
 
     AGENT_ADMIN_API_KEY = os.getenv("AGENT_ADMIN_API_KEY")
     AGENT_ADMIN_ENDPOINT = os.getenv("AGENT_ADMIN_ENDPOINT")
 
+    # Webhook events slower than this are logged with their full span breakdown
+    WEBHOOK_SLOW_EVENT_MS = int(os.getenv("WEBHOOK_SLOW_EVENT_MS", "1000"))
+
+    # Webhook admission control (0 disables a limit)
+    WEBHOOK_RATE_PER_WALLET = float(os.getenv("WEBHOOK_RATE_PER_WALLET", "20"))  # events/sec
+    WEBHOOK_BURST_PER_WALLET = float(os.getenv("WEBHOOK_BURST_PER_WALLET", "50"))
+    WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "32"))
+    WEBHOOK_RETRY_AFTER = int(os.getenv("WEBHOOK_RETRY_AFTER", "1"))  # seconds, when overloaded
+
+    # Background wallet sync (0 disables it)
+    SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "300"))  # seconds between syncs of an active wallet
+    SYNC_JITTER = float(os.getenv("SYNC_JITTER", "0.2"))  # +/- fraction of the interval
+    SYNC_MAX_WORKERS = int(os.getenv("SYNC_MAX_WORKERS", "4"))
+    SYNC_ACTIVE_WINDOW = float(os.getenv("SYNC_ACTIVE_WINDOW", "3600"))  # seconds a wallet counts as active
+    SYNC_FULL_EVERY = int(os.getenv("SYNC_FULL_EVERY", "12"))  # every Nth sync also catches deletions
+
+    # Wallets whose decoded credential/connection lists are kept for paging, per process
+    LIST_CACHE_SIZE = int(os.getenv("LIST_CACHE_SIZE", "64"))
+
+    # Threads running Flask requests under the ASGI entry point (asgi:app)
+    WSGI_THREADS = int(os.getenv("WSGI_THREADS", "32"))
+
+    # Outbound fetches of scanned QR codes and VC-API exchanges
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))  # seconds
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    SCAN_CACHE_TTL = float(os.getenv("SCAN_CACHE_TTL", "60"))  # seconds interaction URLs are reused
+    SCAN_CACHE_SIZE = int(os.getenv("SCAN_CACHE_SIZE", "256"))
+
+    # Concurrent agent stores when ingesting the credentials of a VC-API presentation
+    VCAPI_STORE_CONCURRENCY = int(os.getenv("VCAPI_STORE_CONCURRENCY", "8"))
+
+    # Local proof verification of ingested credentials ("enforce" rejects failed proofs, "off" skips)
+    # Proofs that cannot be checked locally (e.g. RDF suites without pyld, unresolvable DIDs) are stored with a warning
+    VC_VERIFICATION = os.getenv("VC_VERIFICATION", "enforce")
+    VC_VERIFY_WORKERS = int(os.getenv("VC_VERIFY_WORKERS", "4"))
+    DID_WEB_CACHE_TTL = float(os.getenv("DID_WEB_CACHE_TTL", "3600"))  # seconds
+
+    # VC-API presentation signing: "agent" (/vc/presentations/prove) or "local" (holder key in Askar)
+    VP_SIGNING = os.getenv("VP_SIGNING", "agent")
+
+    # Agent credential matches kept per presentation exchange between view and respond
+    PRESENTATION_CACHE_TTL = int(os.getenv("PRESENTATION_CACHE_TTL", "300"))  # seconds
+
     SESSION_COOKIE_NAME = "PyDentity"
     SESSION_COOKIE_SAMESITE = "Lax"  # Changed from Strict to Lax for ngrok compatibility
     SESSION_COOKIE_HTTPONLY = True   # Changed from string to boolean
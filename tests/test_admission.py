@@ -0,0 +1,24 @@
+from app.routes.webhooks.admission import AdmissionController, TokenBucket
+
+
+def test_token_bucket_burst_then_retry_after():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    retry_after = bucket.take()
+    assert 0 < retry_after <= 0.1
+
+
+def test_admission_is_per_wallet():
+    admission = AdmissionController(rate=1, burst=1, max_concurrency=0)
+    assert admission.admit("wallet-a") == 0
+    assert admission.admit("wallet-a") > 0
+    assert admission.admit("wallet-b") == 0
+
+
+def test_admission_concurrency_limit():
+    admission = AdmissionController(rate=0, burst=0, max_concurrency=1)
+    assert admission.acquire_slot()
+    assert not admission.acquire_slot()
+    admission.release_slot()
+    assert admission.acquire_slot()
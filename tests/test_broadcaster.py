@@ -0,0 +1,59 @@
+from app.utils.broadcaster import CoalescingBuffer, NotificationBroadcaster, format_sse
+
+
+def test_event_ids_increase_and_frame_carries_id():
+    broadcaster = NotificationBroadcaster(history_size=5)
+    q = broadcaster.subscribe("wallet")
+    broadcaster.broadcast("wallet", "notification_created", {"exchange_id": "a"})
+    broadcaster.broadcast("wallet", "connection_active", {"connection_id": "b"})
+    first, second = q.get(timeout=0), q.get(timeout=0)
+    assert second["id"] > first["id"]
+    assert format_sse(first).startswith(f"id: {first['id']}\n")
+
+
+def test_replay_after_last_event_id():
+    broadcaster = NotificationBroadcaster(history_size=5)
+    for i in range(3):
+        broadcaster.broadcast("wallet", "notification_created", {"n": i})
+    events = list(broadcaster.history["wallet"])
+    missed = broadcaster.catch_up("wallet", events[0]["id"])
+    assert [e["data"]["n"] for e in missed] == [1, 2]
+    assert broadcaster.catch_up("wallet", events[-1]["id"]) == []
+
+
+def test_resync_when_history_no_longer_covers_last_event_id():
+    broadcaster = NotificationBroadcaster(history_size=2)
+    for i in range(4):
+        broadcaster.broadcast("wallet", "notification_created", {"n": i})
+    oldest = broadcaster.history["wallet"][0]["id"]
+    assert broadcaster.catch_up("wallet", oldest - 10)[0]["type"] == "resync"
+    assert broadcaster.catch_up("other-wallet", 1)[0]["type"] == "resync"
+
+
+def test_coalesce_credential_received_into_reload():
+    buffer = CoalescingBuffer(maxsize=10)
+    for i in range(3):
+        buffer.push({"id": i + 1, "type": "credential_received",
+                     "data": {"credential_name": f"cred-{i}", "exchange_id": f"ex-{i}"}})
+    assert len(buffer) == 1
+    reload = buffer.popleft()
+    assert reload["type"] == "reload" and reload["id"] == 3
+    assert reload["data"]["count"] == 3
+    assert reload["data"]["exchange_ids"] == ["ex-0", "ex-1", "ex-2"]
+
+
+def test_add_remove_pair_cancels_out():
+    buffer = CoalescingBuffer(maxsize=10)
+    buffer.push({"id": 1, "type": "notification_created", "data": {"exchange_id": "a"}})
+    buffer.push({"id": 2, "type": "notification_removed", "data": {"exchange_id": "a"}})
+    assert len(buffer) == 0
+
+
+def test_overflow_collapses_to_summary_instead_of_dropping():
+    broadcaster = NotificationBroadcaster(history_size=50)
+    q = broadcaster.subscribe("wallet")
+    for i in range(12):
+        broadcaster.broadcast("wallet", "connection_active", {"connection_id": str(i)})
+    assert broadcaster.listeners["wallet"] == [q]
+    summary = q.get(timeout=0)
+    assert summary["type"] == "reload" and summary["data"]["reason"] == "overflow"
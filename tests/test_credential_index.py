@@ -0,0 +1,24 @@
+from app.utils.credential_index import apply_to_index, credential_key, empty_index
+
+
+def credential(cred_id, **subject):
+    return {"id": cred_id, "name": cred_id, "issuer": {"id": "did:example", "name": "Issuer"}, "credentialSubject": subject}
+
+
+def test_index_tracks_added_and_removed_credentials():
+    index = apply_to_index(empty_index(), [credential("urn:a", age="42", Given_Name="Ada"), credential("urn:b", age="n/a")])
+    assert index["attributes"]["age"] == {"urn:a": "42", "urn:b": "n/a"}
+    assert index["attributes"]["given_name"] == {"urn:a": "Ada"}
+    assert index["numeric"]["age"] == {"urn:a": 42}
+
+    version = index["version"]
+    apply_to_index(index, removed=["urn:a"])
+    assert "given_name" not in index["attributes"]
+    assert "age" not in index["numeric"]
+    assert index["version"] == version + 1
+
+
+def test_credentials_without_id_get_a_stable_key():
+    vc = {"credentialSubject": {"degree": "BSc"}}
+    assert credential_key(vc) == credential_key(dict(vc))
+    assert credential_key(vc).startswith("sha256:")
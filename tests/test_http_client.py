@@ -0,0 +1,47 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.utils.http_client import AsyncHttpClient
+
+
+def _serve():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            time.sleep(0.1)
+            body = json.dumps({"path": self.path, "goal_code": "connect"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hits
+
+
+def test_repeated_scans_share_one_fetch():
+    server, hits = _serve()
+    client = AsyncHttpClient(timeout=2, cache_ttl=60)
+    url = f"http://127.0.0.1:{server.server_port}/invitation?_oobid=1"
+
+    async def scan_many():
+        return await asyncio.gather(*(client.get_json(url, cache=True) for _ in range(5)))
+
+    documents = asyncio.run(scan_many())
+    documents[0].pop("goal_code")
+    assert asyncio.run(client.get_json(url, cache=True))["goal_code"] == "connect"
+    assert len(hits) == 1
+
+    asyncio.run(client.get_json(url))
+    assert len(hits) == 2
+    server.shutdown()
@@ -0,0 +1,82 @@
+from app.utils.credential_index import apply_to_index, empty_index
+from app.utils.matching import compact_agent_matches, match_presentation_request, select_credentials
+
+
+def _credential(id, schema_id, valid_from, **subject):
+    return {
+        "id": id,
+        "name": id,
+        "issuer": "did:example:issuer",
+        "credentialSchema": {"id": schema_id},
+        "validFrom": valid_from,
+        "credentialSubject": subject,
+    }
+
+
+INDEX = apply_to_index(empty_index(), [
+    _credential("old", "schema:a", "2023-01-01", name="Alice", age=30),
+    _credential("new", "schema:b", "2024-01-01", name="Alice", age=17),
+    _credential("partial", "schema:a", "2025-01-01", name="Alice"),
+])
+
+
+def test_attribute_group_comes_from_one_credential_within_restrictions():
+    request = {
+        "name": "Proof",
+        "requested_attributes": {
+            "group": {"names": ["name", "age"], "restrictions": [{"schema_id": "schema:a"}]},
+            "any": {"name": "name"},
+        },
+    }
+    match = match_presentation_request(request, INDEX)
+    by_id = {attr["id"]: attr for attr in match["matched_attributes"]}
+    assert by_id["group_name"]["credential_key"] == "old"
+    assert by_id["group_age"]["value"] == 30
+    assert by_id["any_name"]["credential_key"] == "partial"
+    assert match["can_respond"] and match["index_version"] == INDEX["version"]
+
+
+def test_restricted_predicate_without_holder_cannot_respond():
+    request = {
+        "requested_predicates": {
+            "adult": {"name": "age", "p_type": ">=", "p_value": 18, "restrictions": [{"schema_id": "schema:b"}]},
+        },
+    }
+    match = match_presentation_request(request, INDEX)
+    predicate = match["matched_predicates"][0]
+    assert not predicate["meets_condition"]
+    assert predicate["credential_key"] == "new" and predicate["actual_value"] == 17
+    assert not match["can_respond"]
+
+
+def test_selection_takes_first_agent_match_per_referent():
+    request = {"requested_attributes": {"name": {}}, "requested_predicates": {"adult": {}}}
+    matches = compact_agent_matches([
+        {"cred_info": {"referent": "c1"}, "presentation_referents": ["name"], "interval": {"to": 5}},
+        {"cred_info": {"referent": "c2"}, "presentation_referents": ["name", "adult", "other"]},
+        {"unexpected": True},
+    ])
+    assert select_credentials(request, matches) == {
+        "requested_attributes": {"name": {"cred_id": "c1", "revealed": True, "timestamp": 5}},
+        "requested_predicates": {"adult": {"cred_id": "c2"}},
+        "self_attested_attributes": {},
+    }
+
+
+def test_issuer_restrictions_use_the_cred_def_issuer():
+    anoncreds = {
+        **_credential("ac", "Th7MpTaRZVRYnPiabds81Y:2:id:1.0", "2024-06-01", name="Bob"),
+        # Credentials stored from exchanges carry the connection's DID as issuer
+        "issuer": "did:peer:2.Ez6LSconnection",
+        "credentialSchema": {"id": "Th7MpTaRZVRYnPiabds81Y:2:id:1.0", "type": "AnonCredsSchema"},
+        "proof": {"verificationMethod": "Th7MpTaRZVRYnPiabds81Y:3:CL:12:default"},
+    }
+    index = apply_to_index(empty_index(), [anoncreds, _credential("w3c", "schema:a", "2025-01-01", name="Carol")])
+    request = {"requested_attributes": {
+        "issued": {"name": "name", "restrictions": [{"issuer_did": "Th7MpTaRZVRYnPiabds81Y"}]},
+        "other": {"name": "name", "restrictions": [{"issuer_did": "did:example:other", "schema_id": "schema:a"}]},
+    }}
+    by_id = {attr["id"]: attr for attr in match_presentation_request(request, index)["matched_attributes"]}
+    # The W3C credential has no cred def to check its issuer against, only the schema counts
+    assert by_id["issued_name"]["credential_key"] == "w3c" and by_id["issued_name"]["candidates"] == 2
+    assert by_id["other_name"]["credential_key"] == "w3c" and by_id["other_name"]["candidates"] == 1
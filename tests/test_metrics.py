@@ -0,0 +1,7 @@
+from app.utils.metrics import Counter
+
+
+def test_label_values_are_escaped():
+    counter = Counter('events_total', 'Events', ('topic',))
+    counter.inc(topic='a"b\\c\nd')
+    assert counter.render()[-1] == 'events_total{topic="a\\"b\\\\c\\nd"} 1'
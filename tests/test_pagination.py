@@ -0,0 +1,16 @@
+from app.utils.pagination import paginate, project
+
+
+def test_paginate_cursor_walks_every_item():
+    items = [{"id": i} for i in range(5)]
+    first = paginate(items, limit=2)
+    second = paginate(items, first["next_cursor"], limit=2)
+    last = paginate(items, second["next_cursor"], limit=2)
+    assert [i["id"] for i in first["items"] + second["items"] + last["items"]] == [0, 1, 2, 3, 4]
+    assert last["next_cursor"] is None
+    assert first["total"] == 5
+
+
+def test_project_nested_fields():
+    credential = {"name": "Badge", "issuer": {"id": "did:web:x", "name": "X"}, "proof": {}}
+    assert project(credential, ["name", "issuer.name", "missing"]) == {"name": "Badge", "issuer": {"name": "X"}}
@@ -0,0 +1,24 @@
+from app.utils.predicates import NumericColumn, evaluate_predicates
+
+
+def test_column_selects_every_satisfying_value():
+    column = NumericColumn({"a": "17", "b": 18, "c": "21", "d": "n/a"})
+    assert len(column) == 3
+    assert column.select(">=", "18") == ["b", "c"]
+    assert column.select(">", 18) == ["c"]
+    assert column.select("<=", "18") == ["a", "b"]
+    assert column.select("<", "17") == []
+    assert column.select("==", "18") == []
+
+
+def test_evaluate_predicates_does_not_stop_at_first_holder():
+    numeric = {"age": {"young": 16, "adult": 30, "senior": 70}}
+    predicates = {
+        "over_18": {"name": "Age", "p_type": ">=", "p_value": 18},
+        "under_65": {"name": "age", "p_type": "<", "p_value": 65},
+    }
+    results = evaluate_predicates(predicates, numeric, rank=lambda key: numeric["age"][key], descending=True)
+    assert results == {"over_18": ["senior", "adult"], "under_65": ["adult", "young"]}
+
+    restricted = evaluate_predicates(predicates, numeric, candidates=lambda predicate: {"young"})
+    assert restricted == {"over_18": [], "under_65": ["young"]}
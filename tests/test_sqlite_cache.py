@@ -0,0 +1,25 @@
+import time
+
+from app.utils.sqlite_cache import SQLiteCache
+
+
+def test_expired_entries_are_hidden_and_cleaned_up(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "session.db"), table="sessions", cleanup_interval=3600)
+    cache.set("live", {"wallet_id": "a"}, timeout=0)
+    cache.set("stale", {"wallet_id": "b"}, timeout=1)
+    assert cache.get("stale") == {"wallet_id": "b"}
+
+    time.sleep(1.1)
+    assert cache.get("stale") is None
+    assert cache.cleanup() == 1
+    assert cache.get("live") == {"wallet_id": "a"}
+
+
+def test_tables_are_independent(tmp_path):
+    path = str(tmp_path / "session.db")
+    sessions = SQLiteCache(path, table="sessions")
+    challenges = SQLiteCache(path, table="challenges")
+    challenges.set("client", b"challenge")
+    sessions.clear()
+    assert challenges.get("client") == b"challenge"
+    assert challenges.delete("client") and not challenges.has("client")
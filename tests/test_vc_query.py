@@ -0,0 +1,48 @@
+import copy
+
+from app.utils.vc_query import CredentialQueryIndex
+
+V2 = "https://www.w3.org/ns/credentials/v2"
+CREDENTIALS = [
+    {
+        "@context": [V2],
+        "type": ["VerifiableCredential", "DegreeCredential"],
+        "issuer": "did:key:uni",
+        "proof": {"type": "Ed25519Signature2020"},
+    },
+    {
+        "@context": [V2, {"@vocab": "https://example.org#"}],
+        "type": ["VerifiableCredential", "DegreeCredential"],
+        "issuer": {"id": "did:web:college"},
+        "proof": [
+            {"type": "DataIntegrityProof", "cryptosuite": "ecdsa-rdfc-2019"},
+            {"type": "DataIntegrityProof", "cryptosuite": "eddsa-rdfc-2022"},
+        ],
+    },
+    {"@context": [V2], "type": ["VerifiableCredential", "LicenseCredential"], "issuer": "did:key:dmv"},
+]
+
+
+def test_queries_are_answered_from_indexes_without_touching_storage():
+    stored = copy.deepcopy(CREDENTIALS)
+    index = CredentialQueryIndex(stored)
+    degree = {"type": ["DegreeCredential"], "@context": [V2]}
+
+    answers = index.answer([
+        {"example": degree},
+        {"example": degree, "acceptedCryptosuites": [{"cryptosuite": "eddsa-rdfc-2022"}]},
+        {"example": degree, "trustedIssuer": [{"issuer": "did:web:college"}], "acceptedCryptosuites": ["Ed25519Signature2020"]},
+        {"example": {"type": ["LicenseCredential"]}},
+    ])
+
+    assert answers[0]["credential"]["issuer"] == "did:key:uni"
+    assert answers[1]["credential"]["proof"] == {"type": "DataIntegrityProof", "cryptosuite": "eddsa-rdfc-2022"}
+    assert answers[2]["credential"] is None
+    assert answers[3]["credential"] is None  # no proof to present
+    assert stored == CREDENTIALS
+
+
+def test_inline_contexts_are_indexed():
+    index = CredentialQueryIndex(CREDENTIALS)
+    assert index.candidates({"@context": [{"@vocab": "https://example.org#"}]}) == [1]
+    assert index.candidates({}) == [0, 1, 2]
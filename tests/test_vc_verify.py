@@ -0,0 +1,178 @@
+import hashlib
+
+import pytest
+from aries_askar import Key, KeyAlg
+
+from app.utils import did_resolver
+from app.utils.did_resolver import (
+    DidWebResolver, ResolutionError, UnauthorizedMethod, b58decode, b58encode, did_web_url, ed25519_multikey,
+    resolve_did_key,
+)
+from app.utils import vc_verify
+from app.utils.vc_verify import UnsupportedProof, canonicalize_jcs, verified_only, verify_credential, verify_presentation
+from app.utils.vp_signing import default_suite, holder_did, sign_document
+
+
+def _sign_jcs(credential, key, proof_purpose="assertionMethod"):
+    multikey = ed25519_multikey(key.get_public_bytes())
+    proof = {
+        "type": "DataIntegrityProof",
+        "cryptosuite": "eddsa-jcs-2022",
+        "verificationMethod": f"did:key:{multikey}#{multikey}",
+        "proofPurpose": proof_purpose,
+        "@context": credential["@context"],
+    }
+    hash_data = hashlib.sha256(canonicalize_jcs(proof)).digest() + hashlib.sha256(canonicalize_jcs(credential)).digest()
+    proof.pop("@context")
+    return {**credential, "proof": {**proof, "proofValue": "z" + b58encode(key.sign_message(hash_data))}}
+
+
+def test_did_key_and_did_web_resolution():
+    assert b58decode(b58encode(b"\x00\x00abc")) == b"\x00\x00abc"
+    public_key = bytes(range(32))
+    multikey = ed25519_multikey(public_key)
+    assert resolve_did_key(f"did:key:{multikey}#{multikey}") == public_key
+    assert did_web_url("did:web:example.com") == "https://example.com/.well-known/did.json"
+    assert did_web_url("did:web:example.com%3A8443:issuers:1") == "https://example.com:8443/issuers/1/did.json"
+
+
+def _credential(issuer):
+    return {
+        "@context": ["https://www.w3.org/ns/credentials/v2"],
+        "type": ["VerifiableCredential"],
+        "issuer": issuer,
+        "credentialSubject": {"name": "Alice"},
+    }
+
+
+def test_did_web_methods_hold_only_their_listed_relationships(monkeypatch):
+    multikey = ed25519_multikey(bytes(range(32)))
+    document = {
+        "id": "did:web:issuer.example",
+        "verificationMethod": [{"id": "#assert", "publicKeyMultibase": multikey}],
+        "assertionMethod": ["#assert"],
+        "authentication": [{"id": "did:web:issuer.example#auth", "publicKeyMultibase": multikey}],
+    }
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return document
+
+    monkeypatch.setattr(did_resolver.requests, "get", lambda *args, **kwargs: Response())
+    resolver = DidWebResolver()
+    assert resolver.resolve("did:web:issuer.example#assert", "assertionMethod") == bytes(range(32))
+    assert resolver.resolve("did:web:issuer.example#auth", "authentication") == bytes(range(32))
+    with pytest.raises(UnauthorizedMethod):
+        resolver.resolve("did:web:issuer.example#auth", "assertionMethod")
+    with pytest.raises(ResolutionError):
+        resolver.resolve("did:web:issuer.example#other", "assertionMethod")
+
+
+def test_eddsa_jcs_proofs_verify_locally():
+    key = Key.generate(KeyAlg.ED25519)
+    credential = _sign_jcs({
+        "@context": ["https://www.w3.org/ns/credentials/v2"],
+        "type": ["VerifiableCredential"],
+        "issuer": {"id": holder_did(key)[0], "name": "Issuer"},
+        "credentialSubject": {"name": "Alice"},
+    }, key)
+    credential["proof"] = [credential["proof"], {"type": "BbsBlsSignature2020"}]
+
+    verification = verify_credential(credential)
+    assert verification["verified"]
+    assert [proof["verified"] for proof in verification["proofs"]] == [True, None]
+    assert verified_only(credential, verification)["proof"]["cryptosuite"] == "eddsa-jcs-2022"
+
+    tampered = {**credential, "credentialSubject": {"name": "Mallory"}}
+    assert verify_credential(tampered)["failed"]
+
+
+def test_proofs_must_come_from_the_issuer_for_assertion():
+    key = Key.generate(KeyAlg.ED25519)
+    impersonation = verify_credential(_sign_jcs(_credential("did:web:university.example"), key))
+    assert impersonation["failed"] and "does not belong to did:web:university.example" in impersonation["error"]
+
+    wrong_purpose = verify_credential(_sign_jcs(_credential(holder_did(key)[0]), key, proof_purpose="authentication"))
+    assert wrong_purpose["failed"] and "proofPurpose" in wrong_purpose["error"]
+
+
+def test_unresolvable_issuers_are_not_failures():
+    credential = {
+        **_credential("did:peer:2.Ez6LSissuer"),
+        "proof": {
+            "type": "DataIntegrityProof",
+            "cryptosuite": "eddsa-jcs-2022",
+            "verificationMethod": "did:peer:2.Ez6LSissuer#key-1",
+            "proofPurpose": "assertionMethod",
+            "proofValue": "z1111",
+        },
+    }
+    verification = verify_credential(credential)
+    assert not verification["verified"] and not verification["failed"]
+    assert "Unsupported DID method" in verification["error"]
+
+
+def test_locally_signed_presentation_verifies():
+    key = Key.generate(KeyAlg.ED25519)
+    holder, verification_method = holder_did(key)
+    presentation = {"@context": ["https://www.w3.org/ns/credentials/v2"], "type": ["VerifiablePresentation"], "holder": holder}
+
+    vp = sign_document(presentation, key, verification_method, suite="eddsa-jcs-2022", challenge="abc", domain="verifier.example")
+    assert vp["proof"]["challenge"] == "abc" and "proof" not in presentation
+    assert verify_presentation(vp)["verified"]
+
+
+def test_ed25519_signature_2020_proofs_verify_locally():
+    pytest.importorskip("pyld", reason="Ed25519Signature2020 needs the verify extra (pyld)")
+    key = Key.generate(KeyAlg.ED25519)
+    issuer, verification_method = holder_did(key)
+    credential = sign_document({
+        "@context": ["https://www.w3.org/2018/credentials/v1"],
+        "type": ["VerifiableCredential"],
+        "issuer": issuer,
+        "issuanceDate": "2025-01-01T00:00:00Z",
+        "credentialSubject": {"id": "did:example:alice"},
+    }, key, verification_method, proof_purpose="assertionMethod")
+
+    assert credential["proof"]["type"] == "Ed25519Signature2020"
+    verification = verify_credential(credential)
+    assert verification["verified"] and not verification["failed"]
+
+
+def test_unchecked_proofs_are_not_failures(monkeypatch):
+    def unavailable(document):
+        raise UnsupportedProof("RDF canonicalization needs the pyld package")
+
+    monkeypatch.setattr(vc_verify, "canonicalize_rdfc", unavailable)
+    issuer, verification_method = holder_did(Key.generate(KeyAlg.ED25519))
+    credential = {
+        "@context": ["https://www.w3.org/2018/credentials/v1"],
+        "type": ["VerifiableCredential"],
+        "issuer": issuer,
+        "proof": {
+            "type": "Ed25519Signature2020",
+            "verificationMethod": verification_method,
+            "proofPurpose": "assertionMethod",
+            "proofValue": "z1111",
+        },
+    }
+
+    verification = verify_credential(credential)
+    assert not verification["verified"] and not verification["failed"]
+    assert verification["proofs"][0]["verified"] is None
+
+
+def test_default_signing_suite_matches_installed_canonicalization():
+    key = Key.generate(KeyAlg.ED25519)
+    holder, verification_method = holder_did(key)
+    presentation = {"@context": ["https://www.w3.org/ns/credentials/v2"], "type": ["VerifiablePresentation"], "holder": holder}
+
+    vp = sign_document(presentation, key, verification_method, challenge="abc")
+    if vc_verify.rdfc_available():
+        assert default_suite() == vp["proof"]["type"] == "Ed25519Signature2020"
+    else:
+        assert default_suite() == vp["proof"]["cryptosuite"] == "eddsa-jcs-2022"
+    assert verify_presentation(vp)["verified"]
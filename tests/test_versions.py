@@ -0,0 +1,17 @@
+from app.utils.versions import DataVersions
+
+
+def test_etag_changes_only_for_written_categories():
+    versions = DataVersions()
+    credentials = versions.etag("wallet-a", ["credentials"])
+    connections = versions.etag("wallet-a", ["connections"])
+
+    versions.bump("wallet-a", "credentials")
+    versions.bump("wallet-b", "connections")
+
+    assert versions.etag("wallet-a", ["credentials"]) != credentials
+    assert versions.etag("wallet-a", ["connections"]) == connections
+
+
+def test_etag_does_not_survive_restart():
+    assert DataVersions().etag("wallet-a", ["credentials"]) != DataVersions().etag("wallet-a", ["credentials"])